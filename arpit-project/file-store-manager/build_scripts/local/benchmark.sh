@@ -0,0 +1,41 @@
+#!/bin/bash
+set -e
+
+usage() { # Function: Print a help message.
+  echo "Usage: $0 [ -s Save this run as the new baseline ] [ -t Allowed regression of the mean, e.g. 20% ]" 1>&2
+}
+
+PACKAGE_DIR="file_store_manager"
+STORAGE="file://./tests/benchmark/baselines"
+THRESHOLD="${BENCHMARK_MAX_REGRESSION:-20%}"
+
+OPTS=`getopt -o st:h --long save,threshold:,help -n 'parse-options' -- "$@"`
+
+if [ $? != 0 ] ; then echo "Failed parsing options." >&2 ; exit 1 ; fi
+
+eval set -- "$OPTS"
+
+while true; do
+  case "$1" in
+    -s | --save ) SAVE="true"; shift ;;
+    -t | --threshold ) THRESHOLD="$2"; shift; shift ;;
+    -h | --help ) usage; exit 0 ;;
+    -- ) shift; break ;;
+    * ) break ;;
+  esac
+done
+
+if [ -n "${SAVE}" ] ; then
+  # Baselines are stored per machine, only compare runs of the same machine
+  PYTHONPATH=${PYTHONPATH}:${PWD}/${PACKAGE_DIR} pipenv run pytest tests/benchmark --no-cov \
+    --benchmark-storage="${STORAGE}" --benchmark-save=baseline "$@"
+else
+  MACHINE_ID=`pipenv run python -c "from pytest_benchmark.utils import get_machine_id; print(get_machine_id())"`
+  BASELINE_DIR="./tests/benchmark/baselines/${MACHINE_ID}"
+  if ! ls "${BASELINE_DIR}"/*_baseline.json > /dev/null 2>&1 ; then
+    echo "No baseline in ${BASELINE_DIR}, record one with $0 --save first." >&2
+    exit 1
+  fi
+  PYTHONPATH=${PYTHONPATH}:${PWD}/${PACKAGE_DIR} pipenv run pytest tests/benchmark --no-cov \
+    --benchmark-storage="${STORAGE}" --benchmark-compare --benchmark-compare-fail="mean:${THRESHOLD}" "$@"
+fi
@@ -9,14 +9,20 @@ import json
 from http import HTTPStatus
 
 from aws_lambda_powertools import Logger
-from decorators import apigateway_error_responder
+from consumed_capacity import publish_consumed_capacity
+from decorators import apigateway_error_responder, compress_response, decode_request_body
+from deferred_export import deferred_export_trace
 from eio_otel_semantic_conventions.trace import EioSpanAttributes
 from evertz_io_apigateway_utils.request import case_insensitive_headers
 from evertz_io_apigateway_utils.response import Response, add_cors_headers, origin_header_if_subdomain
 from evertz_io_observability.decorators import join_trace
-from evertz_io_observability.otel_collector import export_trace
+from http_caching import http_caching
 from lambda_event_sources.event_sources import EventSource
+from memory import track_memory
 from opentelemetry.trace import Span
+from profiling import profile_invocation
+from stages import publish_stage_metrics
+from warm_up import prime_on_provisioned_concurrency, warm_up_handler
 
 
 DEFAULT_RESPONSE_CONTENT_TYPE = "application/vnd.api+json"
@@ -26,12 +32,20 @@ logger = Logger()
 
 
 # pylint: disable=E1135
-@export_trace
+@warm_up_handler
+@deferred_export_trace
 @logger.inject_lambda_context()
 @join_trace(event_source=EventSource.API_GATEWAY_REQUEST)
+@publish_stage_metrics
+@track_memory
+@publish_consumed_capacity
+@profile_invocation
 @add_cors_headers(origin=origin_header_if_subdomain, credentials=True)
 @case_insensitive_headers
+@decode_request_body
+@compress_response
 @apigateway_error_responder
+@http_caching
 def hello_world(event, _, current_span: Span, identity):
     """
     Get Hello World
@@ -64,3 +78,6 @@ def hello_world(event, _, current_span: Span, identity):
     )
     logger.debug(response)
     return response.dump()
+
+
+prime_on_provisioned_concurrency()
@@ -0,0 +1,116 @@
+"""
+Bucket Index
+============
+
+Resolves the FileStore owning an S3 object, so that S3 event notifications can be routed per FileStore.
+
+The FileStores of a bucket are loaded from the ``BUCKET-INDEX`` of the table and arranged in a trie over
+the segments of their ``folder_prefix``. The trie of a bucket is cached per container, so resolving a key
+is a walk down the segments of the key.
+"""
+
+from typing import Dict, List
+
+from aws_lambda_powertools import Logger
+from cache import TTLCache
+from config import BUCKET_INDEX_CACHE_MAX_SIZE, BUCKET_INDEX_CACHE_TTL_SECONDS
+from db import get_file_stores_by_bucket
+from file_store_client.schemas.file_store import FileStore
+
+logger = Logger()
+
+
+def _segments(path: str) -> List[str]:
+    """
+    Split a folder prefix or an object key on ``/``, ignoring leading, trailing and repeated separators
+
+    :param path: A folder prefix or an object key
+    :return: The segments of the path
+    """
+    return [segment for segment in path.split("/") if segment]
+
+
+class PrefixTrie:
+    """
+    A trie over the segments of folder prefixes, answering longest prefix matches for object keys
+    """
+
+    __slots__ = ("children", "file_stores")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "PrefixTrie"] = {}
+        self.file_stores: List[FileStore] = []
+
+    def insert(self, folder_prefix: str, file_store: FileStore) -> None:
+        """
+        Add a FileStore under its folder prefix, an empty prefix is the root of the bucket
+
+        :param folder_prefix: The folder prefix of the FileStore
+        :param file_store: The FileStore
+        """
+        node = self
+        for segment in _segments(folder_prefix):
+            node = node.children.setdefault(segment, PrefixTrie())
+        node.file_stores.append(file_store)
+
+    def longest_match(self, key: str) -> List[FileStore]:
+        """
+        Find the FileStores with the longest folder prefix containing an object key
+
+        :param key: The key of an S3 object
+        :return: The FileStores of the most specific matching folder prefix, empty when none matches
+        """
+        node = self
+        matched = node.file_stores
+        for segment in _segments(key):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.file_stores:
+                matched = node.file_stores
+        return list(matched)
+
+
+_bucket_index_cache = TTLCache(maxsize=BUCKET_INDEX_CACHE_MAX_SIZE, ttl=BUCKET_INDEX_CACHE_TTL_SECONDS)
+"""
+bucket name -> PrefixTrie of the FileStores of the bucket
+"""
+
+
+def get_bucket_index(bucket_name: str) -> PrefixTrie:
+    """
+    Get the folder prefix trie of a bucket, built from one index query when it is not cached
+
+    :param bucket_name: The name of the bucket
+    :return: The trie of the FileStores of the bucket
+    """
+    trie = _bucket_index_cache.get(bucket_name)
+    if trie is None:
+        trie = PrefixTrie()
+        for file_store in get_file_stores_by_bucket(bucket_name):
+            trie.insert(file_store.folder_prefix or "", file_store)
+        _bucket_index_cache.put(bucket_name, trie)
+    return trie
+
+
+def resolve_file_stores(bucket_name: str, key: str) -> List[FileStore]:
+    """
+    Resolve the FileStores owning an S3 object
+
+    :param bucket_name: The bucket of the object
+    :param key: The key of the object
+    :return: The FileStores with the longest folder prefix containing the key
+    """
+    file_stores = get_bucket_index(bucket_name).longest_match(key)
+    logger.debug(f"Resolved [{bucket_name}/{key}] to FileStores {[file_store.id for file_store in file_stores]}")
+    return file_stores
+
+
+def invalidate_bucket_index(bucket_name: str) -> None:
+    """
+    Drop the cached trie of a bucket after one of its FileStores changed in this container, other
+    containers pick the change up within ``BUCKET_INDEX_CACHE_TTL_SECONDS``
+
+    :param bucket_name: The name of the bucket
+    """
+    _bucket_index_cache.invalidate(bucket_name)
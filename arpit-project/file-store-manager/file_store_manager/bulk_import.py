@@ -0,0 +1,323 @@
+"""
+FileStore Import
+================
+
+Restores FileStores exported by ``export.py``, or migrated from another table, in bulk.
+
+NDJSON files, gzip compressed or not, are read lazily and validated with ``FILE_STORE_SCHEMA`` a batch at a
+time. Valid FileStores are written with ``BatchWriteItem`` requests of up to 25 items by a pool of workers,
+and items DynamoDB leaves unprocessed are sent again after a jittered exponential backoff. Reading pauses
+while every worker is busy, and the workers share a budget of write capacity units per second. A line
+that cannot be imported is reported with the reason and the import carries on with the next one.
+
+Existing FileStores with the same tenant and id are replaced, and the one FileStore per class rule of
+``put_file_store`` is not checked. Once written, the imported FileStores on shared topics are registered on
+their topic, and the version of each imported tenant is bumped when ``TENANT_VERSION_DYNAMODB_TABLE`` is set
+so that search indexes cached by running containers are rebuilt.
+
+Usage::
+
+    FILE_STORE_DYNAMODB_TABLE=<table> python bulk_import.py <file>... --concurrency 4 --max-wcu 100
+"""
+
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from aws_lambda_powertools import Logger
+from botocore.exceptions import ClientError, ParamValidationError
+from capacity import CapacityLimiter
+from config import TENANT_VERSION_DYNAMODB_TABLE
+from db import DATA, STORE_ID, TENANT_ID, batch_write_file_store_items, bump_tenant_version, file_store_item
+from file_store_client.schemas.file_store import FILE_STORE_SCHEMA, FileStore
+from marshmallow import ValidationError
+from shared_topics import is_shared_topic, register_on_shared_topic
+
+logger = Logger()
+
+IMPORTED = "imported"
+FAILED = "failed"
+
+# The most items BatchWriteItem accepts in one request
+BATCH_SIZE = 25
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_MAX_SECONDS = 5.0
+
+DEFAULT_CONCURRENCY = 4
+
+Record = Tuple[str, int, Dict[str, Any]]
+"""
+(source file, line number, table item)
+"""
+
+
+def _failure(source: str, line_number: int, file_store_id: Optional[str], error: str) -> dict:
+    return {"source": source, "line": line_number, "id": file_store_id, "error": error}
+
+
+def _log_failure(failure: dict) -> None:
+    logger.warning(f"Unable to import line [{failure['line']}] of [{failure['source']}]: {failure['error']}")
+
+
+def _read_lines(paths: Iterable[str]) -> Iterator[Tuple[str, int, str]]:
+    """
+    :param paths: NDJSON files, gzip compressed when their name ends with ``.gz``
+    :return: The non empty lines of the files with their source and line number, read lazily
+    """
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as ndjson_file:
+            for line_number, line in enumerate(ndjson_file, start=1):
+                if line.strip():
+                    yield path, line_number, line
+
+
+def _chunks(lines: Iterator[Tuple[str, int, str]], size: int) -> Iterator[List[Tuple[str, int, str]]]:
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _check_key(file_store: FileStore) -> FileStore:
+    """
+    :param file_store: A loaded FileStore
+    :return: The FileStore
+    :raises ValidationError: When its tenant or id is missing, the item would be keyed ``None``
+    """
+    missing = {
+        field: ["Missing data for required field."] for field in ("tenant", "id") if not getattr(file_store, field)
+    }
+    if missing:
+        raise ValidationError(missing)
+    return file_store
+
+
+def _validate(chunk: List[Tuple[str, int, str]], on_failure: Callable[[dict], None]) -> List[Record]:
+    """
+    Load a chunk of lines with ``FILE_STORE_SCHEMA``, in one call unless one of them is invalid or has no tenant
+    or id
+
+    :param chunk: Lines with their source and line number
+    :param on_failure: Called with each line that is not a valid FileStore
+    :return: The items of the valid FileStores
+    """
+    parsed = []
+    for source, line_number, line in chunk:
+        try:
+            parsed.append((source, line_number, json.loads(line, parse_float=Decimal)))
+        except ValueError as err:
+            on_failure(_failure(source, line_number, None, f"Invalid JSON: {err}"))
+
+    try:
+        file_stores = FILE_STORE_SCHEMA.load([data for _, _, data in parsed], many=True)
+        return [
+            (source, line_number, file_store_item(_check_key(file_store)))
+            for (source, line_number, _), file_store in zip(parsed, file_stores)
+        ]
+    except ValidationError:
+        pass
+
+    records = []
+    for source, line_number, data in parsed:
+        try:
+            records.append((source, line_number, file_store_item(_check_key(FILE_STORE_SCHEMA.load(data)))))
+        except ValidationError as err:
+            file_store_id = data.get("id") if isinstance(data, dict) else None
+            on_failure(_failure(source, line_number, file_store_id, f"Invalid FileStore: {err.messages}"))
+    return records
+
+
+def _key(record: Record) -> Tuple[str, str]:
+    return record[2][TENANT_ID], record[2][STORE_ID]
+
+
+def _batches(records: Iterable[Record]) -> Iterator[List[Record]]:
+    """
+    Group records into BatchWriteItem requests, which must not contain the same key twice
+
+    :param records: Valid records in file order
+    :return: Batches of up to ``BATCH_SIZE`` records with distinct keys, a repeated key starts a new batch
+    """
+    batch = []
+    keys = set()
+    for record in records:
+        if _key(record) in keys:
+            yield batch
+            batch = []
+            keys = set()
+        batch.append(record)
+        keys.add(_key(record))
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+            keys = set()
+    if batch:
+        yield batch
+
+
+def _write_batch(
+    batch: List[Record], limiter: CapacityLimiter, sleep: Callable[[float], None] = time.sleep
+) -> Tuple[int, List[dict]]:
+    """
+    Write a batch, sending unprocessed items again with full jitter backoff
+
+    :param batch: Records with distinct keys
+    :param limiter: The write capacity budget shared by the workers
+    :param sleep: Called with the backoff before each retry
+    :return: The number of records written and the failures
+    """
+    pending = batch
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt:
+            sleep(random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt)))
+        try:
+            unprocessed, consumed_capacity = batch_write_file_store_items([item for _, _, item in pending])
+        except (ClientError, ParamValidationError, TypeError) as err:
+            if isinstance(err, ClientError):
+                error = err.response.get("Error", {}).get("Code", "?")
+            else:
+                error = str(err)
+            failures = [_failure(source, line, item[STORE_ID], error) for source, line, item in pending]
+            return len(batch) - len(pending), failures
+        limiter.consume(consumed_capacity)
+        if not unprocessed:
+            return len(batch), []
+        unprocessed_keys = {(item[TENANT_ID], item[STORE_ID]) for item in unprocessed}
+        pending = [record for record in pending if _key(record) in unprocessed_keys]
+
+    error = f"Still unprocessed after [{MAX_ATTEMPTS}] attempts"
+    return len(batch) - len(pending), [_failure(source, line, item[STORE_ID], error) for source, line, item in pending]
+
+
+def _register_on_shared_topics(items: List[Dict[str, Any]]) -> None:
+    """
+    Allow the buckets of imported FileStores to publish to their shared topic, exports hold neither the
+    FileStores registered on a shared topic nor its policy
+
+    :param items: The imported items of FileStores on shared topics
+    """
+    for item in items:
+        file_store = FILE_STORE_SCHEMA.load(item[DATA])
+        try:
+            register_on_shared_topic(file_store)
+        except Exception as err:  # pylint: disable=broad-except
+            logger.exception(
+                f"Unable to register FileStore [{file_store.id}] on shared topic [{file_store.topic_arn}], import"
+                f" it again to retry: {err}"
+            )
+
+
+def _bump_tenant_versions(tenant_ids: Iterable[str]) -> None:
+    """
+    Mark the search indexes of the imported tenants as outdated in every container, once per tenant
+
+    :param tenant_ids: The tenants FileStores were imported for
+    """
+    if not TENANT_VERSION_DYNAMODB_TABLE:
+        logger.warning("TENANT_VERSION_DYNAMODB_TABLE is not set, cached search indexes expire on their own")
+        return
+    for tenant_id in sorted(tenant_ids):
+        bump_tenant_version(tenant_id)
+
+
+def import_file_stores(
+    paths: Iterable[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_wcu_per_second: float = 0,
+    on_failure: Callable[[dict], None] = _log_failure,
+) -> Counter:
+    """
+    Import FileStores from NDJSON files
+
+    :param paths: NDJSON files, gzip compressed when their name ends with ``.gz``
+    :param concurrency: The number of BatchWriteItem requests in flight
+    :param max_wcu_per_second: The write capacity budget of the import, unlimited when 0
+    :param on_failure: Called with ``source``, ``line``, ``id`` and ``error`` of each line that was not imported
+    :return: The number of FileStores imported and failed
+    """
+    limiter = CapacityLimiter(max_wcu_per_second)
+    counts = Counter()
+    started = time.monotonic()
+    batches = {}
+    imported_tenants = set()
+    shared_topic_items = []
+
+    def report_failure(failure: dict) -> None:
+        counts[FAILED] += 1
+        on_failure(failure)
+
+    def collect(futures) -> None:
+        for future in futures:
+            batch = batches.pop(future)
+            written, failures = future.result()
+            counts[IMPORTED] += written
+            failed = {(failure["source"], failure["line"]) for failure in failures}
+            for source, line_number, item in batch:
+                if (source, line_number) in failed:
+                    continue
+                imported_tenants.add(item[TENANT_ID])
+                if is_shared_topic(item[DATA].get("topicArn") or ""):
+                    shared_topic_items.append(item)
+            for failure in failures:
+                report_failure(failure)
+
+    records = (
+        record for chunk in _chunks(_read_lines(paths), BATCH_SIZE) for record in _validate(chunk, report_failure)
+    )
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = set()
+        for batch in _batches(records):
+            if len(in_flight) >= concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            future = executor.submit(_write_batch, batch, limiter)
+            batches[future] = batch
+            in_flight.add(future)
+        collect(wait(in_flight).done)
+
+    _register_on_shared_topics(shared_topic_items)
+    _bump_tenant_versions(imported_tenants)
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Imported [{counts[IMPORTED]}] FileStores, failed [{counts[FAILED]}], in [{elapsed:.2f}]s"
+        f" consuming [{limiter.consumed:.1f}] WCU"
+    )
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Command line entry point, failures are written to stderr as JSON lines
+    """
+    parser = argparse.ArgumentParser(description="Import FileStores from NDJSON files")
+    parser.add_argument("paths", nargs="+", help="NDJSON files, gzip compressed when ending with .gz")
+    parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="BatchWriteItem requests in flight"
+    )
+    parser.add_argument("--max-wcu", type=float, default=0, help="Write capacity units per second, 0 for no limit")
+    args = parser.parse_args(argv)
+
+    def print_failure(failure: dict) -> None:
+        print(json.dumps(failure), file=sys.stderr)
+
+    counts = import_file_stores(args.paths, args.concurrency, args.max_wcu, on_failure=print_failure)
+    print(json.dumps(dict(counts)))
+
+
+if __name__ == "__main__":
+    main()
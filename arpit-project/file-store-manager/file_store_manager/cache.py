@@ -0,0 +1,103 @@
+"""
+In-memory Caches
+================
+
+Caches that live for the lifetime of a Lambda container and are shared between warm invocations
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    A thread safe, size bounded LRU cache whose entries expire after a time to live
+
+    A cache with a ``ttl`` of zero or less never stores anything, which allows it to be switched off from config.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, timer: Callable[[], float] = time.monotonic) -> None:
+        """
+        :param maxsize: The maximum number of entries, the least recently used entry is evicted past this size
+        :param ttl: The default time to live of an entry in seconds
+        :param timer: The clock used to expire entries
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a value from the cache
+
+        :param key: The key of the entry
+        :param default: Returned when the key is missing or expired
+        :return: The cached value or ``default``
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._timer():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Add a value to the cache
+
+        :param key: The key of the entry
+        :param value: The value to cache
+        :param ttl: Time to live of this entry in seconds, defaults to the ttl of the cache
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._timer() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Remove an entry from the cache
+
+        :param key: The key of the entry
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove every entry and reset the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        The counters of this cache, used to tune its size and ttl
+
+        :return: hits, misses, current size, maxsize and ttl of the cache
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
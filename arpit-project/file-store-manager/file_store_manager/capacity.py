@@ -0,0 +1,63 @@
+"""
+Capacity Limits
+===============
+
+Keeps bulk DynamoDB jobs under a budget of capacity units per second, so that they do not take the
+throughput the service needs to answer requests.
+"""
+
+import threading
+import time
+from typing import Callable
+
+
+class CapacityLimiter:
+    """
+    A thread safe token bucket of capacity units, shared by the workers of a job
+
+    DynamoDB reports the capacity a request consumed once it completes, so units are paid for afterwards: a
+    worker that overdraws the bucket sleeps until the budget has refilled. A limiter with a rate of zero or
+    less never waits.
+    """
+
+    def __init__(
+        self,
+        units_per_second: float,
+        timer: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """
+        :param units_per_second: The budget, also the most units that can be used in a burst
+        :param timer: The clock used to refill the bucket
+        :param sleep: Called with the number of seconds a worker has to wait
+        """
+        self.units_per_second = units_per_second
+        self.consumed = 0.0
+        self._timer = timer
+        self._sleep = sleep
+        self._available = units_per_second
+        self._refilled_at = timer()
+        self._lock = threading.Lock()
+
+    def consume(self, units: float) -> float:
+        """
+        Take capacity units out of the bucket, waiting while the bucket is overdrawn
+
+        :param units: The capacity units consumed by a request
+        :return: The number of seconds waited
+        """
+        with self._lock:
+            self.consumed += units
+            if self.units_per_second <= 0:
+                return 0.0
+            now = self._timer()
+            self._available = min(
+                self.units_per_second, self._available + (now - self._refilled_at) * self.units_per_second
+            )
+            self._refilled_at = now
+            self._available -= units
+            wait = -self._available / self.units_per_second if self._available < 0 else 0.0
+
+        if wait:
+            self._sleep(wait)
+        return wait
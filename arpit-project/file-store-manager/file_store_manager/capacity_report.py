@@ -0,0 +1,134 @@
+"""
+Capacity Report
+===============
+
+Ranks the tenants and access patterns that consume the most DynamoDB capacity, from the EMF records written
+by ``consumed_capacity.publish``.
+
+Any text holding one record per line can be read, e.g. the output of ``aws logs tail``; everything before the
+first ``{`` of a line is ignored, as are lines that are not consumed capacity records.
+
+Usage::
+
+    aws logs tail /aws/lambda/<function> --since 1d --filter-pattern ConsumedReadCapacity > capacity.log
+    python capacity_report.py capacity.log --top 10
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple
+
+from consumed_capacity import READ_METRIC, WRITE_METRIC
+
+READ = "read"
+WRITE = "write"
+CALLS = "calls"
+
+DEFAULT_TOP = 10
+
+
+def _value(value) -> float:
+    """
+    An EMF value is a number, or a list of numbers when a metric was added more than once
+    """
+    if isinstance(value, list):
+        return float(sum(value))
+    return float(value or 0)
+
+
+def parse_records(lines: Iterable[str]) -> Iterable[dict]:
+    """
+    :param lines: Log lines
+    :return: The consumed capacity records among them
+    """
+    for line in lines:
+        start = line.find("{")
+        if start < 0:
+            continue
+        try:
+            record = json.loads(line[start:])
+        except ValueError:
+            continue
+        if isinstance(record, dict) and "_aws" in record and READ_METRIC in record:
+            yield record
+
+
+def _totals() -> Dict[str, float]:
+    return {READ: 0.0, WRITE: 0.0, CALLS: 0}
+
+
+def aggregate(records: Iterable[dict]) -> Dict[str, Dict[Tuple[str, ...], Dict[str, float]]]:
+    """
+    :param records: Consumed capacity records
+    :return: The read and write capacity units and calls per tenant, per (operation, index) and per
+        (tenant, operation, index)
+    """
+    views = {"tenants": defaultdict(_totals), "patterns": defaultdict(_totals), "tenantPatterns": defaultdict(_totals)}
+    for record in records:
+        tenant = record.get("tenant", "?")
+        pattern = (record.get("Operation", "?"), record.get("Index", "?"))
+        for key, view in ((tenant,), "tenants"), (pattern, "patterns"), ((tenant, *pattern), "tenantPatterns"):
+            totals = views[view][key]
+            totals[READ] += _value(record.get(READ_METRIC))
+            totals[WRITE] += _value(record.get(WRITE_METRIC))
+            totals[CALLS] += int(_value(record.get(CALLS)))
+    return views
+
+
+def rank(view: Dict[Tuple[str, ...], Dict[str, float]], top: int = DEFAULT_TOP) -> List[Tuple[Tuple[str, ...], dict]]:
+    """
+    :param view: Totals per key
+    :param top: How many keys to keep
+    :return: The keys with the most capacity units, read and write added up, most expensive first
+    """
+    return sorted(view.items(), key=lambda item: (-(item[1][READ] + item[1][WRITE]), item[0]))[:top]
+
+
+def _print_table(title: str, columns: List[str], ranked: List[Tuple[Tuple[str, ...], dict]], out: TextIO) -> None:
+    rows = [[*key, f"{totals[READ]:.1f}", f"{totals[WRITE]:.1f}", str(int(totals[CALLS]))] for key, totals in ranked]
+    header = [*columns, "RCU", "WCU", "Calls"]
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    print(title, file=out)
+    for row in [header, *rows]:
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)), file=out)
+    print(file=out)
+
+
+def main(argv: Optional[List[str]] = None, out: TextIO = sys.stdout) -> None:
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Rank tenants and access patterns by consumed DynamoDB capacity")
+    parser.add_argument("paths", nargs="*", help="Log files, stdin when none")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="Rows per table")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of tables")
+    args = parser.parse_args(argv)
+
+    def lines():
+        if not args.paths:
+            yield from sys.stdin
+        for path in args.paths:
+            with open(path, encoding="utf-8") as log_file:
+                yield from log_file
+
+    views = aggregate(parse_records(lines()))
+    tables = [
+        ("Tenants", ["Tenant"], "tenants"),
+        ("Access patterns", ["Operation", "Index"], "patterns"),
+        ("Tenant access patterns", ["Tenant", "Operation", "Index"], "tenantPatterns"),
+    ]
+    if args.json:
+        report = {
+            view: [dict(zip(columns, key), **totals) for key, totals in rank(views[view], args.top)]
+            for _, columns, view in tables
+        }
+        print(json.dumps(report, indent=2), file=out)
+        return
+    for title, columns, view in tables:
+        _print_table(title, columns, rank(views[view], args.top), out)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,16 @@ Entry point for file-store-client and handle requests
 from http import HTTPStatus
 from typing import List
 
+import consumed_capacity
+import memory
+import profiling
 import service
+import stages
 from aws_lambda_powertools import Logger
 from decorators import request_handler_error_responder
+from deferred_export import deferred_export_trace
 from eio_otel_semantic_conventions.trace import EioSpanAttributes
-from evertz_io_observability.decorators import join_trace, start_span
-from evertz_io_observability.otel_collector import export_trace
+from evertz_io_observability.decorators import join_trace
 from file_store_client.schemas.client import (
     GET_FILE_STORE_BY_ID_PARAMETERS_SCHEMA,
     REQUEST_PAYLOAD_SCHEMA,
@@ -24,18 +28,38 @@ from file_store_client.schemas.file_store import FILE_STORE_SCHEMA, FileStore
 from file_store_client.schemas.lambda_payloads import GET_BY_CLASS_PAYLOAD, GetByClassPayload
 from lambda_event_sources.event_sources import EventSource
 from opentelemetry.semconv.trace import SpanAttributes
+from schema.client import (
+    FILE_STORE_SUMMARY_SCHEMA,
+    GET_FILE_STORES_BY_BUCKET_KEY,
+    GET_FILE_STORES_BY_BUCKET_KEY_PARAMETERS_SCHEMA,
+    GET_FILE_STORES_BY_METADATA,
+    GET_FILE_STORES_BY_METADATA_PARAMETERS_SCHEMA,
+    SEARCH_FILE_STORES,
+    SEARCH_FILE_STORES_PARAMETERS_SCHEMA,
+    FileStoreSummary,
+    GetFileStoresByBucketKeyParameters,
+    GetFileStoresByMetadataParameters,
+    SearchFileStoresParameters,
+)
+from tracing import MINIMAL, start_span
+from warm_up import prime_on_provisioned_concurrency, warm_up_handler
 
 logger = Logger()
 
 
-@export_trace
+@warm_up_handler
+@deferred_export_trace
 @logger.inject_lambda_context()
 @join_trace(event_source=EventSource.INVOKE)
+@stages.publish_stage_metrics
+@memory.track_memory
+@consumed_capacity.publish_consumed_capacity
+@profiling.profile_invocation
 def client_lambda(event, context):
     """
     The lambda to handle the invocation from file-store-client
 
-    :param event: event sent from file-store-client through boto3.invoke_lmabda
+    :param event: event sent from file-store-client through boto3.invoke_lmabda, or a warm-up event
     :param context: lambda execution context
     """
     logger.info(context)  # For pylint
@@ -48,7 +72,7 @@ def client_lambda(event, context):
     return RESPONSE_PAYLOAD_SCHEMA.dumps(response)
 
 
-@start_span()
+@start_span(level=MINIMAL)
 @request_handler_error_responder
 def request_handler(method_name, parameters, current_span):
     """
@@ -67,7 +91,9 @@ def request_handler(method_name, parameters, current_span):
         )
 
         file_store: FileStore = service.get_file_store_by_id(tenant=tenant_id, file_store_id=file_store_id)
-        return ResponsePayload(status_code=HTTPStatus.OK, error_message="", body=FILE_STORE_SCHEMA.dumps(file_store))
+        return ResponsePayload(
+            status_code=HTTPStatus.OK, error_message="", body=stages.dumps(FILE_STORE_SCHEMA, file_store)
+        )
     if method_name == MethodName.GET_FILE_STORE_BY_CLASS.value:
         params: GetByClassPayload = GET_BY_CLASS_PAYLOAD.load(parameters)
         tenant_id = str(params.tenant)
@@ -81,6 +107,41 @@ def request_handler(method_name, parameters, current_span):
 
         stores: List[FileStore] = service.get_file_stores_by_file_class(tenant=tenant_id, file_class=file_class)
         return ResponsePayload(
-            status_code=HTTPStatus.OK, error_message="", body=FILE_STORE_SCHEMA.dumps(stores, many=True)
+            status_code=HTTPStatus.OK, error_message="", body=stages.dumps(FILE_STORE_SCHEMA, stores, many=True)
+        )
+    if method_name == GET_FILE_STORES_BY_BUCKET_KEY:
+        params: GetFileStoresByBucketKeyParameters = GET_FILE_STORES_BY_BUCKET_KEY_PARAMETERS_SCHEMA.load(parameters)
+        current_span.set_attributes(
+            {SpanAttributes.AWS_S3_BUCKET: params.bucket, SpanAttributes.AWS_S3_KEY: params.key}
+        )
+
+        stores: List[FileStore] = service.get_file_stores_by_bucket_key(bucket_name=params.bucket, key=params.key)
+        return ResponsePayload(
+            status_code=HTTPStatus.OK, error_message="", body=stages.dumps(FILE_STORE_SCHEMA, stores, many=True)
+        )
+    if method_name == GET_FILE_STORES_BY_METADATA:
+        params: GetFileStoresByMetadataParameters = GET_FILE_STORES_BY_METADATA_PARAMETERS_SCHEMA.load(parameters)
+        current_span.set_attributes({EioSpanAttributes.TENANT_ID: params.tenant_id})
+
+        stores: List[FileStore] = service.get_file_stores_by_metadata(
+            tenant_id=params.tenant_id, key=params.key, value=params.value, prefix=params.prefix
+        )
+        return ResponsePayload(
+            status_code=HTTPStatus.OK, error_message="", body=stages.dumps(FILE_STORE_SCHEMA, stores, many=True)
+        )
+    if method_name == SEARCH_FILE_STORES:
+        params: SearchFileStoresParameters = SEARCH_FILE_STORES_PARAMETERS_SCHEMA.load(parameters)
+        current_span.set_attributes({EioSpanAttributes.TENANT_ID: params.tenant_id})
+
+        summaries: List[FileStoreSummary] = service.search_file_stores(
+            tenant_id=params.tenant_id, query=params.query, limit=params.limit
+        )
+        return ResponsePayload(
+            status_code=HTTPStatus.OK,
+            error_message="",
+            body=stages.dumps(FILE_STORE_SUMMARY_SCHEMA, summaries, many=True),
         )
     return ResponsePayload(status_code=HTTPStatus.NOT_IMPLEMENTED, error_message="method_name is unknown", body="")
+
+
+prime_on_provisioned_concurrency()
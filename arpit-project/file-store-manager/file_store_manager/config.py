@@ -42,3 +42,456 @@ Loads Configuration from environment variable;
 
     A string specifying the aws region
 """
+
+SNS_UNSUBSCRIBE_MAX_WORKERS: int = int(getenv("SNS_UNSUBSCRIBE_MAX_WORKERS", "10"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: SNS_UNSUBSCRIBE_MAX_WORKERS
+
+    The number of threads used to remove the subscriptions of an SNS topic concurrently.
+    The shared SNS client connection pool is sized to match.
+"""
+
+SNS_UNSUBSCRIBE_MAX_PASSES: int = int(getenv("SNS_UNSUBSCRIBE_MAX_PASSES", "3"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: SNS_UNSUBSCRIBE_MAX_PASSES
+
+    The maximum number of sweeps over the subscriptions of an SNS topic being deleted, so that subscriptions
+    added while it is deleted cannot keep the sweep going
+"""
+
+USER_GROUPS_CACHE_TTL_SECONDS: float = float(getenv("USER_GROUPS_CACHE_TTL_SECONDS", "30"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: USER_GROUPS_CACHE_TTL_SECONDS
+
+    How long the groups of a user are cached by ``service.check_if_admin``, ``0`` disables the cache
+"""
+
+USER_GROUPS_CACHE_MAX_SIZE: int = int(getenv("USER_GROUPS_CACHE_MAX_SIZE", "1024"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: USER_GROUPS_CACHE_MAX_SIZE
+
+    The maximum number of (tenant, user) entries kept in the user groups cache
+"""
+
+IDEMPOTENCY_DYNAMODB_TABLE: str = getenv("IDEMPOTENCY_DYNAMODB_TABLE", "")
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: IDEMPOTENCY_DYNAMODB_TABLE
+
+    The DynamoDB Table holding idempotency keys of create requests, with ``expires-at`` as its TTL attribute
+"""
+
+IDEMPOTENCY_KEY_TTL_SECONDS: int = int(getenv("IDEMPOTENCY_KEY_TTL_SECONDS", "86400"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: IDEMPOTENCY_KEY_TTL_SECONDS
+
+    How long the result of a create request is replayed for retries using the same idempotency key
+"""
+
+TOPIC_POOL_DYNAMODB_TABLE: str = getenv("TOPIC_POOL_DYNAMODB_TABLE", "")
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: TOPIC_POOL_DYNAMODB_TABLE
+
+    The DynamoDB Table listing the pre-created SNS topics of the topic pool, the pool is disabled when empty
+"""
+
+TOPIC_POOL_TARGET_SIZE: int = int(getenv("TOPIC_POOL_TARGET_SIZE", "20"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: TOPIC_POOL_TARGET_SIZE
+
+    The number of pre-created SNS topics the scheduled refill keeps in the topic pool
+"""
+
+SHARED_TOPIC_TENANTS: frozenset = frozenset(
+    tenant.strip() for tenant in getenv("SHARED_TOPIC_TENANTS", "").split(",") if tenant.strip()
+)
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: SHARED_TOPIC_TENANTS
+
+    A comma separated list of tenant ids whose incoming FileStores share one SNS topic per file class,
+    consumers tell the FileStores apart with subscription filter policies
+"""
+
+SHARED_TOPIC_DYNAMODB_TABLE: str = getenv("SHARED_TOPIC_DYNAMODB_TABLE", "")
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: SHARED_TOPIC_DYNAMODB_TABLE
+
+    The DynamoDB Table holding the buckets allowed to publish to each shared topic, with ``topic-arn`` as
+    its primary key. Required when ``SHARED_TOPIC_TENANTS`` is set
+"""
+
+BUCKET_INDEX_CACHE_TTL_SECONDS: float = float(getenv("BUCKET_INDEX_CACHE_TTL_SECONDS", "60"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: BUCKET_INDEX_CACHE_TTL_SECONDS
+
+    How long the folder prefix index of a bucket is cached to route S3 events to FileStores
+"""
+
+BUCKET_INDEX_CACHE_MAX_SIZE: int = int(getenv("BUCKET_INDEX_CACHE_MAX_SIZE", "512"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: BUCKET_INDEX_CACHE_MAX_SIZE
+
+    The maximum number of buckets whose folder prefix index is cached
+"""
+
+RECONCILER_MAX_WORKERS: int = int(getenv("RECONCILER_MAX_WORKERS", "8"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: RECONCILER_MAX_WORKERS
+
+    The number of FileStores the reconciler checks concurrently
+"""
+
+RECONCILER_PAGE_SIZE: int = int(getenv("RECONCILER_PAGE_SIZE", "100"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: RECONCILER_PAGE_SIZE
+
+    The number of pending FileStores the reconciler reads from the state index at a time
+"""
+
+RECONCILER_MAX_STORES_PER_TENANT: int = int(getenv("RECONCILER_MAX_STORES_PER_TENANT", "25"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: RECONCILER_MAX_STORES_PER_TENANT
+
+    The maximum number of FileStores of one tenant checked by a reconciler run, so that a tenant with many
+    pending FileStores does not starve the others
+"""
+
+INDEXED_METADATA_KEYS: tuple = tuple(
+    key.strip()
+    for key in getenv("INDEXED_METADATA_KEYS", "translation.id,translation.destination").split(",")
+    if key.strip()
+)
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: INDEXED_METADATA_KEYS
+
+    A comma separated list of dotted paths into ``FileStore.metadata`` that can be queried. Each key is copied to
+    the ``meta-<key>`` attribute of the item and needs the ``META-<KEY>-INDEX`` global index (hash: tenant-id,
+    range: meta-<key>), e.g. ``translation.id`` is indexed by ``META-TRANSLATION-ID-INDEX`` on ``meta-translation-id``
+"""
+
+SEARCH_INDEX_CACHE_TTL_SECONDS: float = float(getenv("SEARCH_INDEX_CACHE_TTL_SECONDS", "300"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: SEARCH_INDEX_CACHE_TTL_SECONDS
+
+    How long the name search index of a tenant is cached. Changes are picked up immediately when
+    ``TENANT_VERSION_DYNAMODB_TABLE`` is set, otherwise changes made by other containers within this time
+"""
+
+TENANT_VERSION_DYNAMODB_TABLE: str = getenv("TENANT_VERSION_DYNAMODB_TABLE", "")
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: TENANT_VERSION_DYNAMODB_TABLE
+
+    The DynamoDB Table counting the writes to the FileStores of each tenant, with ``tenant-id`` as its primary
+    key. Cached search indexes are checked against it, only writes through the same container are seen when empty
+"""
+
+SEARCH_INDEX_CACHE_MAX_SIZE: int = int(getenv("SEARCH_INDEX_CACHE_MAX_SIZE", "64"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: SEARCH_INDEX_CACHE_MAX_SIZE
+
+    The maximum number of tenants whose name search index is cached
+"""
+
+RESTRICTED_TABLE_CACHE_TTL_SECONDS: float = float(getenv("RESTRICTED_TABLE_CACHE_TTL_SECONDS", "300"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: RESTRICTED_TABLE_CACHE_TTL_SECONDS
+
+    How long the table resource restricted to a tenant, and the role credentials behind it, is reused. Must stay
+    below the duration of the role session
+"""
+
+RESTRICTED_TABLE_CACHE_MAX_SIZE: int = int(getenv("RESTRICTED_TABLE_CACHE_MAX_SIZE", "256"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: RESTRICTED_TABLE_CACHE_MAX_SIZE
+
+    The maximum number of (table, tenant) pairs whose restricted table resource is cached
+"""
+
+LAMBDA_INITIALIZATION_TYPE: str = getenv("AWS_LAMBDA_INITIALIZATION_TYPE", "on-demand")
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: AWS_LAMBDA_INITIALIZATION_TYPE
+
+    Set by Lambda, ``provisioned-concurrency`` when the container is initialised ahead of requests
+"""
+
+WARM_UP_TENANT_IDS: tuple = tuple(
+    tenant.strip() for tenant in getenv("WARM_UP_TENANT_IDS", "").split(",") if tenant.strip()
+)
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: WARM_UP_TENANT_IDS
+
+    A comma separated list of tenant ids whose restricted tables are created when a container is initialised
+    for provisioned concurrency
+"""
+
+IDENTITY_CACHE_TTL_SECONDS: float = float(getenv("IDENTITY_CACHE_TTL_SECONDS", "300"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: IDENTITY_CACHE_TTL_SECONDS
+
+    How long the identity decoded from a token is reused, never past the ``exp`` of the token. 0 disables the cache
+"""
+
+IDENTITY_CACHE_MAX_SIZE: int = int(getenv("IDENTITY_CACHE_MAX_SIZE", "1024"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: IDENTITY_CACHE_MAX_SIZE
+
+    The maximum number of tokens whose decoded identity is cached
+"""
+
+CLIENT_ERROR_TRACEBACK_SAMPLE_RATE: float = float(getenv("CLIENT_ERROR_TRACEBACK_SAMPLE_RATE", "0.01"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: CLIENT_ERROR_TRACEBACK_SAMPLE_RATE
+
+    The fraction of client errors whose traceback is logged and recorded on the span, server errors always have it
+"""
+
+RESPONSE_COMPRESSION_ENCODINGS: tuple = tuple(
+    encoding.strip().lower()
+    for encoding in getenv("RESPONSE_COMPRESSION_ENCODINGS", "br,gzip").split(",")
+    if encoding.strip()
+)
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: RESPONSE_COMPRESSION_ENCODINGS
+
+    Comma separated content codings API Gateway responses may be compressed with, in order of preference. ``br``
+    is only used when the brotli package is installed. Empty disables compression
+"""
+
+RESPONSE_COMPRESSION_MIN_BYTES: int = int(getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: RESPONSE_COMPRESSION_MIN_BYTES
+
+    API Gateway response bodies smaller than this are never compressed
+"""
+
+RESPONSE_COMPRESSION_MEDIA_TYPES: tuple = tuple(
+    media_type.strip().lower()
+    for media_type in getenv("RESPONSE_COMPRESSION_MEDIA_TYPES", "application/vnd.api+json,application/json").split(",")
+    if media_type.strip()
+)
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: RESPONSE_COMPRESSION_MEDIA_TYPES
+
+    Comma separated media types a request must ``Accept`` first for its response to be compressed, the same as the
+    ``BinaryMediaTypes`` of the API, since API Gateway only decodes base64 bodies back to bytes for those
+"""
+
+TRACING_LEVEL: str = getenv("TRACING_LEVEL", "standard").strip().lower()
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: TRACING_LEVEL
+
+    ``minimal``, ``standard`` or ``verbose``. Functions whose spans are finer than this level are not traced at all,
+    see ``tracing.py``
+"""
+
+DEFERRED_TRACE_EXPORT: bool = getenv("DEFERRED_TRACE_EXPORT", "false").strip().lower() in ("1", "true", "yes")
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: DEFERRED_TRACE_EXPORT
+
+    Export the spans of the client and API Gateway handlers from a background thread once the response has been
+    produced, instead of before it is returned, see ``deferred_export.py``
+"""
+
+DEFERRED_TRACE_EXPORT_MAX_SPANS: int = int(getenv("DEFERRED_TRACE_EXPORT_MAX_SPANS", "2048"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: DEFERRED_TRACE_EXPORT_MAX_SPANS
+
+    The maximum number of ended spans buffered for export, spans ended while the buffer is full are dropped
+"""
+
+DEFERRED_TRACE_EXPORT_MAX_DELAY_SECONDS: float = float(getenv("DEFERRED_TRACE_EXPORT_MAX_DELAY_SECONDS", "5"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: DEFERRED_TRACE_EXPORT_MAX_DELAY_SECONDS
+
+    How long the background thread waits before exporting buffered spans that no invocation asked to flush
+"""
+
+DEFERRED_TRACE_EXPORT_SHUTDOWN_TIMEOUT_SECONDS: float = float(
+    getenv("DEFERRED_TRACE_EXPORT_SHUTDOWN_TIMEOUT_SECONDS", "0.3")
+)
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: DEFERRED_TRACE_EXPORT_SHUTDOWN_TIMEOUT_SECONDS
+
+    How long the buffered spans may take to be exported when the container shuts down. Lambda leaves 300 to
+    500 milliseconds between ``SIGTERM`` and the end of the container
+"""
+
+PROFILER: str = getenv("PROFILER", "sampling").strip().lower()
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: PROFILER
+
+    ``sampling`` to write the collapsed stacks of an invocation, or ``cprofile`` to write its pstats, see
+    ``profiling.py``
+"""
+
+PROFILING_INVOCATION_RATE: float = float(getenv("PROFILING_INVOCATION_RATE", "0"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: PROFILING_INVOCATION_RATE
+
+    The fraction of invocations of the client and API Gateway handlers that are profiled, 0 disables profiling
+"""
+
+PROFILING_HEADER_ENABLED: bool = getenv("PROFILING_HEADER_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: PROFILING_HEADER_ENABLED
+
+    Profile API Gateway requests sent with the ``X-Profile`` header, whatever the invocation rate
+"""
+
+PROFILING_HEADER_MAX_PER_MINUTE: int = int(getenv("PROFILING_HEADER_MAX_PER_MINUTE", "2"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: PROFILING_HEADER_MAX_PER_MINUTE
+
+    The number of requests a container profiles for the ``X-Profile`` header per minute, further requests
+    with the header are only profiled at the invocation rate
+"""
+
+PROFILING_SAMPLING_INTERVAL_SECONDS: float = float(getenv("PROFILING_SAMPLING_INTERVAL_SECONDS", "0.005"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: PROFILING_SAMPLING_INTERVAL_SECONDS
+
+    How often the sampling profiler records the stack of the handler
+"""
+
+PROFILING_DIRECTORY: str = getenv("PROFILING_DIRECTORY", "/tmp/profiles")
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: PROFILING_DIRECTORY
+
+    Where profiles are written
+"""
+
+PROFILING_MAX_FILES: int = int(getenv("PROFILING_MAX_FILES", "20"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: PROFILING_MAX_FILES
+
+    The number of profiles kept in ``PROFILING_DIRECTORY``, the oldest are removed first
+"""
+
+MEMORY_TRACKING: bool = getenv("MEMORY_TRACKING", "false").strip().lower() in ("1", "true", "yes")
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: MEMORY_TRACKING
+
+    Trace the memory allocated by the client and API Gateway handlers with ``tracemalloc``, see ``memory.py``.
+    Allocations are slower and take more memory while it is set
+"""
+
+MEMORY_ALLOCATION_SITES: bool = getenv("MEMORY_ALLOCATION_SITES", "false").strip().lower() in ("1", "true", "yes")
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: MEMORY_ALLOCATION_SITES
+
+    Also record where the first list of FileStores of each invocation is allocated, which takes two snapshots of
+    the traced allocations. Only used with ``MEMORY_TRACKING``
+"""
+
+MEMORY_TOP_ALLOCATIONS: int = int(getenv("MEMORY_TOP_ALLOCATIONS", "5"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: MEMORY_TOP_ALLOCATIONS
+
+    The number of source lines kept per path when recording where lists of FileStores are allocated
+"""
+
+MEMORY_GROWTH_WINDOW: int = int(getenv("MEMORY_GROWTH_WINDOW", "10"))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: MEMORY_GROWTH_WINDOW
+
+    The number of successive warm invocations the growth of the memory held between invocations is measured over
+"""
+
+MEMORY_GROWTH_THRESHOLD_BYTES: int = int(getenv("MEMORY_GROWTH_THRESHOLD_BYTES", str(1024 * 1024)))
+"""
+Loads Configuration from environment variable;
+
+.. envvar:: MEMORY_GROWTH_THRESHOLD_BYTES
+
+    Memory held between invocations that grew by more than this over every invocation of the window is logged as
+    a possible leak
+"""
@@ -0,0 +1,228 @@
+"""
+Consumed Capacity
+=================
+
+Attributes the DynamoDB capacity consumed by an invocation to tenants, operations and indexes.
+
+Tables passed to ``track`` ask DynamoDB for the consumed capacity of every call, per index, through
+botocore's ``before-parameter-build`` event, so no call site has to request ``ReturnConsumedCapacity``
+itself. A call that already asks for it keeps its own setting. The ``ConsumedCapacity`` of each response
+is added up per ``(tenant, operation, index)``:
+
+- tables restricted to a tenant attribute every call to it
+- other tables attribute a call to the ``tenant-id`` of its key or item, or to ``UNATTRIBUTED_TENANT``
+- the index is ``TABLE_INDEX`` for the table itself, or the name of a secondary index
+
+The totals of the current span are added to it as ``dynamodb.consumed_capacity.*`` attributes. At the end of
+an invocation ``publish_consumed_capacity`` adds the totals to the handler span, and writes one EMF record per
+access pattern with the operation and index as dimensions and the tenant as metadata. Tenants are left out
+of the dimensions to keep the number of metrics bounded, and ``capacity_report.py`` ranks them from the
+records instead.
+"""
+
+import functools
+import json
+import threading
+import weakref
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.metrics.base import MetricManager
+from config import PROJECT
+from opentelemetry import trace
+
+TABLE_INDEX = "table"
+UNATTRIBUTED_TENANT = "unattributed"
+TENANT_ATTRIBUTE = "tenant-id"
+
+READ_OPERATIONS = frozenset(["GetItem", "BatchGetItem", "Query", "Scan", "TransactGetItems"])
+WRITE_OPERATIONS = frozenset(
+    ["PutItem", "UpdateItem", "DeleteItem", "BatchWriteItem", "TransactWriteItems", "ExecuteStatement"]
+)
+
+READ_METRIC = "ConsumedReadCapacity"
+WRITE_METRIC = "ConsumedWriteCapacity"
+
+PatternKey = Tuple[str, str, str]
+"""
+(tenant, operation, index)
+"""
+
+_lock = threading.Lock()
+_invocation_totals: Dict[PatternKey, Dict[str, float]] = defaultdict(lambda: {"read": 0.0, "write": 0.0, "calls": 0})
+_span_totals: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+_TENANT = "consumed_capacity_tenant"
+
+
+def _plain(value):
+    """
+    Keys are plain values on the resource layer and typed values, e.g. ``{"S": "..."}``, on the client
+    """
+    if isinstance(value, dict) and len(value) == 1:
+        return next(iter(value.values()))
+    return value
+
+
+def _tenant_from_params(params: dict) -> Optional[str]:
+    for argument in ("Key", "Item"):
+        tenant = _plain((params.get(argument) or {}).get(TENANT_ATTRIBUTE))
+        if isinstance(tenant, str):
+            return tenant
+    return None
+
+
+def _request_consumed_capacity(tenant_id: Optional[str], params: dict = None, model=None, context=None, **_):
+    if params is None or model is None:
+        return
+    if model.name in READ_OPERATIONS or model.name in WRITE_OPERATIONS:
+        params.setdefault("ReturnConsumedCapacity", "INDEXES")
+    if context is not None:
+        context[_TENANT] = tenant_id or _tenant_from_params(params) or UNATTRIBUTED_TENANT
+
+
+def _index_units(consumed_capacity: dict) -> Dict[str, dict]:
+    """
+    :param consumed_capacity: One ``ConsumedCapacity`` of a response
+    :return: The capacity of each index, the whole call is the table's when there is no breakdown
+    """
+    units = {}
+    if "Table" in consumed_capacity:
+        units[TABLE_INDEX] = consumed_capacity["Table"]
+    for indexes in ("GlobalSecondaryIndexes", "LocalSecondaryIndexes"):
+        units.update(consumed_capacity.get(indexes) or {})
+    return units or {TABLE_INDEX: consumed_capacity}
+
+
+def _read_write(operation: str, units: dict) -> Tuple[float, float]:
+    read = units.get("ReadCapacityUnits")
+    write = units.get("WriteCapacityUnits")
+    if read is None and write is None:
+        total = float(units.get("CapacityUnits") or 0.0)
+        return (0.0, total) if operation in WRITE_OPERATIONS else (total, 0.0)
+    return float(read or 0.0), float(write or 0.0)
+
+
+def _span_attributes(span_totals: Dict[str, float]) -> Dict[str, float]:
+    return {
+        "dynamodb.consumed_capacity.read": round(span_totals["read"], 3),
+        "dynamodb.consumed_capacity.write": round(span_totals["write"], 3),
+    }
+
+
+def record_consumed_capacity(tenant_id: str, operation: str, consumed_capacity) -> None:
+    """
+    Add the consumed capacity of a call to the totals of the invocation and of the current span
+
+    :param tenant_id: The tenant the call is attributed to
+    :param operation: The DynamoDB operation, e.g. ``Query``
+    :param consumed_capacity: The ``ConsumedCapacity`` of the response, one per table for batch operations
+    """
+    if isinstance(consumed_capacity, dict):
+        consumed_capacity = [consumed_capacity]
+    span = trace.get_current_span()
+    recording = span.is_recording()
+    read_total = write_total = 0.0
+    with _lock:
+        for table_capacity in consumed_capacity or []:
+            for index, units in _index_units(table_capacity).items():
+                read, write = _read_write(operation, units)
+                totals = _invocation_totals[(tenant_id, operation, index)]
+                totals["read"] += read
+                totals["write"] += write
+                totals["calls"] += 1
+                read_total += read
+                write_total += write
+        if recording:
+            span_totals = _span_totals.setdefault(span, {"read": 0.0, "write": 0.0})
+            span_totals["read"] += read_total
+            span_totals["write"] += write_total
+            attributes = _span_attributes(span_totals)
+    if recording:
+        span.set_attributes(attributes)
+
+
+def _record_response(parsed=None, model=None, context=None, **_):
+    if not isinstance(parsed, dict) or model is None or "ConsumedCapacity" not in parsed:
+        return
+    record_consumed_capacity((context or {}).get(_TENANT, UNATTRIBUTED_TENANT), model.name, parsed["ConsumedCapacity"])
+
+
+def track(table, tenant_id: Optional[str] = None):
+    """
+    Record the capacity consumed by every call of a DynamoDB table resource
+
+    :param table: A table resource, or a DynamoDB client
+    :param tenant_id: The tenant the table is restricted to, when it is
+    :return: The same table
+    """
+    client = getattr(getattr(table, "meta", None), "client", table)
+    events = client.meta.events
+    events.register(
+        "before-parameter-build.dynamodb.*",
+        functools.partial(_request_consumed_capacity, tenant_id),
+        unique_id="consumed-capacity-request",
+    )
+    events.register("after-call.dynamodb.*", _record_response, unique_id="consumed-capacity-response")
+    return table
+
+
+def invocation_totals() -> Dict[PatternKey, Dict[str, float]]:
+    """
+    :return: The read and write capacity units and the number of calls per (tenant, operation, index)
+    """
+    with _lock:
+        return {key: dict(totals) for key, totals in _invocation_totals.items()}
+
+
+def reset() -> None:
+    """
+    Forget the totals of the previous invocation
+    """
+    with _lock:
+        _invocation_totals.clear()
+
+
+def _emit(tenant_id: str, operation: str, index: str, totals: Dict[str, float]) -> None:
+    metric = MetricManager(namespace=PROJECT, service=PROJECT)
+    metric.add_metric(name=READ_METRIC, unit=MetricUnit.Count, value=totals["read"])
+    metric.add_metric(name=WRITE_METRIC, unit=MetricUnit.Count, value=totals["write"])
+    metric.add_dimension(name="Operation", value=operation)
+    metric.add_dimension(name="Index", value=index)
+    metric.add_metadata(key="tenant", value=tenant_id)
+    metric.add_metadata(key="calls", value=totals["calls"])
+    print(json.dumps(metric.serialize_metric_set(), separators=(",", ":")))
+
+
+def publish(span) -> None:
+    """
+    Add the totals of the invocation to a span, and write them as EMF records
+
+    :param span: The span of the handler
+    """
+    totals = invocation_totals()
+    read_total = sum(pattern["read"] for pattern in totals.values())
+    write_total = sum(pattern["write"] for pattern in totals.values())
+    for (tenant_id, operation, index), pattern in sorted(totals.items()):
+        _emit(tenant_id, operation, index, pattern)
+    if totals and span.is_recording():
+        span.set_attributes(_span_attributes({"read": read_total, "write": write_total}))
+        span.set_attribute("dynamodb.consumed_capacity.tenants", sorted({key[0] for key in totals}))
+
+
+def publish_consumed_capacity(func):
+    """
+    Publish the consumed capacity of each invocation, apply it inside ``join_trace``
+    """
+
+    @functools.wraps(func)
+    def wrapper(event, context, *args, **kwargs):
+        reset()
+        span = trace.get_current_span()
+        try:
+            return func(event, context, *args, **kwargs)
+        finally:
+            publish(span)
+
+    return wrapper
@@ -9,6 +9,9 @@ Key Attributes:
 store-id: str
 tenant-id: str
 class: str
+bucket: str  (copied from the FileStore at write time)
+state: str  (copied from the FileStore at write time, only while the state is not terminal)
+meta-<key>: str  (copied from FileStore.metadata at write time for each of INDEXED_METADATA_KEYS)
 
 Keys
 --------------------------
@@ -17,20 +20,52 @@ primary-key: (hash: tenant-id, range: channel-id)
 Indexes
 --------------------------
 LSI-1: (hash: tenant-id, range: class)
+BUCKET-INDEX: (hash: bucket, range: store-id), global, used to route S3 events to FileStores
+STATE-INDEX: (hash: state, range: store-id), global and sparse, used to find FileStores awaiting deployment
+META-<KEY>-INDEX: (hash: tenant-id, range: meta-<key>), global and sparse, one per indexed metadata key
+
+Idempotency Table
+--------------------------
+primary-key: (hash: tenant-id, range: idempotency-key)
+TTL attribute: expires-at
+
+Tenant Version Table
+--------------------------
+primary-key: (hash: tenant-id)
+version: int  (number of writes to the FileStores of the tenant)
 
 """
 
-from typing import List
+import datetime
+import time
+from copy import deepcopy
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
 
+import stages
 from aws_lambda_powertools import Logger
 from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
-from config import FILE_STORE_DYNAMODB_TABLE
-from errors import BucketNameNotFound, FileStoreConflict, FileStoreNotFound
-from evertz_io_observability.decorators import start_span
+from config import (
+    FILE_STORE_DYNAMODB_TABLE,
+    IDEMPOTENCY_DYNAMODB_TABLE,
+    IDEMPOTENCY_KEY_TTL_SECONDS,
+    INDEXED_METADATA_KEYS,
+    PROJECT,
+    TENANT_VERSION_DYNAMODB_TABLE,
+)
+from errors import (
+    BucketNameNotFound,
+    FileStoreConflict,
+    FileStoreNotFound,
+    IdempotentRequestInProgress,
+    MetadataKeyNotIndexed,
+)
 from file_store_client.schemas.file_class import FileClass
 from file_store_client.schemas.file_store import FILE_STORE_DB_SCHEMA, FILE_STORE_SCHEMA, FileStore
-from utility import get_restricted_table_with_retry_config
+from file_store_client.schemas.file_store_state import FileStoreState
+from tracing import start_span
+from utility import get_restricted_table_with_retry_config, get_table_with_retry_config
 
 logger = Logger()
 
@@ -38,9 +73,128 @@ logger = Logger()
 TENANT_ID = "tenant-id"
 CLASS = "class"
 STORE_ID = "store-id"
+BUCKET = "bucket"
+STATE = "state"
 
 DATA = "data"
 
+BUCKET_INDEX = "BUCKET-INDEX"
+STATE_INDEX = "STATE-INDEX"
+
+# Only FileStores in these states are written to the sparse STATE-INDEX
+INDEXED_STATES = frozenset([FileStoreState.DEPLOYMENT_PENDING, FileStoreState.DEPLOYED])
+
+# Idempotency Attributes
+IDEMPOTENCY_KEY = "idempotency-key"
+EXPIRES_AT = "expires-at"
+REQUEST_HASH = "request-hash"
+CLAIM_TOKEN = "claim-token"
+STATUS = "status"
+
+IDEMPOTENCY_IN_PROGRESS = "IN_PROGRESS"
+IDEMPOTENCY_COMPLETED = "COMPLETED"
+
+# An in progress key is a lease that outlives the 30 seconds function timeout, so a key held by a crashed
+# invocation frees up again instead of blocking retries until its TTL
+IDEMPOTENCY_LEASE_SECONDS = 60
+
+# Tenant Version Attributes
+VERSION = "version"
+
+
+def metadata_attribute(key: str) -> str:
+    """
+    :param key: A dotted path into ``FileStore.metadata``
+    :return: The name of the item attribute holding the value of the key
+    """
+    return "meta-" + key.replace(".", "-")
+
+
+def metadata_index(key: str) -> str:
+    """
+    :param key: A dotted path into ``FileStore.metadata``
+    :return: The name of the global index on the value of the key
+    """
+    return f"META-{key.replace('.', '-').upper()}-INDEX"
+
+
+def _metadata_value(metadata: Optional[dict], key: str) -> Optional[str]:
+    """
+    Read a dotted path from the metadata of a FileStore
+
+    :param metadata: The metadata of a FileStore
+    :param key: A dotted path into the metadata
+    :return: The value as a string, None when the path is missing or does not lead to a scalar
+    """
+    value = metadata
+    for part in key.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None
+    return str(value) or None
+
+
+def _index_attributes(file_store: FileStore) -> Dict[str, Optional[Any]]:
+    """
+    The attributes copied out of ``data`` so that indexes can be built on them
+
+    :param file_store: The FileStore being written
+    :return: attribute name -> value, None when the attribute must be absent from the item
+    """
+    state = file_store.state if file_store.state in INDEXED_STATES else None
+    attributes = {BUCKET: file_store.bucket or None, STATE: state.name if state else None}
+    for key in INDEXED_METADATA_KEYS:
+        attributes[metadata_attribute(key)] = _metadata_value(file_store.metadata, key)
+    return attributes
+
+
+def _update_data_kwargs(file_store: FileStore) -> Dict[str, Any]:
+    """
+    Build the ``update_item`` arguments that replace ``data`` and keep the index attributes in step
+
+    :param file_store: The FileStore being written
+    :return: UpdateExpression, ExpressionAttributeNames and ExpressionAttributeValues
+    """
+    set_clauses = ["#data=:file_store"]
+    remove_clauses = []
+    names = {"#data": DATA}
+    values = {":file_store": stages.dump(FILE_STORE_SCHEMA, file_store)}
+    for position, (attribute, value) in enumerate(_index_attributes(file_store).items()):
+        names[f"#index{position}"] = attribute
+        if value is None:
+            remove_clauses.append(f"#index{position}")
+        else:
+            set_clauses.append(f"#index{position}=:index{position}")
+            values[f":index{position}"] = value
+
+    update_expression = "SET " + ", ".join(set_clauses)
+    if remove_clauses:
+        update_expression += " REMOVE " + ", ".join(remove_clauses)
+    return {
+        "UpdateExpression": update_expression,
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": values,
+    }
+
+
+def file_store_item(file_store: FileStore) -> Dict[str, Any]:
+    """
+    The table item of a FileStore
+
+    :param file_store: A FileStore
+    :return: The item, with the index attributes of the FileStore
+    """
+    item = {
+        CLASS: file_store.store_type.file_class.name,
+        TENANT_ID: str(file_store.tenant),
+        STORE_ID: str(file_store.id),
+        DATA: stages.dump(FILE_STORE_SCHEMA, file_store),
+    }
+    item.update({attribute: value for attribute, value in _index_attributes(file_store).items() if value is not None})
+    return item
+
 
 @start_span()
 def put_file_store(file_store: FileStore) -> None:
@@ -57,12 +211,7 @@ def put_file_store(file_store: FileStore) -> None:
 
     file_class = file_store.store_type.file_class
 
-    item = {
-        CLASS: file_class.name,
-        TENANT_ID: tenant_id,
-        STORE_ID: str(file_store.id),
-        DATA: FILE_STORE_SCHEMA.dump(file_store),
-    }
+    item = file_store_item(file_store)
 
     # Fail if the (tenant_id, store_id) pair already exists
     cond = Attr(TENANT_ID).not_exists() & Attr(STORE_ID).not_exists()
@@ -112,10 +261,7 @@ def patch_file_store(file_store: FileStore) -> None:
     try:
         table = get_restricted_table_with_retry_config(FILE_STORE_DYNAMODB_TABLE, tenant_id)
         response = table.update_item(
-            Key={"tenant-id": tenant_id, "store-id": file_store_id},
-            UpdateExpression="SET #data=:file_store",
-            ExpressionAttributeNames={"#data": "data"},
-            ExpressionAttributeValues={":file_store": FILE_STORE_SCHEMA.dump(file_store)},
+            Key={"tenant-id": tenant_id, "store-id": file_store_id}, **_update_data_kwargs(file_store)
         )
         logger.debug(f"Response:  [{response}]")
         logger.info("Modified file store successfully.")
@@ -139,7 +285,7 @@ def get_file_stores_by_file_class(tenant_id: str, file_class: FileClass, limit=N
     cond = Key(TENANT_ID).eq(tenant_id) & Key(CLASS).eq(file_class.name)
     response = table.query(IndexName="LSI-1", KeyConditionExpression=cond, **kwargs)
 
-    return FILE_STORE_DB_SCHEMA.load([item[DATA] for item in response["Items"]], many=True)
+    return stages.load(FILE_STORE_DB_SCHEMA, [item[DATA] for item in response["Items"]], many=True)
 
 
 @start_span()
@@ -164,7 +310,7 @@ def get_file_store_by_id(tenant_id: str, file_store_id: str) -> FileStore:
         raise FileStoreNotFound
 
     item = response.get("Item")
-    return FILE_STORE_DB_SCHEMA.load(item[DATA])
+    return stages.load(FILE_STORE_DB_SCHEMA, item[DATA])
 
 
 @start_span()
@@ -182,25 +328,68 @@ def delete_file_store_by_id(tenant_id: str, file_store_id: str) -> None:
     table.delete_item(**kwargs)
 
 
+@start_span()
+def transition_file_store_state(file_store: FileStore, state: FileStoreState) -> Optional[FileStore]:
+    """
+    Move a FileStore from its non terminal state to another state, unless it changed since it was read
+
+    The update is conditional on the indexed state and on the last modified time of the FileStore, so
+    concurrent reconcilers and user patches never overwrite each other.
+
+    :param file_store: The FileStore as read, in one of ``INDEXED_STATES``
+    :param state: The new state
+    :return: The updated FileStore, None when the FileStore changed in the meantime
+    :throws: Reraises other errors from the UpdateItem operation
+    """
+    read_data = stages.dump(FILE_STORE_SCHEMA, file_store)
+    updated_file_store = deepcopy(file_store)
+    updated_file_store.state = state
+    updated_file_store.modification_info.last_modified = datetime.datetime.now()
+    updated_file_store.modification_info.last_modified_by = PROJECT
+
+    cond = Attr(STATE).eq(file_store.state.name) & Attr(f"{DATA}.modificationInfo.lastModified").eq(
+        read_data["modificationInfo"]["lastModified"]
+    )
+    table = get_restricted_table_with_retry_config(FILE_STORE_DYNAMODB_TABLE, str(file_store.tenant))
+    try:
+        table.update_item(
+            Key={TENANT_ID: str(file_store.tenant), STORE_ID: file_store.id},
+            ConditionExpression=cond,
+            **_update_data_kwargs(updated_file_store),
+        )
+    except ClientError as client_error:
+        if client_error.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            logger.info(f"FileStore [{file_store.id}] changed since it was read, not moving it to [{state.name}]")
+            return None
+        raise
+    logger.info(f"Moved FileStore [{file_store.id}] from [{file_store.state.name}] to [{state.name}]")
+    return updated_file_store
+
+
 @start_span()
 def get_file_stores_by_tenant(tenant_id: str) -> List[FileStore]:
     """
-    Get all FileStores for a tenant
+    Get all FileStores for a tenant, following every page of the query
     :throws: Reraises errors from the Query operation
     """
     table = get_restricted_table_with_retry_config(FILE_STORE_DYNAMODB_TABLE, tenant_id)
-    cond = Key(TENANT_ID).eq(tenant_id)
+    kwargs = {"KeyConditionExpression": Key(TENANT_ID).eq(tenant_id)}
+    items = []
 
     try:
-        response = table.query(KeyConditionExpression=cond)
+        while True:
+            response = table.query(**kwargs)
+            items.extend(item[DATA] for item in response.get("Items"))
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
     except ClientError as client_error:
         error = client_error.response.get("Error", {})
         error_code = error.get("Code", "?")
         logger.error(f"Error Code: [{error_code}]")
         raise
 
-    items = [item[DATA] for item in response.get("Items")]
-    return FILE_STORE_DB_SCHEMA.load(items, many=True)
+    return stages.load(FILE_STORE_DB_SCHEMA, items, many=True)
 
 
 @start_span()
@@ -225,4 +414,271 @@ def get_file_stores_by_tenant_and_bucket_name(tenant_id: str, bucket_name: str)
     if not items:
         raise BucketNameNotFound(bucket_name)
     logger.info(f"Successfully retrieved FileStores with bucket name [{bucket_name}] for tenant [{tenant_id}]: {items}")
-    return FILE_STORE_DB_SCHEMA.load(items, many=True)
+    return stages.load(FILE_STORE_DB_SCHEMA, items, many=True)
+
+
+@start_span()
+def get_file_stores_by_bucket(bucket_name: str) -> List[FileStore]:
+    """
+    Get the FileStores of every tenant pointing at a bucket
+
+    This is used to route S3 events, which carry no tenant, so the table is not restricted to a tenant.
+
+    :param bucket_name: The name of the bucket
+    :return: The FileStores of the bucket
+    :throws: Reraises errors from the Query operation
+    """
+    table = get_table_with_retry_config(FILE_STORE_DYNAMODB_TABLE)
+    kwargs = {"IndexName": BUCKET_INDEX, "KeyConditionExpression": Key(BUCKET).eq(bucket_name)}
+    items = []
+    while True:
+        response = table.query(**kwargs)
+        items.extend(item[DATA] for item in response["Items"])
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    logger.info(f"Found [{len(items)}] FileStores for bucket [{bucket_name}]")
+    return stages.load(FILE_STORE_DB_SCHEMA, items, many=True)
+
+
+@start_span()
+def get_file_stores_by_metadata(tenant_id: str, key: str, value: str, prefix: bool = False) -> List[FileStore]:
+    """
+    Get the FileStores of a tenant whose metadata matches a value on an indexed key
+
+    :param tenant_id: The tenant Id
+    :param key: One of ``INDEXED_METADATA_KEYS``
+    :param value: The value to match
+    :param prefix: Match values starting with ``value`` instead of equal to it
+    :return: The matching FileStores
+    :raises MetadataKeyNotIndexed: When the key is not indexed
+    :throws: Reraises errors from the Query operation
+    """
+    if key not in INDEXED_METADATA_KEYS:
+        raise MetadataKeyNotIndexed(key)
+
+    attribute = Key(metadata_attribute(key))
+    cond = Key(TENANT_ID).eq(tenant_id) & (attribute.begins_with(value) if prefix else attribute.eq(value))
+    table = get_restricted_table_with_retry_config(FILE_STORE_DYNAMODB_TABLE, tenant_id)
+    kwargs = {"IndexName": metadata_index(key), "KeyConditionExpression": cond}
+    items = []
+    while True:
+        response = table.query(**kwargs)
+        items.extend(item[DATA] for item in response["Items"])
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    return stages.load(FILE_STORE_DB_SCHEMA, items, many=True)
+
+
+@start_span()
+def get_file_stores_by_state(
+    state: FileStoreState, limit: Optional[int] = None, exclusive_start_key: Optional[dict] = None
+) -> Tuple[List[FileStore], Optional[dict]]:
+    """
+    Get a page of the FileStores of every tenant in a non terminal state, e.g. all pending FileStores
+
+    :param state: One of ``INDEXED_STATES``
+    :param limit: The maximum number of FileStores in the page
+    :param exclusive_start_key: The key returned with the previous page, None for the first page
+    :return: The FileStores of the page and the key of the next page, None after the last page
+    :raises ValueError: When the state is not indexed
+    :throws: Reraises errors from the Query operation
+    """
+    if state not in INDEXED_STATES:
+        raise ValueError(f"FileStores in state [{state.name}] are not indexed")
+
+    table = get_table_with_retry_config(FILE_STORE_DYNAMODB_TABLE)
+    kwargs = {"IndexName": STATE_INDEX, "KeyConditionExpression": Key(STATE).eq(state.name)}
+    if limit:
+        kwargs["Limit"] = limit
+    if exclusive_start_key:
+        kwargs["ExclusiveStartKey"] = exclusive_start_key
+    response = table.query(**kwargs)
+
+    file_stores = stages.load(FILE_STORE_DB_SCHEMA, [item[DATA] for item in response["Items"]], many=True)
+    return file_stores, response.get("LastEvaluatedKey")
+
+
+@start_span()
+def scan_file_stores_segment(
+    segment: int, total_segments: int, limit: Optional[int] = None, exclusive_start_key: Optional[dict] = None
+) -> Tuple[List[dict], Optional[dict], float]:
+    """
+    Read a page of one segment of a parallel Scan over the FileStores of every tenant
+
+    The items are returned as stored, so that callers can load them one at a time and skip the invalid ones.
+
+    :param segment: The segment to read, from 0 to ``total_segments - 1``
+    :param total_segments: The number of segments the table is split into
+    :param limit: The maximum number of items evaluated for the page
+    :param exclusive_start_key: The key returned with the previous page of the segment, None for the first page
+    :return: The ``data`` of the FileStores of the page, the key of the next page, None after the last page,
+        and the read capacity units consumed by the page
+    :throws: Reraises errors from the Scan operation
+    """
+    table = get_table_with_retry_config(FILE_STORE_DYNAMODB_TABLE)
+    kwargs = {
+        "Segment": segment,
+        "TotalSegments": total_segments,
+        "ProjectionExpression": "#data",
+        "ExpressionAttributeNames": {"#data": DATA},
+        "ReturnConsumedCapacity": "TOTAL",
+    }
+    if limit:
+        kwargs["Limit"] = limit
+    if exclusive_start_key:
+        kwargs["ExclusiveStartKey"] = exclusive_start_key
+    response = table.scan(**kwargs)
+
+    consumed_capacity = response.get("ConsumedCapacity", {}).get("CapacityUnits", 0.0)
+    return [item[DATA] for item in response["Items"]], response.get("LastEvaluatedKey"), float(consumed_capacity)
+
+
+@start_span()
+def batch_write_file_store_items(items: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Write up to 25 FileStore items of any tenants in one BatchWriteItem request, replacing existing items
+
+    Unlike ``put_file_store`` nothing is checked before writing, this is meant for restoring exported FileStores.
+
+    :param items: Items built with ``file_store_item``, with distinct keys
+    :return: The items DynamoDB did not process and should be sent again, and the write capacity units consumed
+    :throws: Reraises errors from the BatchWriteItem operation
+    """
+    table = get_table_with_retry_config(FILE_STORE_DYNAMODB_TABLE)
+    response = table.meta.client.batch_write_item(
+        RequestItems={table.name: [{"PutRequest": {"Item": item}} for item in items]},
+        ReturnConsumedCapacity="TOTAL",
+    )
+    unprocessed = response.get("UnprocessedItems", {}).get(table.name, [])
+    consumed_capacity = sum(capacity.get("CapacityUnits", 0.0) for capacity in response.get("ConsumedCapacity", []))
+    return [request["PutRequest"]["Item"] for request in unprocessed], float(consumed_capacity)
+
+
+@start_span()
+def get_idempotency_record(tenant_id: str, idempotency_key: str) -> Optional[dict]:
+    """
+    Get the record of an idempotency key
+
+    :param tenant_id: The tenant Id
+    :param idempotency_key: The idempotency key sent by the client
+    :return: The record, None when the key is unknown or expired
+    :throws: Reraises errors from the GetItem operation
+    """
+    table = get_restricted_table_with_retry_config(IDEMPOTENCY_DYNAMODB_TABLE, tenant_id)
+    response = table.get_item(Key={TENANT_ID: tenant_id, IDEMPOTENCY_KEY: idempotency_key})
+    item = response.get("Item")
+    # Expired items linger until DynamoDB's TTL process removes them
+    if item is None or int(item[EXPIRES_AT]) <= int(time.time()):
+        return None
+    return item
+
+
+@start_span()
+def claim_idempotency_key(tenant_id: str, idempotency_key: str, request_hash: str) -> str:
+    """
+    Mark an idempotency key as in progress, for at most ``IDEMPOTENCY_LEASE_SECONDS``
+
+    :param tenant_id: The tenant Id
+    :param idempotency_key: The idempotency key sent by the client
+    :param request_hash: A hash of the request, used to refuse a key reused for another request
+    :return: The token of this claim, only the request holding it may release the key
+    :raises IdempotentRequestInProgress: When another request holds the key
+    """
+    now = int(time.time())
+    claim_token = str(uuid4())
+    item = {
+        TENANT_ID: tenant_id,
+        IDEMPOTENCY_KEY: idempotency_key,
+        STATUS: IDEMPOTENCY_IN_PROGRESS,
+        REQUEST_HASH: request_hash,
+        CLAIM_TOKEN: claim_token,
+        EXPIRES_AT: now + IDEMPOTENCY_LEASE_SECONDS,
+    }
+    cond = Attr(TENANT_ID).not_exists() | Attr(EXPIRES_AT).lte(now)
+
+    table = get_restricted_table_with_retry_config(IDEMPOTENCY_DYNAMODB_TABLE, tenant_id)
+    try:
+        table.put_item(Item=item, ConditionExpression=cond)
+    except ClientError as client_error:
+        if client_error.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            raise IdempotentRequestInProgress(idempotency_key) from client_error
+        raise
+    return claim_token
+
+
+@start_span()
+def complete_idempotency_key(tenant_id: str, idempotency_key: str, file_store: FileStore) -> None:
+    """
+    Store the result of the request holding an idempotency key, to be replayed until the key expires
+
+    :param tenant_id: The tenant Id
+    :param idempotency_key: The idempotency key sent by the client
+    :param file_store: The FileStore returned to the client
+    """
+    table = get_restricted_table_with_retry_config(IDEMPOTENCY_DYNAMODB_TABLE, tenant_id)
+    table.update_item(
+        Key={TENANT_ID: tenant_id, IDEMPOTENCY_KEY: idempotency_key},
+        UpdateExpression="SET #status=:status, #data=:file_store, #expires_at=:expires_at",
+        ExpressionAttributeNames={"#status": STATUS, "#data": DATA, "#expires_at": EXPIRES_AT},
+        ExpressionAttributeValues={
+            ":status": IDEMPOTENCY_COMPLETED,
+            ":file_store": stages.dump(FILE_STORE_SCHEMA, file_store),
+            ":expires_at": int(time.time()) + IDEMPOTENCY_KEY_TTL_SECONDS,
+        },
+    )
+
+
+@start_span()
+def release_idempotency_key(tenant_id: str, idempotency_key: str, claim_token: str) -> None:
+    """
+    Release an in progress idempotency key after its request failed, so the client can retry it
+
+    A request whose lease expired while it ran may find the key claimed again by a retry, or completed by it,
+    in which case the key is left as it is.
+
+    :param tenant_id: The tenant Id
+    :param idempotency_key: The idempotency key sent by the client
+    :param claim_token: The token returned by ``claim_idempotency_key`` to this request
+    """
+    table = get_restricted_table_with_retry_config(IDEMPOTENCY_DYNAMODB_TABLE, tenant_id)
+    cond = Attr(STATUS).eq(IDEMPOTENCY_IN_PROGRESS) & Attr(CLAIM_TOKEN).eq(claim_token)
+    try:
+        table.delete_item(Key={TENANT_ID: tenant_id, IDEMPOTENCY_KEY: idempotency_key}, ConditionExpression=cond)
+    except ClientError as client_error:
+        if client_error.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        logger.info(f"Idempotency key [{idempotency_key}] is held by another request, it is not released")
+
+
+@start_span()
+def bump_tenant_version(tenant_id: str) -> None:
+    """
+    Count a write to the FileStores of a tenant
+
+    :param tenant_id: The tenant Id
+    :throws: Reraises errors from the UpdateItem operation
+    """
+    table = get_restricted_table_with_retry_config(TENANT_VERSION_DYNAMODB_TABLE, tenant_id)
+    table.update_item(
+        Key={TENANT_ID: tenant_id},
+        UpdateExpression="ADD #version :one",
+        ExpressionAttributeNames={"#version": VERSION},
+        ExpressionAttributeValues={":one": 1},
+    )
+
+
+@start_span()
+def get_tenant_version(tenant_id: str) -> int:
+    """
+    Get the number of writes to the FileStores of a tenant
+
+    :param tenant_id: The tenant Id
+    :return: The version of the tenant, 0 before its first write
+    :throws: Reraises errors from the GetItem operation
+    """
+    table = get_restricted_table_with_retry_config(TENANT_VERSION_DYNAMODB_TABLE, tenant_id)
+    item = table.get_item(Key={TENANT_ID: tenant_id}, ConsistentRead=True).get("Item")
+    return int(item[VERSION]) if item else 0
@@ -5,277 +5,380 @@ Decorators
 The module contains set of decorators
 """
 
+import base64
 import functools
+import gzip
+import hashlib
 import json
 import logging
+import time
 from http import HTTPStatus
+from typing import Dict, Optional
 
 import errors
 from aws_lambda_powertools import Logger
-from botocore.exceptions import ClientError
+from cache import TTLCache
+from config import (
+    CLIENT_ERROR_TRACEBACK_SAMPLE_RATE,
+    IDENTITY_CACHE_MAX_SIZE,
+    IDENTITY_CACHE_TTL_SECONDS,
+    RESPONSE_COMPRESSION_ENCODINGS,
+    RESPONSE_COMPRESSION_MEDIA_TYPES,
+    RESPONSE_COMPRESSION_MIN_BYTES,
+)
+from error_mapping import ErrorMapper, ErrorMapping
+from evertz_io_identity_lib import Identity
 from evertz_io_identity_lib.event import get_identity_from_event
-from file_store_client.schemas.client import ResponsePayload
-from marshmallow import ValidationError
-from marshmallow_jsonapi.exceptions import IncorrectTypeError
 from opentelemetry import trace
 from opentelemetry.semconv.trace import SpanAttributes
-from opentelemetry.trace import Status, StatusCode
 
 logger = Logger()
 
+# botocore, marshmallow and the file-store-client schemas are imported when an error needs them rather than with
+# this module, so that handlers which never reach those code paths do not load them at cold start. An except
+# clause only evaluates its expression once an exception reaches it.
+# pylint: disable=import-outside-toplevel
+
+
+@functools.lru_cache(maxsize=None)
+def _client_error() -> type:
+    from botocore.exceptions import ClientError
+
+    return ClientError
+
+
+@functools.lru_cache(maxsize=None)
+def _validation_error() -> type:
+    from marshmallow import ValidationError
+
+    return ValidationError
+
+
+@functools.lru_cache(maxsize=None)
+def _json_api_errors() -> tuple:
+    from marshmallow_jsonapi.exceptions import IncorrectTypeError
+
+    return _validation_error(), IncorrectTypeError
+
+
+@functools.lru_cache(maxsize=None)
+def _brotli():
+    """
+    :return: The brotli module, None when it is not installed
+    """
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def _response_payload(status_code: int, error_message: str):
+    """
+    :return: The ``ResponsePayload`` of an error for the client lambda
+    """
+    from file_store_client.schemas.client import ResponsePayload
+
+    return ResponsePayload(status_code=status_code, error_message=error_message, body="")
+
+
+IDENTITY_CACHE = TTLCache(maxsize=IDENTITY_CACHE_MAX_SIZE, ttl=IDENTITY_CACHE_TTL_SECONDS)
+"""
+sha256 of a token -> Identity decoded from the token, shared by warm invocations of a container
+"""
+
+
+def get_header(headers: Optional[dict], name: str) -> Optional[str]:
+    """
+    :param headers: The headers of an event or a response, case insensitive or not
+    :param name: The name of a header
+    :return: The value of the header, None when missing
+    """
+    if not headers:
+        return None
+    value = headers.get(name)
+    if value is None:
+        lower_name = name.lower()
+        value = next((value for key, value in headers.items() if key.lower() == lower_name), None)
+    return value
+
+
+def _authorization_token(event: dict) -> Optional[str]:
+    return get_header(event.get("headers"), "Authorization")
+
+
+def _token_expiry(token: str) -> Optional[float]:
+    """
+    :param token: A JWT
+    :return: The ``exp`` claim of the token, None when it cannot be read
+    """
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def get_identity_cached(event: dict) -> Identity:
+    """
+    Get the identity of the caller, decoding each token once per container
+
+    API Gateway has already verified the token, so the identity is read without verification, as before. An
+    identity is cached until the token expires, or for ``IDENTITY_CACHE_TTL_SECONDS`` if that comes first.
+
+    :param event: The API Gateway event
+    :return: The identity of the caller
+    """
+    token = _authorization_token(event)
+    if not token:
+        return get_identity_from_event(event=event, verify=False)
+
+    key = hashlib.sha256(token.encode()).hexdigest()
+    identity = IDENTITY_CACHE.get(key)
+    if identity is None:
+        identity = get_identity_from_event(event=event, verify=False)
+        expiry = _token_expiry(token)
+        IDENTITY_CACHE.put(key, identity, ttl=None if expiry is None else expiry - time.time())
+    return identity
+
+
+JSON_API_HEADERS = {"Content-Type": "application/vnd.api+json"}
+
+
+def _json_api_error_body(err, request_id: Optional[str]) -> list:
+    errs = err.messages
+    err_arr = errs if isinstance(errs, list) else errs.get("errors", [])
+    for error in err_arr:
+        error["id"] = request_id
+        error["status"] = "422"
+        error["title"] = "UnprocessableEntityError"
+    logging.info(errs)
+    return err_arr
+
+
+def _client_error_status_code(err) -> int:
+    return int(err.response["ResponseMetadata"]["HTTPStatusCode"])
+
+
+def _client_error_code(err) -> str:
+    return str(err.response["Error"]["Code"])
+
+
+def _client_error_detail(err) -> str:
+    if _client_error_code(err) == "AccessDenied":
+        return "Access denied to S3 file object, check permissions."
+    return str(err)
+
+
+APIGATEWAY_ERRORS = ErrorMapper(
+    [
+        ErrorMapping(
+            _client_error,
+            status_code=_client_error_status_code,
+            code=_client_error_code,
+            detail=_client_error_detail,
+            unexpected=True,
+        ),
+        ErrorMapping(KeyError, status_code=422, code="Key Error", title="Key Error", unexpected=True),
+        ErrorMapping(
+            errors.ErrorBase,
+            status_code=lambda err: err.http_code,
+            code=lambda err: str(err.code),
+            title=lambda err: err.title,
+        ),
+        ErrorMapping(
+            json.JSONDecodeError,
+            status_code=400,
+            code=lambda err: err.__class__.__name__,
+            title="Invalid JSON Error",
+            detail=lambda err: f"{err.msg}",
+        ),
+        ErrorMapping(_json_api_errors, status_code=422, body=_json_api_error_body),
+        ErrorMapping(TypeError, status_code=422, code="Type Error", title="Type Error", unexpected=True),
+        ErrorMapping(ValueError, status_code=400, code="ValueError", title="Value Error", unexpected=True),
+        ErrorMapping(
+            Exception, status_code=400, code="UnexpectedError", title="Unexpected Error", status="500", unexpected=True
+        ),
+    ],
+    traceback_sample_rate=CLIENT_ERROR_TRACEBACK_SAMPLE_RATE,
+)
+"""
+Responses of the API Gateway handler to errors, in the order they are matched
+"""
+
+REQUEST_HANDLER_ERRORS = ErrorMapper(
+    [
+        ErrorMapping(errors.ErrorBase, status_code=lambda err: err.http_code),
+        ErrorMapping(_client_error, status_code=_client_error_status_code, unexpected=True),
+        ErrorMapping(KeyError, status_code=HTTPStatus.UNPROCESSABLE_ENTITY, unexpected=True),
+        ErrorMapping(json.JSONDecodeError, status_code=HTTPStatus.BAD_REQUEST),
+        ErrorMapping(TypeError, status_code=HTTPStatus.UNPROCESSABLE_ENTITY, unexpected=True),
+        ErrorMapping(ValueError, status_code=HTTPStatus.BAD_REQUEST, unexpected=True),
+        ErrorMapping(_validation_error, status_code=HTTPStatus.UNPROCESSABLE_ENTITY),
+        ErrorMapping(Exception, status_code=HTTPStatus.BAD_REQUEST, unexpected=True),
+    ],
+    traceback_sample_rate=CLIENT_ERROR_TRACEBACK_SAMPLE_RATE,
+)
+"""
+Responses of the client handler to errors, in the order they are matched
+"""
+
 
 def apigateway_error_responder(func):
     """Error handling responses"""
 
-    # pylint: disable=R0911, R0914
-    # pylint: disable=too-many-locals, too-many-statements
     @functools.wraps(func)
     def wrapper(event, _, *args, **kwargs):
         current_span = trace.get_current_span()
-        identity = get_identity_from_event(event=event, verify=False)
+        identity = get_identity_cached(event)
         request_id = event.get("requestContext", {}).get("requestId")
         current_span.set_attributes({SpanAttributes.AWS_REQUEST_ID: request_id})
         try:
-            response = func(event, _, current_span, identity, *args, **kwargs)
-        except ClientError as err:
-            logging.exception(err)
-            current_span.record_exception(err, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{err}"))
-            if err.response["Error"]["Code"] == "AccessDenied":
-                response = {
-                    "statusCode": int(err.response["ResponseMetadata"]["HTTPStatusCode"]),
-                    "headers": {"Content-Type": "application/vnd.api+json"},
-                    "body": json.dumps(
-                        {
-                            "errors": [
-                                {
-                                    "id": request_id,
-                                    "code": str(err.response["Error"]["Code"]),
-                                    "detail": "Access denied to S3 file object, check permissions.",
-                                    "status": str(int(err.response["ResponseMetadata"]["HTTPStatusCode"])),
-                                }
-                            ]
-                        }
-                    ),
-                }
+            return func(event, _, current_span, identity, *args, **kwargs)
+        except Exception as err:  # pylint: disable=broad-except
+            mapping = APIGATEWAY_ERRORS.handle(err, current_span)
+            if mapping.body is not None:
+                body = mapping.body(err, request_id)
             else:
-                response = {
-                    "statusCode": int(err.response["ResponseMetadata"]["HTTPStatusCode"]),
-                    "headers": {"Content-Type": "application/vnd.api+json"},
-                    "body": json.dumps(
-                        {
-                            "errors": [
-                                {
-                                    "id": request_id,
-                                    "code": str(err.response["Error"]["Code"]),
-                                    "detail": str(err),
-                                    "status": str(int(err.response["ResponseMetadata"]["HTTPStatusCode"])),
-                                }
-                            ]
-                        }
-                    ),
-                }
-        except KeyError as key_error:
-            logging.exception(key_error)
-            current_span.record_exception(key_error, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{key_error}"))
-            response = {
-                "statusCode": 422,
-                "headers": {"Content-Type": "application/vnd.api+json"},
-                "body": json.dumps(
-                    {
-                        "errors": [
-                            {
-                                "id": request_id,
-                                "code": "Key Error",
-                                "title": "Key Error",
-                                "detail": f"{key_error}",
-                                "status": "422",
-                            }
-                        ]
-                    }
-                ),
-            }
-        except errors.ErrorBase as err:
-            logging.exception(err)
-            current_span.record_exception(err, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{err}"))
-            response = {
-                "statusCode": int(err.http_code),
-                "headers": {"Content-Type": "application/vnd.api+json"},
-                "body": json.dumps(
-                    {
-                        "errors": [
-                            {
-                                "id": request_id,
-                                "code": str(err.code),
-                                "title": err.title,
-                                "detail": str(err),
-                                "status": str(int(err.http_code)),
-                            }
-                        ]
-                    }
-                ),
-            }
-        except json.JSONDecodeError as json_decode_error:
-            logging.exception(json_decode_error)
-            current_span.record_exception(json_decode_error, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{json_decode_error}"))
-            response = {
-                "statusCode": 400,
-                "headers": {"Content-Type": "application/vnd.api+json"},
-                "body": json.dumps(
-                    {
-                        "errors": [
-                            {
-                                "id": request_id,
-                                "code": json_decode_error.__class__.__name__,
-                                "title": "Invalid JSON Error",
-                                "detail": f"{json_decode_error.msg}",
-                                "status": "400",
-                            }
-                        ]
-                    }
-                ),
+                body = {"errors": [mapping.error_object(err, request_id)]}
+            return {
+                "statusCode": mapping.status_code_of(err),
+                "headers": dict(JSON_API_HEADERS),
+                "body": json.dumps(body),
             }
 
-        except (ValidationError, IncorrectTypeError) as json_api_error:
-            logging.exception(json_api_error)
-            current_span.record_exception(json_api_error, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{json_api_error}"))
-            errs = json_api_error.messages
-            err_arr = errs if isinstance(errs, list) else errs.get("errors", [])
-            for error in err_arr:
-                error["id"] = request_id
-                error["status"] = "422"
-                error["title"] = "UnprocessableEntityError"
-
-            logging.info(errs)
-
-            response = {
-                "headers": {"Content-Type": "application/vnd.api+json"},
-                "statusCode": 422,
-                "body": json.dumps(err_arr),
-            }
-        except TypeError as type_error:
-            logging.exception(type_error)
-            current_span.record_exception(type_error, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{type_error}"))
-            response = {
-                "statusCode": 422,
-                "headers": {"Content-Type": "application/vnd.api+json"},
-                "body": json.dumps(
-                    {
-                        "errors": [
-                            {
-                                "id": request_id,
-                                "code": "Type Error",
-                                "title": "Type Error",
-                                "detail": f"{type_error}",
-                                "status": "422",
-                            }
-                        ]
-                    }
-                ),
-            }
-
-        except ValueError as value_error:
-            logging.exception(value_error)
-            current_span.record_exception(value_error, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{value_error}"))
-            response = {
-                "statusCode": 400,
-                "headers": {"Content-Type": "application/vnd.api+json"},
-                "body": json.dumps(
-                    {
-                        "errors": [
-                            {
-                                "id": request_id,
-                                "code": "ValueError",
-                                "title": "Value Error",
-                                "detail": f"{value_error}",
-                                "status": "400",
-                            }
-                        ]
-                    }
-                ),
-            }
-        except Exception as err:
-            logging.exception(err)
-            current_span.record_exception(err, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{err}"))
-            response = {
-                "statusCode": 400,
-                "headers": {"Content-Type": "application/vnd.api+json"},
-                "body": json.dumps(
-                    {
-                        "errors": [
-                            {
-                                "id": request_id,
-                                "code": "UnexpectedError",
-                                "title": "Unexpected Error",
-                                "detail": f"{err}",
-                                "status": "500",
-                            }
-                        ]
-                    }
-                ),
-            }
-        return response
-
     return wrapper
 
 
 def request_handler_error_responder(func):
     """Error handling responses for client handler"""
 
-    # pylint: disable=R0911, R0914
     @functools.wraps(func)
     def wrapper(method_name, parameters, *args, **kwargs):
         current_span = trace.get_current_span()
         try:
             return func(method_name, parameters, current_span, *args, **kwargs)
-        except errors.ErrorBase as err:
-            logging.exception(err)
-            current_span.record_exception(err, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{err}"))
-            return ResponsePayload(status_code=int(err.http_code), error_message=str(err), body="")
-        except ClientError as err:
-            logging.exception(err)
-            current_span.record_exception(err, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{err}"))
-            return ResponsePayload(
-                status_code=int(err.response["ResponseMetadata"]["HTTPStatusCode"]), error_message=str(err), body=""
-            )
-        except KeyError as err:
-            logging.exception(err)
-            current_span.record_exception(err, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{err}"))
-            return ResponsePayload(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, error_message=str(err), body="")
-        except json.JSONDecodeError as json_decode_error:
-            logging.exception(json_decode_error)
-            current_span.record_exception(json_decode_error, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{json_decode_error}"))
-            return ResponsePayload(status_code=HTTPStatus.BAD_REQUEST, error_message=str(json_decode_error), body="")
-        except TypeError as type_error:
-            logging.exception(type_error)
-            current_span.record_exception(type_error, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{type_error}"))
-            return ResponsePayload(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, error_message=str(type_error), body="")
-        except ValueError as value_error:
-            logging.exception(value_error)
-            current_span.record_exception(value_error, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{value_error}"))
-            return ResponsePayload(status_code=HTTPStatus.BAD_REQUEST, error_message=str(value_error), body="")
-        except ValidationError as err:
-            logging.exception(err)
-            current_span.record_exception(err, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{err}"))
-            return ResponsePayload(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, error_message=str(err), body="")
-        except Exception as err:
-            logging.exception(err)
-            current_span.record_exception(err, attributes={"error": True})
-            current_span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{err}"))
-            return ResponsePayload(status_code=HTTPStatus.BAD_REQUEST, error_message=str(err), body="")
+        except Exception as err:  # pylint: disable=broad-except
+            mapping = REQUEST_HANDLER_ERRORS.handle(err, current_span)
+            return _response_payload(status_code=mapping.status_code_of(err), error_message=str(err))
+
+    return wrapper
+
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """
+    :param accept_encoding: The ``Accept-Encoding`` header of a request
+    :return: The quality of each content coding the client accepts, ``*`` included
+    """
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, parameters = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        name, _, value = parameters.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: Optional[str], encodings=RESPONSE_COMPRESSION_ENCODINGS) -> Optional[str]:
+    """
+    Choose how to compress a response
+
+    :param accept_encoding: The ``Accept-Encoding`` header of the request
+    :param encodings: The content codings the service may use, in order of preference
+    :return: The available coding with the highest quality for the client, None to leave the response as is
+    """
+    accepted = _accepted_encodings(accept_encoding)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        if encoding == "br" and _brotli() is None:
+            continue
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def accepts_binary(accept: Optional[str], media_types=RESPONSE_COMPRESSION_MEDIA_TYPES) -> bool:
+    """
+    API Gateway only looks at the first media type of the ``Accept`` header to decide whether to decode a base64
+    body back to bytes
+
+    :param accept: The ``Accept`` header of the request
+    :param media_types: The binary media types of the API
+    :return: True when API Gateway decodes the base64 body of the response
+    """
+    first = (accept or "").split(",")[0].partition(";")[0].strip().lower()
+    return first in media_types
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return _brotli().compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def decode_request_body(func):
+    """
+    Hand API Gateway request bodies to the handler as text, API Gateway base64 encodes the body of requests whose
+    ``Content-Type`` is a binary media type of the API. Apply it below ``case_insensitive_headers``.
+    """
+
+    @functools.wraps(func)
+    def wrapper(event, *args, **kwargs):
+        if isinstance(event, dict) and event.get("isBase64Encoded") and isinstance(event.get("body"), str):
+            try:
+                body = base64.b64decode(event["body"]).decode("utf-8")
+            except ValueError:
+                logger.warning("Request body is not base64 encoded UTF-8 text, it is left encoded")
+            else:
+                event["body"] = body
+                event["isBase64Encoded"] = False
+        return func(event, *args, **kwargs)
+
+    return wrapper
+
+
+def compress_response(func):
+    """
+    Compress API Gateway responses whose body is at least ``RESPONSE_COMPRESSION_MIN_BYTES``, as the
+    ``Accept-Encoding`` header of the request allows, when its ``Accept`` header is a binary media type of the API.
+    Apply it below ``case_insensitive_headers``.
+    """
+
+    @functools.wraps(func)
+    def wrapper(event, *args, **kwargs):
+        response = func(event, *args, **kwargs)
+        if not RESPONSE_COMPRESSION_ENCODINGS or not isinstance(response, dict):
+            return response
+        body = response.get("body")
+        headers = response.get("headers") or {}
+        if not isinstance(body, str) or response.get("isBase64Encoded") or get_header(headers, "Content-Encoding"):
+            return response
+        data = body.encode("utf-8")
+        if len(data) < RESPONSE_COMPRESSION_MIN_BYTES:
+            return response
+
+        vary = get_header(headers, "Vary")
+        if not vary:
+            headers["Vary"] = "Accept-Encoding"
+        elif "accept-encoding" not in vary.lower():
+            headers["Vary"] = f"{vary}, Accept-Encoding"
+        response["headers"] = headers
+        encoding = negotiate_encoding(get_header(event.get("headers"), "Accept-Encoding"))
+        if encoding is None or not accepts_binary(get_header(event.get("headers"), "Accept")):
+            return response
+        response["body"] = base64.b64encode(_compress(data, encoding)).decode("ascii")
+        response["isBase64Encoded"] = True
+        headers["Content-Encoding"] = encoding
+        return response
 
     return wrapper
@@ -0,0 +1,272 @@
+"""
+Deferred Trace Export
+=====================
+
+Takes the export of spans off the response path of the client and API Gateway handlers.
+
+``export_trace`` flushes the span processors of the tracer provider before the handler returns, so the caller
+waits for the spans to reach the collector. With ``DEFERRED_TRACE_EXPORT`` set, ``deferred_export_trace``
+replaces each processor that has an exporter with a ``DeferredSpanProcessor`` of the same exporter, which:
+
+- buffers ended spans in memory, at most ``DEFERRED_TRACE_EXPORT_MAX_SPANS``, dropping and counting the rest
+- answers ``force_flush`` by waking its background thread, without waiting for the export
+- exports from that thread when asked to, when the buffer is full, or ``DEFERRED_TRACE_EXPORT_MAX_DELAY_SECONDS``
+  after the previous export
+- drains the buffer within ``DEFERRED_TRACE_EXPORT_SHUTDOWN_TIMEOUT_SECONDS`` on ``SIGTERM`` and at exit
+
+Lambda freezes the container once the response has been returned, so an export the thread had no time to finish
+carries on when the container is thawed by the next invocation, or is drained at shutdown.
+"""
+
+import atexit
+import functools
+import signal
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+from aws_lambda_powertools import Logger
+from config import (
+    DEFERRED_TRACE_EXPORT,
+    DEFERRED_TRACE_EXPORT_MAX_DELAY_SECONDS,
+    DEFERRED_TRACE_EXPORT_MAX_SPANS,
+    DEFERRED_TRACE_EXPORT_SHUTDOWN_TIMEOUT_SECONDS,
+)
+from evertz_io_observability.otel_collector import export_trace
+from opentelemetry import trace
+from opentelemetry.sdk.trace import SpanProcessor
+
+logger = Logger()
+
+
+class DeferredSpanProcessor(SpanProcessor):
+    """
+    Buffers ended spans and exports them from a background thread
+    """
+
+    def __init__(
+        self,
+        span_exporter,
+        max_spans: int = DEFERRED_TRACE_EXPORT_MAX_SPANS,
+        max_delay_seconds: float = DEFERRED_TRACE_EXPORT_MAX_DELAY_SECONDS,
+    ) -> None:
+        """
+        :param span_exporter: The exporter spans are handed to
+        :param max_spans: The maximum number of spans buffered
+        :param max_delay_seconds: The longest time spans stay buffered while the container runs
+        """
+        self.span_exporter = span_exporter
+        self.max_spans = max_spans
+        self.max_delay_seconds = max_delay_seconds
+        self.dropped_spans = 0
+        self._spans: deque = deque()
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def on_start(self, span, parent_context=None) -> None:
+        pass
+
+    def on_end(self, span) -> None:
+        if self._stopped or not span.context.trace_flags.sampled:
+            return
+        with self._lock:
+            if len(self._spans) >= self.max_spans:
+                self.dropped_spans += 1
+                return
+            self._spans.append(span)
+            full = len(self._spans) >= self.max_spans
+        if full:
+            self.flush_in_background()
+
+    def buffered_spans(self) -> int:
+        """
+        :return: The number of spans waiting to be exported
+        """
+        with self._lock:
+            return len(self._spans)
+
+    def flush_in_background(self) -> None:
+        """
+        Wake the background thread to export the buffered spans
+        """
+        self._ensure_thread()
+        self._flush_requested.set()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """
+        Called by ``export_trace`` before the handler returns, the export is left to the background thread
+
+        :param timeout_millis: Unused, nothing is waited for
+        :return: True
+        """
+        self.flush_in_background()
+        return True
+
+    def drain(self, timeout_seconds: float) -> bool:
+        """
+        Export the buffered spans from the calling thread
+
+        :param timeout_seconds: How long to wait for an export of the background thread to finish first
+        :return: True when every buffered span was handed to the exporter
+        """
+        if not self._export_lock.acquire(timeout=max(timeout_seconds, 0)):  # pylint: disable=consider-using-with
+            return False
+        try:
+            self._export_buffered()
+        finally:
+            self._export_lock.release()
+        return self.buffered_spans() == 0
+
+    def shutdown(self, timeout_seconds: float = DEFERRED_TRACE_EXPORT_SHUTDOWN_TIMEOUT_SECONDS) -> None:
+        """
+        Drain the buffer and shut the exporter down, spans ended afterwards are dropped
+
+        :param timeout_seconds: How long the drain may take
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        self._flush_requested.set()
+        if not self.drain(timeout_seconds):
+            logger.warning(f"Dropped [{self.buffered_spans()}] spans that could not be exported at shutdown")
+        if self.dropped_spans:
+            logger.warning(f"Dropped [{self.dropped_spans}] spans ended while the export buffer was full")
+        self.span_exporter.shutdown()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="deferred-trace-export", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._flush_requested.wait(self.max_delay_seconds)
+            self._flush_requested.clear()
+            if self._stopped:
+                return
+            with self._export_lock:
+                self._export_buffered()
+
+    def _export_buffered(self) -> None:
+        with self._lock:
+            spans = list(self._spans)
+            self._spans.clear()
+        if not spans:
+            return
+        try:
+            self.span_exporter.export(spans)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(f"Failed to export [{len(spans)}] spans")
+
+
+_processors: List[DeferredSpanProcessor] = []
+_install_lock = threading.Lock()
+
+
+def _deferred(span_processor):
+    """
+    :param span_processor: A span processor of the tracer provider
+    :return: A deferred processor of its exporter, or the processor itself when it has no exporter
+    """
+    if isinstance(span_processor, DeferredSpanProcessor):
+        return span_processor
+    span_exporter = getattr(span_processor, "span_exporter", None)
+    if span_exporter is None:
+        return span_processor
+    # Spans the processor already holds are exported by it, it is left without new ones afterwards
+    span_processor.force_flush()
+    deferred = DeferredSpanProcessor(span_exporter)
+    _processors.append(deferred)
+    return deferred
+
+
+def install(tracer_provider=None) -> List[DeferredSpanProcessor]:
+    """
+    Replace the span processors of an SDK tracer provider with deferred ones, once
+
+    :param tracer_provider: The tracer provider, the global one by default
+    :return: The deferred processors installed so far
+    """
+    tracer_provider = tracer_provider or trace.get_tracer_provider()
+    multi_span_processor = getattr(tracer_provider, "_active_span_processor", None)
+    span_processors = getattr(multi_span_processor, "_span_processors", None)
+    if span_processors is None:
+        return list(_processors)
+    with _install_lock:
+        span_processors = multi_span_processor._span_processors  # pylint: disable=protected-access
+        if not all(isinstance(processor, DeferredSpanProcessor) for processor in span_processors):
+            multi_span_processor._span_processors = tuple(  # pylint: disable=protected-access
+                _deferred(processor) for processor in span_processors
+            )
+        return list(_processors)
+
+
+def flush_in_background() -> None:
+    """
+    Export the spans buffered by every deferred processor from their background threads
+    """
+    for processor in list(_processors):
+        processor.flush_in_background()
+
+
+def drain(timeout_seconds: float = DEFERRED_TRACE_EXPORT_SHUTDOWN_TIMEOUT_SECONDS) -> None:
+    """
+    Shut every deferred processor down, sharing the time left between them
+
+    :param timeout_seconds: How long all of them may take
+    """
+    deadline = time.monotonic() + timeout_seconds
+    for processor in list(_processors):
+        processor.shutdown(deadline - time.monotonic())
+
+
+def _on_sigterm(previous_handler: Callable):
+    def handler(signum, frame):
+        drain()
+        if callable(previous_handler):
+            previous_handler(signum, frame)
+        elif previous_handler != signal.SIG_IGN:
+            raise SystemExit(0)
+
+    return handler
+
+
+def _register_shutdown_drain() -> None:
+    atexit.register(drain)
+    try:
+        signal.signal(signal.SIGTERM, _on_sigterm(signal.getsignal(signal.SIGTERM)))
+    except ValueError:
+        logger.warning("Spans are only drained at exit, SIGTERM can only be handled from the main thread")
+
+
+def deferred_export_trace(func):
+    """
+    ``export_trace`` that leaves the export to a background thread when ``DEFERRED_TRACE_EXPORT`` is set,
+    apply it where ``export_trace`` was
+    """
+    exported = export_trace(func)
+    if not DEFERRED_TRACE_EXPORT:
+        return exported
+
+    @functools.wraps(func)
+    def wrapper(event, context):
+        install()
+        try:
+            return exported(event, context)
+        finally:
+            # export_trace may only set the tracer provider up on its first invocation
+            install()
+            flush_in_background()
+
+    return wrapper
+
+
+if DEFERRED_TRACE_EXPORT:
+    _register_shutdown_drain()
@@ -0,0 +1,176 @@
+"""
+Error Mapping
+=============
+
+Maps the exceptions raised while handling a request to responses, for both handlers.
+
+An ``ErrorMapper`` holds an ordered table of ``ErrorMapping``, matched like the ``except`` clauses they
+replace: the first mapping whose exception types the error is an instance of wins, and the match is
+remembered per exception type. Constant fields of the JSON:API error of a mapping are built once, only the
+fields that depend on the error are filled per request.
+
+Expected client errors are cheap. Their traceback is neither formatted for the log nor recorded on the span,
+except for a sampled fraction of them; server errors, and errors of mappings marked ``unexpected``, always
+have their traceback logged and recorded. Bare built-in exceptions usually are bugs rather than bad
+requests, so their mappings are marked ``unexpected`` whatever status code they answer with.
+"""
+
+import logging
+import random
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Type, Union
+
+from opentelemetry.trace import Span, Status, StatusCode
+
+ExceptionTypes = Union[Type[BaseException], Tuple[Type[BaseException], ...]]
+"""
+Exception types, or a function returning them so that they are only imported once an error needs them
+"""
+
+Field = Union[None, int, str, Callable[[BaseException], Any]]
+"""
+A value of a response, or a function computing it from the error
+"""
+
+
+def _resolve(value: Field, err: BaseException) -> Any:
+    return value(err) if callable(value) else value
+
+
+class ErrorMapping:
+    """
+    The response to an exception type
+    """
+
+    # pylint: disable=too-many-arguments, too-many-instance-attributes
+    def __init__(
+        self,
+        exception_types: Union[ExceptionTypes, Callable[[], ExceptionTypes]],
+        status_code: Field,
+        code: Field = None,
+        title: Field = None,
+        detail: Callable[[BaseException], str] = str,
+        status: Optional[str] = None,
+        body: Optional[Callable[[BaseException, Optional[str]], Any]] = None,
+        unexpected: bool = False,
+    ) -> None:
+        """
+        :param exception_types: The exception types answered by this mapping
+        :param status_code: The HTTP status code of the response
+        :param code: The ``code`` of the JSON:API error
+        :param title: The ``title`` of the JSON:API error, left out when None
+        :param detail: Computes the ``detail`` of the JSON:API error
+        :param status: The ``status`` of the JSON:API error, defaults to the status code
+        :param body: Builds the whole body from the error and the request id instead of a JSON:API error
+        :param unexpected: The error is a server error whatever its status code, its traceback is always logged
+        """
+        self._exception_types = exception_types
+        self.status_code = status_code
+        self.code = code
+        self.title = title
+        self.detail = detail
+        self.status = status
+        self.body = body
+        self.unexpected = unexpected
+        self._template: Dict[str, Any] = {"id": None, "code": code}
+        if title is not None:
+            self._template["title"] = title
+        self._template["detail"] = None
+        self._template["status"] = status if status is not None or callable(status_code) else str(status_code)
+
+    @property
+    def exception_types(self) -> ExceptionTypes:
+        """
+        :return: The exception types answered by this mapping
+        """
+        if isinstance(self._exception_types, (type, tuple)):
+            return self._exception_types
+        return self._exception_types()
+
+    def status_code_of(self, err: BaseException) -> int:
+        """
+        :param err: The error
+        :return: The HTTP status code of the response to the error
+        """
+        return int(_resolve(self.status_code, err))
+
+    def is_server_error(self, err: BaseException) -> bool:
+        """
+        :param err: The error
+        :return: True when the error is not the fault of the client
+        """
+        return self.unexpected or self.status_code_of(err) >= HTTPStatus.INTERNAL_SERVER_ERROR
+
+    def error_object(self, err: BaseException, request_id: Optional[str]) -> Dict[str, Any]:
+        """
+        :param err: The error
+        :param request_id: The id of the request that failed
+        :return: The JSON:API error of the response
+        """
+        error = dict(self._template)
+        error["id"] = request_id
+        if callable(self.code):
+            error["code"] = self.code(err)
+        if callable(self.title):
+            error["title"] = self.title(err)
+        error["detail"] = self.detail(err)
+        if error["status"] is None:
+            error["status"] = str(self.status_code_of(err))
+        return error
+
+
+class ErrorMapper:
+    """
+    Looks up the mapping of an error and reports the error
+    """
+
+    def __init__(
+        self,
+        mappings: Iterable[ErrorMapping],
+        traceback_sample_rate: float,
+        sample: Callable[[], float] = random.random,
+    ) -> None:
+        """
+        :param mappings: The mappings in the order they are matched, the last one should answer ``Exception``
+        :param traceback_sample_rate: The fraction of client errors whose traceback is logged and recorded
+        :param sample: Returns a number in [0, 1) per client error, compared with the sample rate
+        """
+        self.mappings = list(mappings)
+        self.traceback_sample_rate = traceback_sample_rate
+        self._sample = sample
+        self._by_type: Dict[type, ErrorMapping] = {}
+
+    def mapping_for(self, err: BaseException) -> ErrorMapping:
+        """
+        :param err: The error
+        :return: The first mapping answering the error
+        :raises err: When no mapping answers it
+        """
+        mapping = self._by_type.get(type(err))
+        if mapping is None:
+            mapping = next((mapping for mapping in self.mappings if isinstance(err, mapping.exception_types)), None)
+            if mapping is None:
+                raise err
+            self._by_type[type(err)] = mapping
+        return mapping
+
+    def handle(self, err: BaseException, span: Span) -> ErrorMapping:
+        """
+        Log the error and record it on the span, with its traceback for server errors and sampled client errors
+
+        :param err: The error
+        :param span: The span of the request
+        :return: The mapping answering the error
+        """
+        mapping = self.mapping_for(err)
+        if mapping.is_server_error(err) or self._sample() < self.traceback_sample_rate:
+            logging.exception(err)
+            span.record_exception(err, attributes={"error": True})
+        else:
+            logging.warning(f"{type(err).__name__}: {err}")
+            span.add_event(
+                "exception",
+                attributes={"exception.type": type(err).__name__, "exception.message": str(err), "error": True},
+            )
+        span.set_status(status=Status(status_code=StatusCode.ERROR, description=f"{err}"))
+        return mapping
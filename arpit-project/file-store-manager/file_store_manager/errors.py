@@ -139,3 +139,35 @@ class FilestoreNameAlreadyExists(ClientBadRequest):
 
     def __init__(self, name: Optional[str] = "UNKNOWN") -> None:
         super().__init__(f"File store exists with the same name [{name}]")
+
+
+class IdempotentRequestInProgress(ErrorBase):
+    """
+    This error is raised when a request is retried while the first request with the same idempotency key
+    is still running
+    """
+
+    http_code = HTTPStatus.CONFLICT
+
+    def __init__(self, idempotency_key: Optional[str] = "UNKNOWN") -> None:
+        super().__init__(f"A request with idempotency key [{idempotency_key}] is already in progress")
+
+
+class IdempotencyKeyMismatch(ErrorBase):
+    """
+    This error is raised when an idempotency key is reused with a different request
+    """
+
+    http_code = HTTPStatus.UNPROCESSABLE_ENTITY
+
+    def __init__(self, idempotency_key: Optional[str] = "UNKNOWN") -> None:
+        super().__init__(f"Idempotency key [{idempotency_key}] was already used with a different request")
+
+
+class MetadataKeyNotIndexed(ClientBadRequest):
+    """
+    This error is raised when File Stores are queried on a metadata key that is not indexed
+    """
+
+    def __init__(self, key: Optional[str] = "UNKNOWN") -> None:
+        super().__init__(f"Metadata key [{key}] is not indexed")
@@ -0,0 +1,205 @@
+"""
+FileStore Export
+================
+
+Dumps the FileStores of every tenant for analytics, backups and migrations.
+
+The table is read with a parallel ``Scan`` split into segments, one worker per segment. Every item is loaded
+through the DB schema and written as one JSON line to a gzip compressed NDJSON file per segment. Each page
+is appended as its own gzip member, after which a checkpoint file records the key of the next page and the
+size of the output, so an interrupted export resumes where each of its segments stopped without
+duplicating lines. The workers share a budget of read capacity units per second.
+
+Usage::
+
+    FILE_STORE_DYNAMODB_TABLE=<table> python export.py <output dir> --segments 8 --max-rcu 100
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+from aws_lambda_powertools import Logger
+from capacity import CapacityLimiter
+from db import scan_file_stores_segment
+from file_store_client.schemas.file_store import FILE_STORE_DB_SCHEMA, FILE_STORE_SCHEMA
+from marshmallow import ValidationError
+
+logger = Logger()
+
+EXPORTED = "exported"
+SKIPPED = "skipped"
+PAGES = "pages"
+
+DEFAULT_SEGMENTS = 4
+DEFAULT_PAGE_SIZE = 100
+
+
+def segment_file_name(segment: int, total_segments: int) -> str:
+    """
+    :param segment: The segment
+    :param total_segments: The number of segments of the export
+    :return: The name of the NDJSON file of the segment
+    """
+    return f"file-stores-{segment:04d}-of-{total_segments:04d}.ndjson.gz"
+
+
+def _checkpoint_path(output_dir: str, segment: int, total_segments: int) -> str:
+    return os.path.join(output_dir, f"file-stores-{segment:04d}-of-{total_segments:04d}.checkpoint.json")
+
+
+def _read_checkpoint(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as checkpoint_file:
+        return json.load(checkpoint_file)
+
+
+def _write_checkpoint(path: str, checkpoint: dict) -> None:
+    """
+    Replace the checkpoint of a segment in one step, a crash leaves either the previous or the new one
+
+    :param path: The path of the checkpoint file
+    :param checkpoint: The progress of the segment
+    """
+    with open(path + ".tmp", "w", encoding="utf-8") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file, default=_json_default)
+    os.replace(path + ".tmp", path)
+
+
+def _json_default(value):
+    """
+    Numbers inside ``metadata`` come back from DynamoDB as ``Decimal``
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _to_lines(items: List[dict]) -> Tuple[List[str], int]:
+    """
+    Load the items of a page through the DB schema and serialise them as JSON lines
+
+    :param items: The stored ``data`` of the FileStores of a page
+    :return: The lines and the number of items that failed to load
+    """
+    lines = []
+    skipped = 0
+    for item in items:
+        try:
+            file_store = FILE_STORE_DB_SCHEMA.load(item)
+        except ValidationError as err:
+            logger.warning(f"Skipping FileStore [{item.get('id')}] of tenant [{item.get('tenant')}]: {err.messages}")
+            skipped += 1
+            continue
+        lines.append(json.dumps(FILE_STORE_SCHEMA.dump(file_store), default=_json_default) + "\n")
+    return lines, skipped
+
+
+def export_segment(
+    output_dir: str, segment: int, total_segments: int, limiter: CapacityLimiter, page_size: int = DEFAULT_PAGE_SIZE
+) -> Counter:
+    """
+    Export one segment of the table, resuming from its checkpoint
+
+    :param output_dir: The directory of the export
+    :param segment: The segment to export
+    :param total_segments: The number of segments of the export
+    :param limiter: The read capacity budget shared by the segments
+    :param page_size: The maximum number of items read per Scan request
+    :return: The number of FileStores exported and skipped, and the number of pages read, by this call
+    """
+    data_path = os.path.join(output_dir, segment_file_name(segment, total_segments))
+    checkpoint_path = _checkpoint_path(output_dir, segment, total_segments)
+    checkpoint = _read_checkpoint(checkpoint_path) or {"lastEvaluatedKey": None, "size": 0, "done": False}
+    counts = Counter()
+    if checkpoint["done"]:
+        logger.info(f"Segment [{segment}] was already exported")
+        return counts
+
+    # Drop anything written after the last checkpoint, it is read again
+    with open(data_path, "ab") as data_file:
+        data_file.truncate(checkpoint["size"])
+
+    exclusive_start_key = checkpoint["lastEvaluatedKey"]
+    while True:
+        items, exclusive_start_key, consumed_capacity = scan_file_stores_segment(
+            segment, total_segments, limit=page_size, exclusive_start_key=exclusive_start_key
+        )
+        lines, skipped = _to_lines(items)
+        if lines:
+            with gzip.open(data_path, "at", encoding="utf-8") as data_file:
+                data_file.writelines(lines)
+        counts.update({EXPORTED: len(lines), SKIPPED: skipped, PAGES: 1})
+
+        checkpoint = {
+            "lastEvaluatedKey": exclusive_start_key,
+            "size": os.path.getsize(data_path),
+            "done": exclusive_start_key is None,
+        }
+        _write_checkpoint(checkpoint_path, checkpoint)
+        limiter.consume(consumed_capacity)
+        if exclusive_start_key is None:
+            return counts
+
+
+def export_file_stores(
+    output_dir: str,
+    total_segments: int = DEFAULT_SEGMENTS,
+    max_rcu_per_second: float = 0,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> Counter:
+    """
+    Export the FileStores of every tenant, one worker per segment
+
+    Running it again with the same output directory and number of segments resumes an interrupted export.
+
+    :param output_dir: The directory of the export, created when missing
+    :param total_segments: The number of segments, and of workers
+    :param max_rcu_per_second: The read capacity budget of the export, unlimited when 0
+    :param page_size: The maximum number of items read per Scan request
+    :return: The number of FileStores exported and skipped, and the number of pages read
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    limiter = CapacityLimiter(max_rcu_per_second)
+    started = time.monotonic()
+
+    counts = Counter()
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        futures = [
+            executor.submit(export_segment, output_dir, segment, total_segments, limiter, page_size)
+            for segment in range(total_segments)
+        ]
+        for future in futures:
+            counts.update(future.result())
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Exported [{counts[EXPORTED]}] FileStores, skipped [{counts[SKIPPED]}], in [{elapsed:.2f}]s"
+        f" consuming [{limiter.consumed:.1f}] RCU"
+    )
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Export the FileStore table to gzip compressed NDJSON")
+    parser.add_argument("output_dir", help="Directory of the export, reuse it to resume an interrupted export")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS, help="Number of parallel Scan segments")
+    parser.add_argument("--max-rcu", type=float, default=0, help="Read capacity units per second, 0 for no limit")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Items per Scan request")
+    args = parser.parse_args(argv)
+    counts = export_file_stores(args.output_dir, args.segments, args.max_rcu, args.page_size)
+    print(json.dumps(dict(counts)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+HTTP Caching
+============
+
+Validators and cache policies for the GET endpoints of the API Gateway handlers.
+
+Handlers serving a FileStore know its ETag and modification time before they serialize it, and answer with
+``conditional_response`` so that a client whose copy is still current gets a ``304 Not Modified`` without the
+body being built. ``http_caching`` covers every other GET response: it adds the ``Cache-Control`` of the route
+and, when the handler set no ETag, one computed from the body. CORS headers are added by ``add_cors_headers``
+further out, so they apply to 304 responses too.
+"""
+
+import datetime
+import functools
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+from decorators import get_header
+
+if TYPE_CHECKING:
+    from file_store_client.schemas.file_store import FileStore
+
+CACHEABLE_METHODS = ("GET", "HEAD")
+
+
+class CachePolicy:
+    """
+    How the responses of a route may be cached
+    """
+
+    def __init__(self, cache_control: str, etag_from_body: bool = True) -> None:
+        """
+        :param cache_control: The ``Cache-Control`` header of the responses
+        :param etag_from_body: Compute an ETag from the body of responses that have none
+        """
+        self.cache_control = cache_control
+        self.etag_from_body = etag_from_body
+
+
+DEFAULT_CACHE_POLICY = CachePolicy("private, no-cache")
+"""
+Responses depend on the caller, and are revalidated before a cached copy is used
+"""
+
+CACHE_POLICIES: Dict[str, CachePolicy] = {
+    "GET /hello-world": CachePolicy("private, max-age=300"),
+}
+"""
+``<method> <resource>`` -> the policy of the route
+"""
+
+
+def cache_policy(event: dict) -> CachePolicy:
+    """
+    :param event: The API Gateway event
+    :return: The cache policy of the route of the request
+    """
+    return CACHE_POLICIES.get(f"{event.get('httpMethod')} {event.get('resource')}", DEFAULT_CACHE_POLICY)
+
+
+def _as_utc(timestamp: datetime.datetime) -> datetime.datetime:
+    """
+    Modification times are stored without a timezone in UTC
+    """
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=datetime.timezone.utc)
+    return timestamp.astimezone(datetime.timezone.utc)
+
+
+def http_date(timestamp: datetime.datetime) -> str:
+    """
+    :param timestamp: A point in time
+    :return: The timestamp as an HTTP date, e.g. ``Mon, 26 Apr 2021 15:31:16 GMT``
+    """
+    return format_datetime(_as_utc(timestamp), usegmt=True)
+
+
+def etag(*parts) -> str:
+    """
+    :param parts: What the representation depends on
+    :return: A weak ETag, compressed and uncompressed representations are equivalent
+    """
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def file_store_etag(file_store: "FileStore") -> str:
+    """
+    FileStores have no version number, their modification time changes on every update and their state changes
+    without one
+
+    :param file_store: A FileStore
+    :return: The ETag of the FileStore
+    """
+    return etag(file_store.id, file_store.state, _as_utc(file_store.modification_info.last_modified).isoformat())
+
+
+def _opaque_tag(entity_tag: str) -> str:
+    entity_tag = entity_tag.strip()
+    return entity_tag[2:] if entity_tag.startswith("W/") else entity_tag
+
+
+def is_not_modified(event: dict, entity_tag: str, last_modified: Optional[datetime.datetime] = None) -> bool:
+    """
+    Evaluate the conditional headers of a GET request, ``If-None-Match`` takes precedence over
+    ``If-Modified-Since``
+
+    :param event: The API Gateway event
+    :param entity_tag: The current ETag of the resource
+    :param last_modified: The current modification time of the resource
+    :return: True when the copy of the client is current
+    """
+    headers = event.get("headers")
+    if_none_match = get_header(headers, "If-None-Match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        current = _opaque_tag(entity_tag)
+        return any(_opaque_tag(candidate) == current for candidate in if_none_match.split(","))
+
+    if_modified_since = get_header(headers, "If-Modified-Since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    return _as_utc(last_modified).replace(microsecond=0) <= since
+
+
+def _validator_headers(event: dict, entity_tag: str, last_modified: Optional[datetime.datetime]) -> dict:
+    headers = {"ETag": entity_tag, "Cache-Control": cache_policy(event).cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified_response(event: dict, entity_tag: str, last_modified: Optional[datetime.datetime] = None) -> dict:
+    """
+    :param event: The API Gateway event
+    :param entity_tag: The current ETag of the resource
+    :param last_modified: The current modification time of the resource
+    :return: A ``304 Not Modified`` response
+    """
+    return {
+        "statusCode": int(HTTPStatus.NOT_MODIFIED),
+        "headers": _validator_headers(event, entity_tag, last_modified),
+        "body": "",
+    }
+
+
+def conditional_response(
+    event: dict,
+    entity_tag: str,
+    last_modified: Optional[datetime.datetime],
+    build_response: Callable[[], dict],
+) -> dict:
+    """
+    Answer a GET request with a 304 when the copy of the client is current, before the body is serialized
+
+    :param event: The API Gateway event
+    :param entity_tag: The current ETag of the resource, e.g. from ``file_store_etag``
+    :param last_modified: The current modification time of the resource
+    :param build_response: Builds the full response, only called when the resource was modified
+    :return: The response, with its validators and cache policy
+    """
+    if event.get("httpMethod") in CACHEABLE_METHODS and is_not_modified(event, entity_tag, last_modified):
+        return not_modified_response(event, entity_tag, last_modified)
+    response = build_response()
+    response["headers"] = {**(response.get("headers") or {}), **_validator_headers(event, entity_tag, last_modified)}
+    return response
+
+
+def http_caching(func):
+    """
+    Add the cache policy of the route to successful GET responses, with an ETag computed from the body when the
+    handler set none. Apply it inside ``apigateway_error_responder``.
+    """
+
+    @functools.wraps(func)
+    def wrapper(event, *args, **kwargs):
+        response = func(event, *args, **kwargs)
+        if event.get("httpMethod") not in CACHEABLE_METHODS or not isinstance(response, dict):
+            return response
+        if response.get("statusCode") != HTTPStatus.OK:
+            return response
+
+        headers = response.get("headers") or {}
+        policy = cache_policy(event)
+        if get_header(headers, "Cache-Control") is None:
+            headers["Cache-Control"] = policy.cache_control
+        entity_tag = get_header(headers, "ETag")
+        if entity_tag is None and policy.etag_from_body and isinstance(response.get("body"), str):
+            entity_tag = etag(response["body"])
+            headers["ETag"] = entity_tag
+        response["headers"] = headers
+
+        if entity_tag is not None and is_not_modified(event, entity_tag):
+            return {"statusCode": int(HTTPStatus.NOT_MODIFIED), "headers": headers, "body": ""}
+        return response
+
+    return wrapper
@@ -0,0 +1,207 @@
+"""
+Memory Tracking
+===============
+
+Measures the memory used by invocations of the client and API Gateway handlers with ``tracemalloc``, when
+``MEMORY_TRACKING`` is set, to right-size the memory of the functions and catch caches that keep growing.
+
+For each invocation ``track_memory`` publishes, as EMF metrics and attributes of the handler span:
+
+- ``MemoryPeak``: the most memory the invocation allocated at once, above what was held when it started
+- ``MemoryRetained``: the memory the invocation left allocated when it returned, e.g. in caches
+- ``MemoryMaxRss``: the high-water mark of the resident memory of the container
+- ``MemoryGrowth``: how much the memory held between invocations grew over the last ``MEMORY_GROWTH_WINDOW``
+  invocations, once that many ran. Growth over every one of them above ``MEMORY_GROWTH_THRESHOLD_BYTES`` is
+  logged as a possible leak
+
+With ``MEMORY_ALLOCATION_SITES`` set, ``allocation_sites`` also records the source lines whose allocations a
+block left behind. It is used for the loading and dumping of lists of FileStores, and its top
+``MEMORY_TOP_ALLOCATIONS`` lines are logged with the invocation. Comparing two snapshots takes time proportional
+to the number of live allocations, so only the first list of an invocation is recorded. Snapshots allocate too,
+so ``MemoryPeak`` is read before each of them and ``tracemalloc`` resets its peak once they are released.
+"""
+
+import functools
+import os
+import resource
+import tracemalloc
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from aws_lambda_powertools import Logger, Metrics
+from aws_lambda_powertools.metrics import MetricUnit
+from config import (
+    MEMORY_ALLOCATION_SITES,
+    MEMORY_GROWTH_THRESHOLD_BYTES,
+    MEMORY_GROWTH_WINDOW,
+    MEMORY_TOP_ALLOCATIONS,
+    MEMORY_TRACKING,
+    PROJECT,
+)
+from opentelemetry import trace
+
+logger = Logger()
+metrics = Metrics(namespace=PROJECT, service=PROJECT)
+
+_IGNORED_FILES = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+
+_allocation_sites: Dict[str, Counter] = {}
+_retained_history: deque = deque(maxlen=max(MEMORY_GROWTH_WINDOW, 2))
+
+_sites_recorded = False
+"""
+Whether the snapshots of the current invocation were taken
+"""
+
+_peak_outside_snapshots = 0
+"""
+The highest peak of the current invocation read before a snapshot, snapshots reset the peak of tracemalloc
+"""
+
+
+def start() -> None:
+    """
+    Start tracing allocations, when ``MEMORY_TRACKING`` is set
+    """
+    if MEMORY_TRACKING and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def _record_peak(overhead: int = 0) -> None:
+    """
+    :param overhead: Memory held by a snapshot during the block, left out of the peak
+    """
+    global _peak_outside_snapshots  # pylint: disable=global-statement
+    _peak_outside_snapshots = max(_peak_outside_snapshots, tracemalloc.get_traced_memory()[1] - overhead)
+
+
+@contextmanager
+def allocation_sites(name: str) -> Iterator[None]:
+    """
+    Record the source lines whose allocations a block left behind, when ``MEMORY_ALLOCATION_SITES`` is set and
+    allocations are traced, for the first block of an invocation
+
+    :param name: The path the block belongs to, e.g. ``SchemaLoad``
+    """
+    global _sites_recorded  # pylint: disable=global-statement
+    if not MEMORY_ALLOCATION_SITES or _sites_recorded or not tracemalloc.is_tracing():
+        yield
+        return
+    _sites_recorded = True
+
+    _record_peak()
+    held = tracemalloc.get_traced_memory()[0]
+    before = tracemalloc.take_snapshot().filter_traces(_IGNORED_FILES)
+    overhead = tracemalloc.get_traced_memory()[0] - held
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        _record_peak(overhead)
+        after = tracemalloc.take_snapshot().filter_traces(_IGNORED_FILES)
+        sites = _allocation_sites.setdefault(name, Counter())
+        for statistic in after.compare_to(before, "lineno")[:MEMORY_TOP_ALLOCATIONS]:
+            if statistic.size_diff > 0:
+                frame = statistic.traceback[0]
+                sites[f"{os.path.basename(frame.filename)}:{frame.lineno}"] += statistic.size_diff
+        del before, after
+        tracemalloc.reset_peak()
+
+
+def top_allocation_sites() -> Dict[str, List[str]]:
+    """
+    :return: The source lines that allocated the most on each path since the invocation started, as
+        ``<file>:<line> <bytes>``
+    """
+    return {
+        name: [f"{site} {size}" for site, size in sites.most_common(MEMORY_TOP_ALLOCATIONS)]
+        for name, sites in _allocation_sites.items()
+    }
+
+
+def max_rss_bytes() -> int:
+    """
+    :return: The high-water mark of the resident memory of the process, Linux reports it in kilobytes
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def record_retained(retained: int) -> Optional[int]:
+    """
+    Add the memory held at the end of an invocation to the history of the warm container
+
+    :param retained: The memory held
+    :return: How much it grew over the window, None until the window is full
+    """
+    _retained_history.append(retained)
+    if len(_retained_history) < _retained_history.maxlen:
+        return None
+    growth = _retained_history[-1] - _retained_history[0]
+    steps = [after - before for before, after in zip(_retained_history, list(_retained_history)[1:])]
+    if growth > MEMORY_GROWTH_THRESHOLD_BYTES and all(step > 0 for step in steps):
+        logger.warning(
+            f"Memory held between invocations grew by [{growth}] bytes over the last [{len(steps)}] invocations"
+        )
+    return growth
+
+
+def reset() -> None:
+    """
+    Forget the allocation sites and the peak of the previous invocation
+    """
+    global _sites_recorded, _peak_outside_snapshots  # pylint: disable=global-statement
+    _allocation_sites.clear()
+    _sites_recorded = False
+    _peak_outside_snapshots = 0
+
+
+def _publish(span, started: int) -> None:
+    current, peak = tracemalloc.get_traced_memory()
+    peak = max(peak, _peak_outside_snapshots)
+    values = {
+        "MemoryPeak": (max(peak - started, 0), MetricUnit.Bytes),
+        "MemoryRetained": (current - started, MetricUnit.Bytes),
+        "MemoryMaxRss": (max_rss_bytes(), MetricUnit.Bytes),
+    }
+    growth = record_retained(current)
+    if growth is not None:
+        values["MemoryGrowth"] = (growth, MetricUnit.Bytes)
+    for name, (value, unit) in values.items():
+        metrics.add_metric(name=name, unit=unit, value=value)
+
+    sites = top_allocation_sites()
+    if sites:
+        logger.info(f"Top allocation sites {sites}")
+    if span.is_recording():
+        span.set_attributes(
+            {f"memory.{name[len('Memory'):].lower()}_bytes": value for name, (value, _) in values.items()}
+        )
+        for name, lines in sites.items():
+            span.set_attribute(f"memory.allocation_sites.{name.lower()}", lines)
+
+
+def track_memory(func):
+    """
+    Publish the memory used by each invocation when ``MEMORY_TRACKING`` is set, apply it inside
+    ``publish_stage_metrics`` so that the metrics are flushed with the stage metrics
+    """
+    if not MEMORY_TRACKING:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(event, context, *args, **kwargs):
+        start()
+        reset()
+        tracemalloc.reset_peak()
+        started = tracemalloc.get_traced_memory()[0]
+        span = trace.get_current_span()
+        try:
+            return func(event, context, *args, **kwargs)
+        finally:
+            _publish(span, started)
+
+    return wrapper
+
+
+start()
@@ -0,0 +1,261 @@
+"""
+Profiling
+=========
+
+Profiles the CPU time of selected invocations of the client and API Gateway handlers, in a warm container.
+
+An invocation is profiled when it is sampled at ``PROFILING_INVOCATION_RATE``, or, with
+``PROFILING_HEADER_ENABLED``, when an API Gateway request has the ``X-Profile`` header. The header may name the
+profiler to use. Any caller can send the header, so a container profiles at most
+``PROFILING_HEADER_MAX_PER_MINUTE`` requests for it. Two profilers are available:
+
+- ``sampling`` records the stack of the handler thread every ``PROFILING_SAMPLING_INTERVAL_SECONDS`` from
+  another thread, and writes it as collapsed stacks, the input of flame graph tools. The handler is not slowed
+  down by more than the cost of reading its stack
+- ``cprofile`` records every call, and writes pstats. Every call is slower while it runs
+
+A profile is handed to the sink, which writes it to ``PROFILING_DIRECTORY`` unless another one is set with
+``set_sink``. Its name is the request id, and is added to the handler span as ``profile.name``.
+"""
+
+import cProfile
+import functools
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, Optional
+
+from aws_lambda_powertools import Logger
+from config import (
+    PROFILER,
+    PROFILING_DIRECTORY,
+    PROFILING_HEADER_ENABLED,
+    PROFILING_HEADER_MAX_PER_MINUTE,
+    PROFILING_INVOCATION_RATE,
+    PROFILING_MAX_FILES,
+    PROFILING_SAMPLING_INTERVAL_SECONDS,
+)
+from decorators import get_header
+from opentelemetry import trace
+
+logger = Logger()
+
+SAMPLING = "sampling"
+CPROFILE = "cprofile"
+PROFILERS = (SAMPLING, CPROFILE)
+
+PROFILE_HEADER = "X-Profile"
+
+EXTENSIONS = {SAMPLING: "collapsed", CPROFILE: "pstats"}
+
+Sink = Callable[[str, str, bytes], None]
+"""
+(name, extension, content) -> None
+"""
+
+_header_profiles: deque = deque()
+"""
+Monotonic times of the requests profiled for the ``X-Profile`` header during the last minute
+"""
+
+_header_profiles_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Counts the stacks of one thread, sampled from a background thread
+    """
+
+    def __init__(self, interval_seconds: float = PROFILING_SAMPLING_INTERVAL_SECONDS) -> None:
+        """
+        :param interval_seconds: Time between two samples
+        """
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter = Counter()
+        self._thread_id: Optional[int] = None
+        self._stopped = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Sample the stacks of the calling thread
+        """
+        self._thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._sampler = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """
+        Stop sampling
+        """
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def sample(self) -> None:
+        """
+        Count the current stack of the profiled thread
+        """
+        frame = sys._current_frames().get(self._thread_id)  # pylint: disable=protected-access
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        if labels:
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval_seconds):
+            self.sample()
+
+    def collapsed(self) -> bytes:
+        """
+        :return: One ``<frame>;<frame>;... <count>`` line per stack, outermost frame first
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items())).encode("utf-8")
+
+
+class CProfileProfiler:
+    """
+    ``cProfile`` of the calling thread
+    """
+
+    def __init__(self) -> None:
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        """
+        Record every call of the calling thread
+        """
+        self._profile.enable()
+
+    def stop(self) -> None:
+        """
+        Stop recording
+        """
+        self._profile.disable()
+
+    def pstats(self) -> bytes:
+        """
+        :return: The stats, in the format of ``pstats.Stats.dump_stats``
+        """
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats)  # pylint: disable=no-member
+
+
+def file_sink(directory: str = PROFILING_DIRECTORY, max_files: int = PROFILING_MAX_FILES) -> Sink:
+    """
+    :param directory: Where profiles are written
+    :param max_files: The number of profiles kept, the oldest are removed first
+    :return: A sink writing profiles to files
+    """
+
+    def write(name: str, extension: str, content: bytes) -> None:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.{extension}")
+        with open(path, "wb") as profile_file:
+            profile_file.write(content)
+        profiles = sorted(
+            (entry for entry in os.scandir(directory) if entry.is_file()), key=lambda e: e.stat().st_mtime
+        )
+        for entry in profiles[: max(len(profiles) - max_files, 0)]:
+            os.remove(entry.path)
+        logger.info(f"Wrote profile [{path}]")
+
+    return write
+
+
+_sink: Sink = file_sink()
+
+
+def set_sink(sink: Sink) -> None:
+    """
+    Hand profiles to another sink, e.g. one uploading them to S3
+
+    :param sink: Called with the name, extension and content of each profile
+    """
+    global _sink  # pylint: disable=global-statement
+    _sink = sink
+
+
+def _take_header_profile() -> bool:
+    """
+    Count a request profiled for the ``X-Profile`` header against the budget of the container
+
+    :return: False when ``PROFILING_HEADER_MAX_PER_MINUTE`` requests were already profiled in the last minute
+    """
+    current = time.monotonic()
+    with _header_profiles_lock:
+        while _header_profiles and _header_profiles[0] <= current - 60:
+            _header_profiles.popleft()
+        if len(_header_profiles) >= PROFILING_HEADER_MAX_PER_MINUTE:
+            return False
+        _header_profiles.append(current)
+        return True
+
+
+def profiler_for(event, sample: Callable[[], float] = random.random) -> Optional[str]:
+    """
+    :param event: The event of the invocation
+    :param sample: Returns a number in [0, 1) per invocation, compared with the invocation rate
+    :return: The profiler to profile the invocation with, or None
+    """
+    if PROFILING_HEADER_ENABLED and isinstance(event, dict):
+        requested = get_header(event.get("headers"), PROFILE_HEADER)
+        if requested is not None:
+            if _take_header_profile():
+                requested = requested.strip().lower()
+                return requested if requested in PROFILERS else PROFILER
+            logger.warning(f"Ignoring the [{PROFILE_HEADER}] header, the profiling budget of the container is spent")
+    if PROFILING_INVOCATION_RATE > 0 and sample() < PROFILING_INVOCATION_RATE:
+        return PROFILER
+    return None
+
+
+def _profile_name(context) -> str:
+    request_id = getattr(context, "aws_request_id", None)
+    return request_id if isinstance(request_id, str) else f"invocation-{time.time_ns()}"
+
+
+def _write(kind: str, profiler, name: str) -> None:
+    content = profiler.collapsed() if kind == SAMPLING else profiler.pstats()
+    try:
+        _sink(name, EXTENSIONS[kind], content)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception(f"Failed to write profile [{name}]")
+
+
+def profile_invocation(func):
+    """
+    Profile the invocations selected by ``profiler_for``, apply it inside ``join_trace``
+    """
+
+    @functools.wraps(func)
+    def wrapper(event, context, *args, **kwargs):
+        kind = profiler_for(event)
+        if kind is None:
+            return func(event, context, *args, **kwargs)
+
+        profiler = SamplingProfiler() if kind == SAMPLING else CProfileProfiler()
+        name = _profile_name(context)
+        span = trace.get_current_span()
+        if span.is_recording():
+            span.set_attributes({"profile.name": name, "profile.profiler": kind})
+        profiler.start()
+        try:
+            return func(event, context, *args, **kwargs)
+        finally:
+            profiler.stop()
+            _write(kind, profiler, name)
+
+    return wrapper
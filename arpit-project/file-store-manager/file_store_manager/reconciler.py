@@ -0,0 +1,177 @@
+"""
+Deployment Reconciler
+=====================
+
+FileStores wait in ``DEPLOYMENT_PENDING`` until the CloudFormation template produced for them is deployed
+in the customer account. The reconciler pages through the pending FileStores of every tenant, checks them
+concurrently and moves the deployed ones to their next state.
+"""
+
+import datetime
+import itertools
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterable, List
+
+import db
+from aws_lambda_powertools import Logger, Metrics
+from aws_lambda_powertools.metrics import MetricUnit
+from botocore.exceptions import ClientError
+from config import PROJECT, RECONCILER_MAX_STORES_PER_TENANT, RECONCILER_MAX_WORKERS, RECONCILER_PAGE_SIZE
+from consumed_capacity import publish_consumed_capacity
+from evertz_io_observability.otel_collector import export_trace
+from file_store_client.schemas.file_store import FileStore
+from file_store_client.schemas.file_store_state import FileStoreState
+from tracing import MINIMAL, start_span
+from utility import assume_role_session
+
+logger = Logger()
+metrics = Metrics(namespace=PROJECT, service=PROJECT)
+
+# Stop reading pages when less time than this is left, so that in flight checks can finish
+MINIMUM_REMAINING_TIME_MS = 5000
+
+TRANSITIONED = "transitioned"
+UNCHANGED = "unchanged"
+CONFLICT = "conflict"
+FAILED = "failed"
+
+
+@lru_cache(maxsize=None)
+def _executor() -> ThreadPoolExecutor:
+    """
+    The workers of the reconciler, kept for the lifetime of the container
+
+    Warm invocations check FileStores on the same threads, so the DynamoDB resources restricted to a tenant,
+    which are cached per thread, are reused instead of assuming the tenant role again on new threads.
+
+    :return: The worker pool
+    """
+    return ThreadPoolExecutor(max_workers=RECONCILER_MAX_WORKERS, thread_name_prefix="reconciler")
+
+
+def _resolve_state(file_store: FileStore) -> FileStoreState:
+    """
+    Check whether the deployment of a FileStore is in place
+
+    The access role only becomes assumable, and the bucket reachable through it, once the template of the
+    FileStore is deployed. A missing bucket is an error, anything else means the deployment is pending.
+
+    :param file_store: A pending FileStore
+    :return: The state the FileStore should be in
+    """
+    try:
+        session = assume_role_session(file_store.access_role_arn, f"{PROJECT}-reconciler")
+        session.client("s3").head_bucket(Bucket=file_store.bucket)
+    except ClientError as client_error:
+        error_code = client_error.response.get("Error", {}).get("Code", "")
+        logger.info(f"FileStore [{file_store.id}] is not deployed yet: [{error_code}]")
+        return FileStoreState.ERROR if error_code in ("404", "NoSuchBucket") else FileStoreState.DEPLOYMENT_PENDING
+    return FileStoreState.ACTIVE
+
+
+def _reconcile_file_store(file_store: FileStore) -> str:
+    """
+    Move a pending FileStore to its resolved state
+
+    :param file_store: A pending FileStore
+    :return: The outcome of the check
+    """
+    try:
+        state = _resolve_state(file_store)
+        if state == file_store.state:
+            return UNCHANGED
+        return TRANSITIONED if db.transition_file_store_state(file_store, state) else CONFLICT
+    except Exception as err:
+        logger.exception(f"Unable to reconcile FileStore [{file_store.id}] of tenant [{file_store.tenant}]: {err}")
+        return FAILED
+
+
+def _interleave_tenants(file_stores: Iterable[FileStore], checked_per_tenant: Counter) -> List[FileStore]:
+    """
+    Order a page of FileStores round robin across tenants and drop those of tenants past their quota
+
+    The index returns the FileStores of a tenant next to each other, so without this a single large tenant
+    would occupy every worker.
+
+    :param file_stores: A page of pending FileStores
+    :param checked_per_tenant: Number of FileStores already checked per tenant during this run, updated
+    :return: The FileStores to check
+    """
+    by_tenant = defaultdict(list)
+    for file_store in file_stores:
+        tenant = str(file_store.tenant)
+        if checked_per_tenant[tenant] < RECONCILER_MAX_STORES_PER_TENANT:
+            checked_per_tenant[tenant] += 1
+            by_tenant[tenant].append(file_store)
+    rounds = itertools.zip_longest(*by_tenant.values())
+    return [file_store for file_store in itertools.chain.from_iterable(rounds) if file_store is not None]
+
+
+def _pending_lag_seconds(file_store: FileStore) -> float:
+    """
+    How long a FileStore has been pending since it was last modified
+
+    :param file_store: A pending FileStore
+    :return: The lag in seconds
+    """
+    last_modified = file_store.modification_info.last_modified
+    now = datetime.datetime.now(last_modified.tzinfo) if last_modified.tzinfo else datetime.datetime.now()
+    return max((now - last_modified).total_seconds(), 0.0)
+
+
+@start_span(level=MINIMAL)
+def reconcile_pending_file_stores(remaining_time_in_millis=lambda: float("inf")) -> Counter:
+    """
+    Check the pending FileStores of every tenant, one page of the state index at a time
+
+    :param remaining_time_in_millis: Returns the time left in the invocation, pages stop being read near the end
+    :return: The number of FileStores per outcome
+    """
+    started = time.monotonic()
+    outcomes = Counter()
+    checked_per_tenant = Counter()
+    max_lag = 0.0
+
+    executor = _executor()
+    exclusive_start_key = None
+    while remaining_time_in_millis() > MINIMUM_REMAINING_TIME_MS:
+        page, exclusive_start_key = db.get_file_stores_by_state(
+            FileStoreState.DEPLOYMENT_PENDING, limit=RECONCILER_PAGE_SIZE, exclusive_start_key=exclusive_start_key
+        )
+        file_stores = _interleave_tenants(page, checked_per_tenant)
+        max_lag = max([max_lag] + [_pending_lag_seconds(file_store) for file_store in file_stores])
+        outcomes.update(executor.map(_reconcile_file_store, file_stores))
+        if exclusive_start_key is None:
+            break
+
+    elapsed = time.monotonic() - started
+    checked = sum(outcomes.values())
+    logger.info(f"Reconciled [{checked}] FileStores in [{elapsed:.2f}]s: {dict(outcomes)}")
+
+    for outcome in (TRANSITIONED, UNCHANGED, CONFLICT, FAILED):
+        metrics.add_metric(name=f"Reconciler{outcome.capitalize()}", unit=MetricUnit.Count, value=outcomes[outcome])
+    metrics.add_metric(name="ReconcilerTenants", unit=MetricUnit.Count, value=len(checked_per_tenant))
+    metrics.add_metric(
+        name="ReconcilerThroughput", unit=MetricUnit.CountPerSecond, value=checked / elapsed if elapsed else 0.0
+    )
+    metrics.add_metric(name="ReconcilerMaxPendingLag", unit=MetricUnit.Seconds, value=max_lag)
+    return outcomes
+
+
+@export_trace
+@logger.inject_lambda_context()
+@metrics.log_metrics
+@publish_consumed_capacity
+def reconciler_lambda(event, context):
+    """
+    The scheduled lambda reconciling FileStores in ``DEPLOYMENT_PENDING``
+
+    :param event: The schedule event
+    :param context: lambda execution context
+    :return: The number of FileStores per outcome
+    """
+    logger.info(event)  # For pylint
+    return dict(reconcile_pending_file_stores(context.get_remaining_time_in_millis))
@@ -0,0 +1,96 @@
+"""FileStoreManager client methods not yet part of file-store-client"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+import marshmallow
+import marshmallow_dataclass
+
+GET_FILE_STORES_BY_BUCKET_KEY = "get_file_stores_by_bucket_key"
+"""
+``method_name`` of the request resolving the FileStores owning an S3 object
+"""
+
+
+@dataclass
+class GetFileStoresByBucketKeyParameters:
+    """
+    Parameters of the `get_file_stores_by_bucket_key` method
+    bucket: The bucket of the S3 object
+    key: The key of the S3 object
+    """
+
+    bucket: str
+    key: str
+
+
+GET_FILE_STORES_BY_BUCKET_KEY_PARAMETERS_SCHEMA = marshmallow_dataclass.class_schema(
+    GetFileStoresByBucketKeyParameters
+)()
+
+GET_FILE_STORES_BY_METADATA = "get_file_stores_by_metadata"
+"""
+``method_name`` of the request querying the FileStores of a tenant on an indexed metadata key
+"""
+
+
+@dataclass
+class GetFileStoresByMetadataParameters:
+    """
+    Parameters of the `get_file_stores_by_metadata` method
+    tenant_id: The tenant of the FileStores
+    key: A dotted path into the metadata, one of the indexed metadata keys
+    value: The value to match
+    prefix: Match values starting with `value` instead of equal to it
+    """
+
+    tenant_id: str
+    key: str
+    value: str
+    prefix: bool = False
+
+
+GET_FILE_STORES_BY_METADATA_PARAMETERS_SCHEMA = marshmallow_dataclass.class_schema(GetFileStoresByMetadataParameters)()
+
+SEARCH_FILE_STORES = "search_file_stores"
+"""
+``method_name`` of the request searching the names and descriptions of the FileStores of a tenant
+"""
+
+
+@dataclass
+class SearchFileStoresParameters:
+    """
+    Parameters of the `search_file_stores` method
+    tenant_id: The tenant of the FileStores
+    query: The text to search for, ignoring case
+    limit: The maximum number of results
+    """
+
+    tenant_id: str
+    query: str
+    limit: int = field(default=20, metadata={"validate": marshmallow.validate.Range(min=1, max=100)})
+
+
+SEARCH_FILE_STORES_PARAMETERS_SCHEMA = marshmallow_dataclass.class_schema(SearchFileStoresParameters)()
+
+
+@dataclass
+class FileStoreSummary:
+    """
+    A FileStore matching a search
+    id: The FileStore Id
+    name: The name of the FileStore
+    description: The description of the FileStore
+    file_class: The name of the FileClass of the FileStore
+    score: How well the FileStore matches, higher is better
+    """
+
+    id: str
+    name: str
+    description: Optional[str]
+    file_class: str = field(metadata={"data_key": "fileClass"})
+    score: int = 0
+
+
+FILE_STORE_SUMMARY_SCHEMA = marshmallow_dataclass.class_schema(FileStoreSummary)()
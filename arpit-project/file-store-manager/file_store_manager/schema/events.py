@@ -1,6 +1,7 @@
 """FileStoreManager Events"""
 
 from dataclasses import dataclass
+from typing import Optional
 
 from evertz_io_events import EvertzIOEvent, EvertzIOEventData
 from file_store_client.schemas.file_class import FileClass
@@ -12,10 +13,12 @@ class FileStoreCreatedData(EvertzIOEventData):
     Data for the `FileStoreCreated` event
     sns_arn: The ARN of the created SNS Topic
     file_class: The `FileClass` of the created FileStore
+    filter_policy: The `MessageBody` subscription filter policy selecting the FileStore on a shared topic
     """
 
     sns_arn: str
     file_class: FileClass
+    filter_policy: Optional[str] = None
 
 
 @dataclass
@@ -23,3 +26,18 @@ class FileStoreCreated(EvertzIOEvent):
     """Emitted when a file store is created"""
 
     data: FileStoreCreatedData
+
+
+@dataclass
+class FileStoreUpdatedData(FileStoreCreatedData):
+    """
+    Data for the `FileStoreUpdated` event, emitted when the filter policy of a FileStore on a shared topic
+    changed
+    """
+
+
+@dataclass
+class FileStoreUpdated(EvertzIOEvent):
+    """Emitted when the bucket or folder prefix of a file store on a shared topic is patched"""
+
+    data: FileStoreUpdatedData
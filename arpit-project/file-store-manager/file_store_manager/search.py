@@ -0,0 +1,237 @@
+"""
+Name Search
+===========
+
+Substring search over the names and descriptions of the FileStores of a tenant.
+
+The FileStores of a tenant are read with one paginated listing and arranged in an inverted index from every
+trigram of their lowercased name and description to the FileStores containing it. A query intersects the
+postings of its trigrams and only checks the few remaining candidates, shorter queries check every FileStore.
+The index of a tenant is cached per container together with the version of the tenant it was built at.
+Every write bumps the version of the tenant in ``TENANT_VERSION_DYNAMODB_TABLE``, and a search reads it with one
+GetItem, so writes made through any container make the next search rebuild the index. Without that table
+the version is only counted in the container, and writes through other containers show up once the cached
+index expires.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from aws_lambda_powertools import Logger
+from cache import TTLCache
+from config import SEARCH_INDEX_CACHE_MAX_SIZE, SEARCH_INDEX_CACHE_TTL_SECONDS, TENANT_VERSION_DYNAMODB_TABLE
+from db import bump_tenant_version, get_file_stores_by_tenant, get_tenant_version
+from file_store_client.schemas.file_store import FileStore
+from schema.client import FileStoreSummary
+from tracing import VERBOSE, start_span
+
+logger = Logger()
+
+GRAM_SIZE = 3
+
+# Scores of the ways a FileStore can match a query, the best one counts
+NAME_EQUALS = 100
+NAME_PREFIX = 80
+NAME_WORD_PREFIX = 60
+NAME_SUBSTRING = 40
+DESCRIPTION_WORD_PREFIX = 20
+DESCRIPTION_SUBSTRING = 10
+
+
+def _grams(text: str) -> Set[str]:
+    """
+    :param text: Lowercased text
+    :return: Every substring of the text of ``GRAM_SIZE`` characters
+    """
+    return {text[start : start + GRAM_SIZE] for start in range(len(text) - GRAM_SIZE + 1)}
+
+
+def _word_prefix(text: str, query: str) -> bool:
+    """
+    :param text: Lowercased text
+    :param query: Lowercased query
+    :return: True when a word of the text starts with the query
+    """
+    position = text.find(query)
+    while position != -1:
+        if position == 0 or not text[position - 1].isalnum():
+            return True
+        position = text.find(query, position + 1)
+    return False
+
+
+def _score(name: str, description: str, query: str) -> int:
+    """
+    :param name: The lowercased name of a FileStore
+    :param description: The lowercased description of a FileStore
+    :param query: Lowercased query
+    :return: The score of the best match, 0 when the FileStore does not match
+    """
+    if name == query:
+        return NAME_EQUALS
+    if name.startswith(query):
+        return NAME_PREFIX
+    if _word_prefix(name, query):
+        return NAME_WORD_PREFIX
+    if query in name:
+        return NAME_SUBSTRING
+    if _word_prefix(description, query):
+        return DESCRIPTION_WORD_PREFIX
+    if query in description:
+        return DESCRIPTION_SUBSTRING
+    return 0
+
+
+class SearchIndex:
+    """
+    An inverted index from trigrams to the FileStores of a tenant
+    """
+
+    __slots__ = ("_summaries", "_names", "_descriptions", "_postings")
+
+    def __init__(self, file_stores: List[FileStore]) -> None:
+        self._summaries: List[FileStoreSummary] = []
+        self._names: List[str] = []
+        self._descriptions: List[str] = []
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+
+        for position, file_store in enumerate(file_stores):
+            name = (file_store.name or "").lower()
+            description = (file_store.description or "").lower()
+            self._summaries.append(
+                FileStoreSummary(
+                    id=file_store.id,
+                    name=file_store.name,
+                    description=file_store.description,
+                    file_class=file_store.store_type.file_class.name,
+                )
+            )
+            self._names.append(name)
+            self._descriptions.append(description)
+            for gram in _grams(name) | _grams(description):
+                self._postings[gram].add(position)
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+    def _candidates(self, query: str) -> Iterable[int]:
+        """
+        :param query: Lowercased, non empty query
+        :return: The positions of the FileStores containing every trigram of the query
+        """
+        if len(query) < GRAM_SIZE:
+            return range(len(self._summaries))
+
+        postings = []
+        for start in range(len(query) - GRAM_SIZE + 1):
+            posting = self._postings.get(query[start : start + GRAM_SIZE])
+            if not posting:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+        return set.intersection(*postings)
+
+    def search(self, query: str, limit: int) -> List[FileStoreSummary]:
+        """
+        Find the FileStores whose name or description contains the query, ignoring case
+
+        :param query: The text to search for
+        :param limit: The maximum number of results
+        :return: The best matches first, ties ordered by name
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        matches: List[Tuple[int, str, int]] = []
+        for position in self._candidates(query):
+            score = _score(self._names[position], self._descriptions[position], query)
+            if score:
+                matches.append((-score, self._names[position], position))
+        matches.sort()
+
+        results = []
+        for negative_score, _, position in matches[:limit]:
+            summary = self._summaries[position]
+            results.append(
+                FileStoreSummary(
+                    id=summary.id,
+                    name=summary.name,
+                    description=summary.description,
+                    file_class=summary.file_class,
+                    score=-negative_score,
+                )
+            )
+        return results
+
+
+_search_index_cache = TTLCache(maxsize=SEARCH_INDEX_CACHE_MAX_SIZE, ttl=SEARCH_INDEX_CACHE_TTL_SECONDS)
+"""
+tenant id -> (version of the tenant the index was built at, SearchIndex of the FileStores of the tenant)
+"""
+
+_tenant_versions: Dict[str, int] = defaultdict(int)
+"""
+tenant id -> number of writes to the FileStores of the tenant through this container, used when
+``TENANT_VERSION_DYNAMODB_TABLE`` is not set
+"""
+
+_tenant_versions_lock = threading.Lock()
+
+
+def bump_search_index_version(tenant_id: str) -> None:
+    """
+    Mark the cached search index of a tenant as outdated after one of its FileStores changed
+
+    An index whose listing was read while the write happened is built at the old version, so it is never
+    served as current.
+
+    :param tenant_id: The tenant Id
+    """
+    if TENANT_VERSION_DYNAMODB_TABLE:
+        bump_tenant_version(tenant_id)
+        return
+    with _tenant_versions_lock:
+        _tenant_versions[tenant_id] += 1
+
+
+def _tenant_version(tenant_id: str) -> int:
+    """
+    :param tenant_id: The tenant Id
+    :return: The number of writes to the FileStores of the tenant
+    """
+    if TENANT_VERSION_DYNAMODB_TABLE:
+        return get_tenant_version(tenant_id)
+    return _tenant_versions.get(tenant_id, 0)
+
+
+@start_span(level=VERBOSE)
+def get_search_index(tenant_id: str) -> SearchIndex:
+    """
+    Get the search index of a tenant, built from one listing when the cached one is missing or outdated
+
+    :param tenant_id: The tenant Id
+    :return: The search index of the FileStores of the tenant
+    """
+    version = _tenant_version(tenant_id)
+    cached = _search_index_cache.get(tenant_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    index = SearchIndex(get_file_stores_by_tenant(tenant_id))
+    logger.info(f"Built the search index of tenant [{tenant_id}] over [{len(index)}] FileStores")
+    _search_index_cache.put(tenant_id, (version, index))
+    return index
+
+
+def search_file_stores(tenant_id: str, query: str, limit: int) -> List[FileStoreSummary]:
+    """
+    Search the names and descriptions of the FileStores of a tenant
+
+    :param tenant_id: The tenant Id
+    :param query: The text to search for
+    :param limit: The maximum number of results
+    :return: Summaries of the matching FileStores, best matches first
+    """
+    return get_search_index(tenant_id).search(query, limit)
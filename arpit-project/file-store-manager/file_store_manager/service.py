@@ -6,38 +6,98 @@ This module contains functions with service logic
 """
 
 import datetime
+import hashlib
 import json
-from typing import List
-from uuid import uuid4
+from copy import deepcopy
+from typing import List, Optional
+from uuid import NAMESPACE_URL, uuid4, uuid5
 
 import db
+import search
+import stages
 from aws_lambda_powertools import Logger
 from botocore.exceptions import ClientError
-from config import PROJECT
+from bucket_index import invalidate_bucket_index, resolve_file_stores
+from cache import TTLCache
+from config import PROJECT, USER_GROUPS_CACHE_MAX_SIZE, USER_GROUPS_CACHE_TTL_SECONDS
 from eio_otel_semantic_conventions.trace import EioSpanAttributes
-from errors import FilestoreNameAlreadyExists, FileStorePatchError, ForbiddenAccess
-from evertz_io_events import EventBridge
+from errors import (
+    FileStoreConflict,
+    FilestoreNameAlreadyExists,
+    FileStoreNotFound,
+    FileStorePatchError,
+    ForbiddenAccess,
+    IdempotencyKeyMismatch,
+)
 from evertz_io_identity_lib import Identity
-from evertz_io_observability.decorators import start_span
 from file_store_client.schemas.file_class import FileClass
-from file_store_client.schemas.file_store import FileStore
+from file_store_client.schemas.file_store import FILE_STORE_DB_SCHEMA, FILE_STORE_SCHEMA, FileStore
 from file_store_client.schemas.file_store_state import FileStoreState
 from file_store_client.schemas.modification_info import ModificationInfo
 from opentelemetry import trace
 from opentelemetry.semconv.trace import SpanAttributes
-from schema.events import FileStoreCreated, FileStoreCreatedData
-from user_management_client.client import get_groups_for_user
-from utility import create_sns_topic, delete_sns_topic
+from schema.client import FileStoreSummary
+from shared_topics import (
+    is_shared_topic,
+    register_on_shared_topic,
+    subscription_filter_policy,
+    unregister_from_shared_topic,
+    uses_shared_topic,
+)
+from topic_pool import claim_pooled_topic
+from tracing import MINIMAL, VERBOSE, start_span
+from utility import create_sns_topic, delete_sns_topic, set_sns_topic_attribute, tag_sns_topic
 
 logger = Logger()
 
+USER_GROUPS_CACHE = TTLCache(maxsize=USER_GROUPS_CACHE_MAX_SIZE, ttl=USER_GROUPS_CACHE_TTL_SECONDS)
+"""
+(tenant id, user id) -> groups of the user, shared by warm invocations of a container
+"""
+
 
-def _create_topic(file_store: FileStore):
+def _event_bridge():
+    """
+    evertz_io_events is only imported once a FileStore is created, the only code path emitting events
+
+    :return: The ``EventBridge`` class
+    """
+    from evertz_io_events import EventBridge  # pylint: disable=import-outside-toplevel
+
+    return EventBridge
+
+
+def get_groups_for_user(user_id: str, tenant_id: str) -> List[str]:
+    """
+    Get the groups of a user from user-management, whose client is imported on the first call
+
+    :param user_id: user id (sub) of caller
+    :param tenant_id: tenant of caller
+    :return: The groups of the user
+    """
+    # pylint: disable=import-outside-toplevel
+    from user_management_client.client import get_groups_for_user as get_user_management_groups
+
+    return get_user_management_groups(user_id=user_id, tenant_id=tenant_id)
+
+
+def _create_topic(file_store: FileStore, pooled: bool = True):
     """
     Create a new SNS topic for the given file store
 
+    A topic is claimed from the topic pool when possible and configured for this file store, otherwise
+    the topic is created with its policy and tags. Tenants in shared topic mode use the shared topic of
+    the file class instead.
+
     :param file_store: A new FileStore
+    :param pooled: Whether a topic may be claimed from the topic pool. Creating the topic named after the
+        FileStore id instead returns the same topic when the creation is retried
     """
+    if uses_shared_topic(file_store.tenant):
+        file_store.topic_arn = register_on_shared_topic(file_store)
+        logger.info(f"File-store uses shared topic : [{file_store.topic_arn}]")
+        return
+
     logger.info(f"Creating topic for file-store : {file_store} started")
     sns_policy = json.dumps(
         {
@@ -51,43 +111,87 @@ def _create_topic(file_store: FileStore):
             }
         }
     )
-    attributes = {"Policy": sns_policy}
     sns_tags = [
         {"Key": "project", "Value": PROJECT},
         {"Key": "file_store_id", "Value": file_store.id},
         {"Key": "tenant_id", "Value": file_store.tenant},
         {"Key": "class", "Value": file_store.store_type.file_class.name},
     ]
-    sns_name = PROJECT + "-" + file_store.id
 
-    create_topic_response = create_sns_topic(name=sns_name, attributes=attributes, tags=sns_tags)
+    topic_arn = _configure_pooled_topic(sns_policy, sns_tags) if pooled else None
+    if topic_arn is None:
+        attributes = {"Policy": sns_policy}
+        sns_name = PROJECT + "-" + file_store.id
+        create_topic_response = create_sns_topic(name=sns_name, attributes=attributes, tags=sns_tags)
+        topic_arn = create_topic_response["TopicArn"]
 
-    topic_arn = create_topic_response["TopicArn"]
     logger.info(f"ARN of the created topic : [{topic_arn}]")
     file_store.topic_arn = topic_arn
 
 
+def _configure_pooled_topic(sns_policy: str, sns_tags: list) -> Optional[str]:
+    """
+    Claim a topic from the topic pool and apply the policy and tags of a file store to it
+
+    :param sns_policy: The policy of the topic
+    :param sns_tags: The tags of the topic
+    :return: The arn of the topic, None when no pooled topic could be used
+    """
+    topic_arn = claim_pooled_topic()
+    if topic_arn is None:
+        return None
+    try:
+        set_sns_topic_attribute(topic_arn, "Policy", sns_policy)
+        tag_sns_topic(topic_arn, sns_tags)
+    except ClientError as client_error:
+        logger.warning(f"Unable to configure pooled topic [{topic_arn}], creating a new one. Error [{client_error}]")
+        try:
+            delete_sns_topic(topic_arn)
+        except ClientError:
+            logger.exception(f"Unable to delete pooled topic [{topic_arn}]")
+        return None
+    return topic_arn
+
+
 @start_span()
-def _emit_filestore_event(file_store: FileStore):
+def _emit_filestore_event(file_store: FileStore, updated: bool = False):
     """
     puts file-store data in event bridge
 
      :param file_store: FileStore
+     :param updated: Emit `FileStoreUpdated` for a patched FileStore instead of `FileStoreCreated`
     """
+    # Consumers of a shared topic subscribe with the filter policy of this file store
+    filter_policy = None
+    if file_store.topic_arn and is_shared_topic(file_store.topic_arn):
+        filter_policy = subscription_filter_policy(file_store)
+
+    # pylint: disable=import-outside-toplevel
+    from schema.events import FileStoreCreated, FileStoreCreatedData, FileStoreUpdated, FileStoreUpdatedData
+
+    event_type, data_type = (
+        (FileStoreUpdated, FileStoreUpdatedData) if updated else (FileStoreCreated, FileStoreCreatedData)
+    )
     # Emit to event bridge
-    event_data = FileStoreCreatedData(
+    event_data = data_type(
         identity="",
         correlation_id="",
         tenant_id=file_store.tenant,
         sns_arn=file_store.topic_arn,
         file_class=file_store.store_type.file_class,
+        filter_policy=filter_policy,
     )
-    event = FileStoreCreated(source=PROJECT, data=event_data)
-    EventBridge().emit(event)
+    event = event_type(source=PROJECT, data=event_data)
+    event_bridge = _event_bridge()
+    with stages.stage(stages.EVENT_BRIDGE) as record:
+        record.items = 1
+        event_bridge().emit(event)
 
 
-@start_span()
-def create_file_store(identity: Identity, new_file_store: FileStore) -> FileStore:
+@start_span(level=MINIMAL)
+def create_file_store(
+    identity: Identity, new_file_store: FileStore, idempotency_key: Optional[str] = None
+) -> FileStore:
     """
     Create a new FileStore
 
@@ -96,13 +200,92 @@ def create_file_store(identity: Identity, new_file_store: FileStore) -> FileStor
     - Generates a unique ``id`` for this FileStore
     - Adds the ``created`` datetime to this FileStore
 
+    When an ``idempotency_key`` is given, retries of the same request return the FileStore created by
+    the first request instead of creating another one. The id of the FileStore is then derived from the
+    tenant and the key, so a retry made after the first request died before completing the key finds the
+    FileStore it saved, and the conditional write of the FileStore fails for concurrent duplicates.
+
     :param identity: The caller Identity
     :param new_file_store: A new FileStore
+    :param idempotency_key: Optional key sent by the client to make retries of this request safe
+    :raises IdempotentRequestInProgress: When the first request with this key is still running
+    :raises IdempotencyKeyMismatch: When the key was used for a different request
     :return: The saved new FileStore
     """
+    if not idempotency_key:
+        return _create_file_store(identity, new_file_store)
+
+    tenant_id = identity.tenant
+    request_hash = _request_hash(new_file_store)
+    record = db.get_idempotency_record(tenant_id=tenant_id, idempotency_key=idempotency_key)
+    if record is not None:
+        if record[db.REQUEST_HASH] != request_hash:
+            raise IdempotencyKeyMismatch(idempotency_key)
+        if record[db.STATUS] == db.IDEMPOTENCY_COMPLETED:
+            logger.info(f"Replaying the result of idempotency key [{idempotency_key}]")
+            return stages.load(FILE_STORE_DB_SCHEMA, record[db.DATA])
+
+    # An in progress record fails the claim with IdempotentRequestInProgress
+    claim_token = db.claim_idempotency_key(
+        tenant_id=tenant_id, idempotency_key=idempotency_key, request_hash=request_hash
+    )
+    file_store_id = idempotent_file_store_id(tenant_id, idempotency_key)
+    try:
+        file_store = _get_created_file_store(tenant_id, file_store_id)
+        if file_store is None:
+            file_store = _create_file_store(identity, new_file_store, file_store_id=file_store_id)
+    except FileStoreConflict:
+        file_store = _get_created_file_store(tenant_id, file_store_id)
+        if file_store is None:
+            db.release_idempotency_key(tenant_id=tenant_id, idempotency_key=idempotency_key, claim_token=claim_token)
+            raise
+    except Exception:
+        db.release_idempotency_key(tenant_id=tenant_id, idempotency_key=idempotency_key, claim_token=claim_token)
+        raise
+    db.complete_idempotency_key(tenant_id=tenant_id, idempotency_key=idempotency_key, file_store=file_store)
+    return file_store
+
+
+def idempotent_file_store_id(tenant_id: str, idempotency_key: str) -> str:
+    """
+    :param tenant_id: The tenant of the caller
+    :param idempotency_key: The key sent by the client
+    :return: The id of the FileStore created with this key
+    """
+    return str(uuid5(NAMESPACE_URL, f"{PROJECT}/{tenant_id}/{idempotency_key}"))
+
+
+def _get_created_file_store(tenant_id: str, file_store_id: str) -> Optional[FileStore]:
+    """
+    Look for the FileStore saved by an earlier request with the same idempotency key
+
+    :param tenant_id: The tenant of the caller
+    :param file_store_id: The id derived from the idempotency key
+    :return: The FileStore, None when no request saved it
+    """
+    try:
+        file_store = db.get_file_store_by_id(tenant_id=tenant_id, file_store_id=file_store_id)
+    except FileStoreNotFound:
+        return None
+    logger.info(f"FileStore [{file_store_id}] was saved by an earlier request with the same idempotency key")
+    return file_store
+
+
+def _request_hash(new_file_store: FileStore) -> str:
+    """
+    Hash the client supplied fields of a new FileStore, before any server side field is added
+
+    :param new_file_store: A new FileStore
+    :return: The hex digest of the request
+    """
+    payload = json.dumps(stages.dump(FILE_STORE_SCHEMA, new_file_store), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _create_file_store(identity: Identity, new_file_store: FileStore, file_store_id: Optional[str] = None) -> FileStore:
     created = datetime.datetime.now()
 
-    new_file_store.id = str(uuid4())
+    new_file_store.id = file_store_id or str(uuid4())
     tenant_id = identity.tenant
 
     new_file_store.tenant = tenant_id
@@ -122,9 +305,11 @@ def create_file_store(identity: Identity, new_file_store: FileStore) -> FileStor
     )
     new_file_store.state = FileStoreState.DEPLOYMENT_PENDING
     if new_file_store.store_type.file_class.incoming is True:
-        _create_topic(new_file_store)
+        _create_topic(new_file_store, pooled=file_store_id is None)
     _emit_filestore_event(new_file_store)
     db.put_file_store(file_store=new_file_store)
+    invalidate_bucket_index(new_file_store.bucket)
+    search.bump_search_index_version(tenant_id)
     return new_file_store
 
 
@@ -150,7 +335,7 @@ def _update_file_store(existing_file_store: FileStore, file_store: FileStore, la
     return existing_file_store
 
 
-@start_span()
+@start_span(level=MINIMAL)
 def update_file_store(
     tenant_id: str, new_file_store: FileStore, file_store_id: str, last_modified_by: str
 ) -> FileStore:
@@ -173,6 +358,7 @@ def update_file_store(
             f" [{new_file_store.store_type.file_class}] is not allowed"
         )
 
+    previous_file_store = deepcopy(existing_file_store)
     updated_file_store = _update_file_store(existing_file_store, new_file_store, last_modified_by)
     current_span = trace.get_current_span()
     store_type = updated_file_store.store_type
@@ -183,11 +369,23 @@ def update_file_store(
             EioSpanAttributes.FILE_STORE_FILE_FORMATS: [file_format.name for file_format in store_type.file_formats],
         }
     )
+    shared_topic = bool(updated_file_store.topic_arn) and is_shared_topic(updated_file_store.topic_arn)
+    if shared_topic and previous_file_store.bucket != updated_file_store.bucket:
+        # The old bucket stops publishing once no other FileStore of the topic uses it
+        unregister_from_shared_topic(previous_file_store)
+        register_on_shared_topic(updated_file_store)
     db.patch_file_store(updated_file_store)
+    if shared_topic:
+        # Consumers of the shared topic must update the filter policy of their subscription
+        if subscription_filter_policy(previous_file_store) != subscription_filter_policy(updated_file_store):
+            _emit_filestore_event(updated_file_store, updated=True)
+    invalidate_bucket_index(previous_file_store.bucket)
+    invalidate_bucket_index(updated_file_store.bucket)
+    search.bump_search_index_version(tenant_id)
     return updated_file_store
 
 
-@start_span()
+@start_span(level=VERBOSE)
 def check_file_store_name_already_exists(tenant_id: str, new_file_store: FileStore):
     """
     Checking whether file store name is unique or not
@@ -198,7 +396,7 @@ def check_file_store_name_already_exists(tenant_id: str, new_file_store: FileSto
             raise FilestoreNameAlreadyExists(new_file_store.name)
 
 
-@start_span()
+@start_span(level=VERBOSE)
 def get_file_store_by_id(tenant: str, file_store_id: str) -> FileStore:
     """
     Get a FileStore by tenant id and file store id
@@ -206,7 +404,7 @@ def get_file_store_by_id(tenant: str, file_store_id: str) -> FileStore:
     return db.get_file_store_by_id(tenant, file_store_id)
 
 
-@start_span()
+@start_span(level=VERBOSE)
 def get_file_stores_by_file_class(tenant: str, file_class: FileClass) -> List[FileStore]:
     """
     Get a FileStore by tenant id and store type
@@ -214,7 +412,7 @@ def get_file_stores_by_file_class(tenant: str, file_class: FileClass) -> List[Fi
     return db.get_file_stores_by_file_class(tenant, file_class)
 
 
-@start_span()
+@start_span(level=VERBOSE)
 def get_all_files_stores_by_tenant(tenant_id: str):
     """
     Get all FileStores for a tenant id.
@@ -222,7 +420,7 @@ def get_all_files_stores_by_tenant(tenant_id: str):
     return db.get_file_stores_by_tenant(tenant_id=tenant_id)
 
 
-@start_span()
+@start_span(level=VERBOSE)
 def get_file_stores_by_tenant_and_bucket_name(tenant_id: str, bucket_name: str) -> List[FileStore]:
     """
     Get all Sibling FileStores for a tenant id with similar bucket name.
@@ -230,18 +428,55 @@ def get_file_stores_by_tenant_and_bucket_name(tenant_id: str, bucket_name: str)
     return db.get_file_stores_by_tenant_and_bucket_name(tenant_id=tenant_id, bucket_name=bucket_name)
 
 
+@start_span(level=VERBOSE)
+def get_file_stores_by_metadata(tenant_id: str, key: str, value: str, prefix: bool = False) -> List[FileStore]:
+    """
+    Get the FileStores of a tenant by the value of an indexed metadata key, e.g. ``translation.id``
+    """
+    return db.get_file_stores_by_metadata(tenant_id=tenant_id, key=key, value=value, prefix=prefix)
+
+
 @start_span()
+def search_file_stores(tenant_id: str, query: str, limit: int = 20) -> List[FileStoreSummary]:
+    """
+    Search the names and descriptions of the FileStores of a tenant for a substring, ignoring case
+
+    :param tenant_id: The tenant Id
+    :param query: The text to search for
+    :param limit: The maximum number of results
+    :return: Summaries of the matching FileStores, best matches first
+    """
+    return search.search_file_stores(tenant_id=tenant_id, query=query, limit=limit)
+
+
+@start_span()
+def get_file_stores_by_bucket_key(bucket_name: str, key: str) -> List[FileStore]:
+    """
+    Get the FileStores owning an S3 object, across tenants, to route S3 event notifications
+
+    :param bucket_name: The bucket of the object
+    :param key: The key of the object
+    :return: The FileStores with the longest folder prefix containing the key
+    """
+    return resolve_file_stores(bucket_name=bucket_name, key=key)
+
+
+@start_span(level=MINIMAL)
 def delete_file_store_by_id(tenant: str, file_store_id: str) -> None:
     """
     Delete a FileStore by file_store_id
-    Also deletes the sns topic associated with the file store
+    Also deletes the sns topic associated with the file store, unless the topic is shared. The bucket of a
+    FileStore using a shared topic is then removed from the topic policy, with its last FileStore
 
     :param tenant: The tenant id
     :param file_store_id: The file store id to delete
     :returns: None
     """
     file_store: FileStore = db.get_file_store_by_id(tenant, file_store_id)
-    if file_store.store_type.file_class.incoming is True or file_store.topic_arn is not None:
+    if file_store.topic_arn is not None and is_shared_topic(file_store.topic_arn):
+        logger.info(f"Keeping shared topic [{file_store.topic_arn}] of file store [{file_store_id}]")
+        unregister_from_shared_topic(file_store)
+    elif file_store.store_type.file_class.incoming is True or file_store.topic_arn is not None:
         try:
             delete_sns_topic(file_store.topic_arn)
         except ClientError as client_error:
@@ -249,19 +484,49 @@ def delete_file_store_by_id(tenant: str, file_store_id: str) -> None:
                 raise
             logger.warning(f"Deletion of topic [{file_store.topic_arn}] unsuccessful. Error [{client_error}]")
     db.delete_file_store_by_id(tenant, file_store_id)
+    invalidate_bucket_index(file_store.bucket)
+    search.bump_search_index_version(tenant)
+
+
+@start_span(level=VERBOSE)
+def get_groups_for_user_cached(tenant_id: str, user_id: str, bypass_cache: bool = False) -> List[str]:
+    """
+    Get the groups of a user, served from ``USER_GROUPS_CACHE`` when possible
+
+    :param tenant_id: tenant of caller
+    :param user_id: user id (sub) of caller
+    :param bypass_cache: Always ask user-management, the cache is refreshed with the result
+    :return: The groups of the user
+    """
+    key = (tenant_id, user_id)
+    user_groups = None if bypass_cache else USER_GROUPS_CACHE.get(key)
+    current_span = trace.get_current_span()
+    current_span.set_attributes(
+        {"user_groups_cache.hit": user_groups is not None, "user_groups_cache.bypass": bypass_cache}
+    )
+    if user_groups is None:
+        user_groups = get_groups_for_user(user_id=user_id, tenant_id=tenant_id)
+        USER_GROUPS_CACHE.put(key, user_groups)
+    logger.debug(f"User groups cache stats: {USER_GROUPS_CACHE.stats()}")
+    return user_groups
 
 
 @start_span()
-def check_if_admin(tenant_id: str, user_id: str) -> None:
+def check_if_admin(tenant_id: str, user_id: str, bypass_cache: bool = False) -> None:
     """
     Check if user is part of admin group for tenant
+
+    Group lookups are cached for ``USER_GROUPS_CACHE_TTL_SECONDS``, sensitive operations should pass
+    ``bypass_cache`` so that a revoked admin is refused straight away.
+
     :param tenant_id: tenant of caller
     :param user_id: user id (sub) of caller
+    :param bypass_cache: Skip the user groups cache
     :raises: Forbidden Access
     :return: None
     """
     logger.info(f"Validate if user [{user_id}] has permission to make the API call")
-    user_groups = get_groups_for_user(user_id=user_id, tenant_id=tenant_id)
+    user_groups = get_groups_for_user_cached(tenant_id=tenant_id, user_id=user_id, bypass_cache=bypass_cache)
 
     if "admin" not in user_groups:
         logger.exception(f"User [{user_id}] does not have admin access right. Please contact administrator")
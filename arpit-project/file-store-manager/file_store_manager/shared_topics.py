@@ -0,0 +1,259 @@
+"""
+Shared SNS Topics
+=================
+
+Tenants listed in ``SHARED_TOPIC_TENANTS`` get one SNS topic per file class instead of one topic per
+incoming FileStore. S3 events carry no FileStore id, so consumers tell the FileStores apart with a
+``MessageBody`` subscription filter policy on the bucket and folder prefix of their FileStore.
+
+The FileStores of a shared topic are kept in ``SHARED_TOPIC_DYNAMODB_TABLE`` with their bucket, and the
+topic policy allows the buckets of those FileStores to publish. A FileStore is registered by its id, so a
+retried create registers it once. Concurrent creates, patches and deletes in other containers update the
+same item, so it is written conditionally on its ``version``.
+
+-------------------------------------
+Shared Topic Table Structure
+
+Key Attributes:
+--------------------------
+topic-arn: str
+
+Other Attributes:
+--------------------------
+file-stores: Dict[str, str] (FileStore id -> bucket)
+version: int
+
+Keys
+--------------------------
+primary-key: (hash: topic-arn)
+
+"""
+
+import json
+from typing import Dict, Optional, Set, Tuple
+
+import db
+from aws_lambda_powertools import Logger
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+from config import PROJECT, SHARED_TOPIC_DYNAMODB_TABLE, SHARED_TOPIC_TENANTS
+from file_store_client.schemas.file_class import FileClass
+from file_store_client.schemas.file_store import FileStore
+from tracing import start_span
+from utility import create_sns_topic, get_table_with_retry_config, set_sns_topic_attribute
+
+logger = Logger()
+
+SHARED_TOPIC_PREFIX = f"{PROJECT}-shared-"
+
+# Unique Attributes
+TOPIC_ARN = "topic-arn"
+FILE_STORES = "file-stores"
+VERSION = "version"
+
+# Writers of the same topic race for each version of its item, so each one tries a few times
+UPDATE_ATTEMPTS = 5
+
+_shared_topic_arns: Dict[Tuple[str, str], str] = {}
+"""
+(tenant id, file class name) -> arn of the shared topic, for the lifetime of the container
+"""
+
+
+def uses_shared_topic(tenant_id: str) -> bool:
+    """
+    Check if the incoming FileStores of a tenant share a topic per file class
+
+    :param tenant_id: The tenant Id
+    :return: True when the tenant is in shared topic mode
+    """
+    return tenant_id in SHARED_TOPIC_TENANTS
+
+
+def is_shared_topic(topic_arn: str) -> bool:
+    """
+    Check if a topic is shared by several FileStores, such topics must outlive any single FileStore
+
+    :param topic_arn: The arn of sns topic
+    :return: True for a shared topic
+    """
+    return topic_arn.rsplit(":", 1)[-1].startswith(SHARED_TOPIC_PREFIX)
+
+
+def subscription_filter_policy(file_store: FileStore) -> str:
+    """
+    The filter policy that selects the S3 events of a FileStore on its shared topic
+
+    Subscribers must set the ``FilterPolicyScope`` subscription attribute to ``MessageBody``.
+
+    :param file_store: A FileStore using a shared topic
+    :return: The filter policy as a JSON string
+    """
+    s3_filter = {"bucket": {"name": [file_store.bucket]}}
+    if file_store.folder_prefix:
+        s3_filter["object"] = {"key": [{"prefix": file_store.folder_prefix}]}
+    return json.dumps({"Records": {"s3": s3_filter}})
+
+
+@start_span()
+def register_on_shared_topic(file_store: FileStore) -> str:
+    """
+    Get the shared topic of the tenant and file class of a FileStore, and allow its bucket to publish to it
+
+    No topic is created when the shared topic already exists, and registering the same FileStore again
+    changes nothing. A FileStore already on a shared topic, patched or imported, is registered on its topic.
+
+    :param file_store: A new FileStore, or a patched or imported one
+    :return: The arn of the shared topic
+    """
+    topic_arn = file_store.topic_arn
+    if not topic_arn or not is_shared_topic(topic_arn):
+        topic_arn = _get_or_create_shared_topic(file_store.tenant, file_store.store_type.file_class)
+    _update_publishing_file_stores(topic_arn, file_store, registered=True)
+    _write_topic_policy(topic_arn)
+    return topic_arn
+
+
+@start_span()
+def unregister_from_shared_topic(file_store: FileStore) -> None:
+    """
+    Stop allowing the bucket of a deleted FileStore to publish to its shared topic, once no other FileStore
+    of the topic uses the bucket
+
+    :param file_store: A FileStore using a shared topic
+    """
+    _update_publishing_file_stores(file_store.topic_arn, file_store, registered=False)
+    _write_topic_policy(file_store.topic_arn)
+
+
+def _get_or_create_shared_topic(tenant_id: str, file_class: FileClass) -> str:
+    """
+    CreateTopic returns the existing topic when called again with the same name and tags
+
+    :param tenant_id: The tenant Id
+    :param file_class: The FileClass of the FileStores sharing the topic
+    :return: The arn of the shared topic
+    """
+    key = (tenant_id, file_class.name)
+    topic_arn = _shared_topic_arns.get(key)
+    if topic_arn is None:
+        sns_tags = [
+            {"Key": "project", "Value": PROJECT},
+            {"Key": "tenant_id", "Value": tenant_id},
+            {"Key": "class", "Value": file_class.name},
+        ]
+        sns_name = f"{SHARED_TOPIC_PREFIX}{tenant_id}-{file_class.name}"
+        topic_arn = create_sns_topic(name=sns_name, attributes={}, tags=sns_tags)["TopicArn"]
+        _shared_topic_arns[key] = topic_arn
+    return topic_arn
+
+
+def _get_publishing_file_stores(topic_arn: str) -> Tuple[Optional[Dict[str, str]], int]:
+    """
+    :param topic_arn: The arn of the shared topic
+    :return: The bucket of each FileStore registered on the topic, None when the topic has no item yet, and
+        the version of the item
+    """
+    table = get_table_with_retry_config(SHARED_TOPIC_DYNAMODB_TABLE)
+    item = table.get_item(Key={TOPIC_ARN: topic_arn}, ConsistentRead=True).get("Item")
+    if item is None:
+        return None, 0
+    return dict(item[FILE_STORES]), int(item[VERSION])
+
+
+def _existing_publishing_file_stores(topic_arn: str, file_store: FileStore) -> Dict[str, str]:
+    """
+    Read the FileStores saved on a topic before its item was written, topics shared before the FileStores
+    were kept in the table already allow their buckets to publish
+
+    :param topic_arn: The arn of the shared topic
+    :param file_store: The FileStore being registered or unregistered
+    :return: The bucket of each FileStore
+    """
+    file_stores = db.get_file_stores_by_file_class(file_store.tenant, file_store.store_type.file_class)
+    return {other.id: other.bucket for other in file_stores if other.topic_arn == topic_arn}
+
+
+def _update_publishing_file_stores(topic_arn: str, file_store: FileStore, registered: bool) -> None:
+    """
+    Register a FileStore and its bucket on a topic or unregister it, a bucket is removed with its last
+    FileStore. Nothing is written when the FileStore is already registered with the same bucket, or is
+    already unregistered.
+
+    :param topic_arn: The arn of the shared topic
+    :param file_store: The FileStore being registered or unregistered
+    :param registered: True to register the FileStore, False to unregister it
+    :raises ClientError: When other writers updated the item on every attempt
+    """
+    table = get_table_with_retry_config(SHARED_TOPIC_DYNAMODB_TABLE)
+    for attempt in range(1, UPDATE_ATTEMPTS + 1):
+        file_stores, version = _get_publishing_file_stores(topic_arn)
+        if file_stores is None:
+            file_stores = _existing_publishing_file_stores(topic_arn, file_store)
+            condition = Attr(TOPIC_ARN).not_exists()
+        else:
+            condition = Attr(VERSION).eq(version)
+
+        previous = dict(file_stores)
+        if registered:
+            file_stores[file_store.id] = file_store.bucket
+        else:
+            file_stores.pop(file_store.id, None)
+        if version and file_stores == previous:
+            logger.debug(f"FileStore [{file_store.id}] of shared topic [{topic_arn}] is unchanged")
+            return
+
+        item = {TOPIC_ARN: topic_arn, FILE_STORES: file_stores, VERSION: version + 1}
+        try:
+            table.put_item(Item=item, ConditionExpression=condition)
+            return
+        except ClientError as client_error:
+            code = client_error.response.get("Error", {}).get("Code")
+            if code != "ConditionalCheckFailedException" or attempt == UPDATE_ATTEMPTS:
+                raise
+            logger.debug(f"FileStores of shared topic [{topic_arn}] were updated by another request")
+
+
+def _write_topic_policy(topic_arn: str) -> None:
+    """
+    Write the topic policy from the buckets of the topic, until they did not change while it was written
+
+    The last policy written is then made from the latest buckets, whichever request writes it last.
+
+    :param topic_arn: The arn of the shared topic
+    """
+    for _ in range(UPDATE_ATTEMPTS):
+        file_stores, version = _get_publishing_file_stores(topic_arn)
+        buckets = set((file_stores or {}).values())
+        logger.info(f"Allowing buckets {sorted(buckets)} to publish to shared topic [{topic_arn}]")
+        set_sns_topic_attribute(topic_arn, "Policy", _topic_policy(topic_arn, buckets))
+        if _get_publishing_file_stores(topic_arn)[1] == version:
+            return
+    logger.warning(f"Buckets of shared topic [{topic_arn}] kept changing while its policy was written")
+
+
+def _topic_policy(topic_arn: str, buckets: Set[str]) -> str:
+    """
+    :param topic_arn: The arn of the shared topic
+    :param buckets: The buckets allowed to publish to the topic
+    :return: The policy of the topic, only the account owning the topic may publish without any bucket
+    """
+    if not buckets:
+        account_id = topic_arn.split(":")[4]
+        statement = {
+            "Sid": "publish-from-owner",
+            "Effect": "Allow",
+            "Resource": topic_arn,
+            "Principal": {"AWS": f"arn:aws:iam::{account_id}:root"},
+            "Action": "SNS:Publish",
+        }
+    else:
+        statement = {
+            "Sid": "publish-from-s3",
+            "Effect": "Allow",
+            "Resource": topic_arn,
+            "Principal": {"Service": "s3.amazonaws.com"},
+            "Action": "SNS:Publish",
+            "Condition": {"ArnLike": {"aws:SourceArn": ["arn:aws:s3:*:*:" + bucket for bucket in sorted(buckets)]}},
+        }
+    return json.dumps({"Statement": statement})
@@ -0,0 +1,263 @@
+"""
+Stage Timings
+=============
+
+Breaks the latency of an invocation down into stages: DynamoDB, SNS, STS and EventBridge calls, and the
+marshmallow work of loading and dumping FileStores.
+
+Every call of a stage records its duration, and where known the number of items and bytes it handled:
+
+- boto3 clients and resources passed to ``instrument`` time each AWS call with botocore's ``before-call`` and
+  ``after-call`` events, so no call site has to be changed
+- ``stage`` times a block, for work done by libraries whose clients are not ours
+- ``load``, ``dump`` and ``dumps`` time a schema call and count the FileStores it handled, and record where the
+  memory of lists goes with ``memory.allocation_sites``
+
+The totals of a stage are added to the span of the function it ran in as ``stage.<stage>.*`` attributes. The
+totals of the invocation are added to the handler span and published as CloudWatch EMF metrics by
+``publish_stage_metrics``. Recording costs a ``perf_counter`` call and a dictionary update per call, and
+nothing is added to spans that are not recorded.
+"""
+
+import functools
+import threading
+import time
+import weakref
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, Optional
+
+import memory
+from aws_lambda_powertools import Metrics
+from aws_lambda_powertools.metrics import MetricUnit
+from config import PROJECT
+from opentelemetry import trace
+
+DYNAMODB = "DynamoDB"
+SNS = "SNS"
+STS = "STS"
+EVENT_BRIDGE = "EventBridge"
+SCHEMA_LOAD = "SchemaLoad"
+SCHEMA_DUMP = "SchemaDump"
+
+SERVICE_STAGES = {"dynamodb": DYNAMODB, "sns": SNS, "sts": STS, "events": EVENT_BRIDGE}
+"""
+botocore service name -> stage
+"""
+
+CALLS = "calls"
+DURATION_MS = "duration_ms"
+ITEMS = "items"
+BYTES = "bytes"
+
+metrics = Metrics(namespace=PROJECT, service=PROJECT)
+
+_lock = threading.Lock()
+_invocation_totals: Dict[str, Dict[str, float]] = {}
+_span_totals: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+_STARTED = "stage_started"
+
+
+class StageRecord:
+    """
+    What one call of a stage handled, filled in by the caller
+    """
+
+    __slots__ = ("items", "bytes")
+
+    def __init__(self) -> None:
+        self.items: Optional[int] = None
+        self.bytes: Optional[int] = None
+
+
+def _add(totals: Dict[str, Dict[str, float]], name: str, duration_ms: float, record: StageRecord) -> Dict[str, float]:
+    stage_totals = totals.get(name)
+    if stage_totals is None:
+        stage_totals = totals[name] = {CALLS: 0, DURATION_MS: 0.0, ITEMS: 0, BYTES: 0}
+    stage_totals[CALLS] += 1
+    stage_totals[DURATION_MS] += duration_ms
+    stage_totals[ITEMS] += record.items or 0
+    stage_totals[BYTES] += record.bytes or 0
+    return dict(stage_totals)
+
+
+def _span_attributes(name: str, stage_totals: Dict[str, float]) -> Dict[str, Any]:
+    prefix = f"stage.{name.lower()}"
+    return {
+        f"{prefix}.calls": int(stage_totals[CALLS]),
+        f"{prefix}.duration_ms": round(stage_totals[DURATION_MS], 3),
+        f"{prefix}.items": int(stage_totals[ITEMS]),
+        f"{prefix}.bytes": int(stage_totals[BYTES]),
+    }
+
+
+def record_stage(name: str, duration_ms: float, record: StageRecord) -> None:
+    """
+    Add a call of a stage to the totals of the invocation and of the current span
+
+    :param name: The stage
+    :param duration_ms: How long the call took
+    :param record: What the call handled
+    """
+    span = trace.get_current_span()
+    recording = span.is_recording()
+    with _lock:
+        _add(_invocation_totals, name, duration_ms, record)
+        if recording:
+            span_totals = _add(_span_totals.setdefault(span, {}), name, duration_ms, record)
+    if recording:
+        span.set_attributes(_span_attributes(name, span_totals))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[StageRecord]:
+    """
+    Time a block as a call of a stage, the block may set ``items`` and ``bytes`` of the record it is given
+
+    :param name: The stage
+    :return: The record of the call
+    """
+    record = StageRecord()
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record_stage(name, (time.perf_counter() - started) * 1000, record)
+
+
+def _allocation_sites(name: str, many: bool):
+    """
+    Lists of FileStores are where memory goes, their allocations are recorded when allocation sites are tracked,
+    outside of the timing of the stage
+    """
+    return memory.allocation_sites(name) if many else nullcontext()
+
+
+def load(schema, data, many: bool = False):
+    """
+    ``schema.load`` timed as a ``SchemaLoad`` call
+
+    :param schema: A marshmallow schema
+    :param data: The data to load
+    :param many: Load a list
+    :return: The loaded object or objects
+    """
+    with _allocation_sites(SCHEMA_LOAD, many), stage(SCHEMA_LOAD) as record:
+        record.items = len(data) if many else 1
+        return schema.load(data, many=many)
+
+
+def dump(schema, obj, many: bool = False):
+    """
+    ``schema.dump`` timed as a ``SchemaDump`` call
+
+    :param schema: A marshmallow schema
+    :param obj: The object or objects to dump
+    :param many: Dump a list
+    :return: The dumped data
+    """
+    with _allocation_sites(SCHEMA_DUMP, many), stage(SCHEMA_DUMP) as record:
+        record.items = len(obj) if many else 1
+        return schema.dump(obj, many=many)
+
+
+def dumps(schema, obj, many: bool = False) -> str:
+    """
+    ``schema.dumps`` timed as a ``SchemaDump`` call, with the size of the JSON
+
+    :param schema: A marshmallow schema
+    :param obj: The object or objects to dump
+    :param many: Dump a list
+    :return: The JSON
+    """
+    with _allocation_sites(SCHEMA_DUMP, many), stage(SCHEMA_DUMP) as record:
+        record.items = len(obj) if many else 1
+        serialized = schema.dumps(obj, many=many)
+        record.bytes = len(serialized)
+        return serialized
+
+
+def _before_call(context=None, **_):
+    if context is not None:
+        context[_STARTED] = time.perf_counter()
+
+
+def _after_call(http_response=None, parsed=None, model=None, context=None, **_):
+    started = (context or {}).get(_STARTED)
+    if started is None or model is None:
+        return
+    record = StageRecord()
+    if isinstance(parsed, dict):
+        if "Count" in parsed:
+            record.items = parsed["Count"]
+        elif "Item" in parsed:
+            record.items = 1
+    if http_response is not None:
+        content_length = http_response.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            record.bytes = int(content_length)
+        elif not model.has_streaming_output:
+            record.bytes = len(http_response.content or b"")
+    name = SERVICE_STAGES.get(model.service_model.service_name, model.service_model.service_name)
+    record_stage(name, (time.perf_counter() - started) * 1000, record)
+
+
+def instrument(client_or_resource):
+    """
+    Time every call made by a boto3 client or resource as a call of the stage of its service
+
+    :param client_or_resource: A boto3 client, resource or table
+    :return: The same client or resource
+    """
+    client = getattr(getattr(client_or_resource, "meta", None), "client", client_or_resource)
+    events = client.meta.events
+    events.register("before-call.*.*", _before_call, unique_id="stage-timings-before-call")
+    events.register("after-call.*.*", _after_call, unique_id="stage-timings-after-call")
+    return client_or_resource
+
+
+def invocation_totals() -> Dict[str, Dict[str, float]]:
+    """
+    :return: The totals of each stage recorded since the invocation started
+    """
+    with _lock:
+        return {name: dict(stage_totals) for name, stage_totals in _invocation_totals.items()}
+
+
+def reset() -> None:
+    """
+    Forget the totals of the previous invocation
+    """
+    with _lock:
+        _invocation_totals.clear()
+
+
+def _publish(span) -> None:
+    totals = invocation_totals()
+    for name, stage_totals in totals.items():
+        metrics.add_metric(name=f"{name}Calls", unit=MetricUnit.Count, value=stage_totals[CALLS])
+        metrics.add_metric(name=f"{name}Duration", unit=MetricUnit.Milliseconds, value=stage_totals[DURATION_MS])
+        if stage_totals[ITEMS]:
+            metrics.add_metric(name=f"{name}Items", unit=MetricUnit.Count, value=stage_totals[ITEMS])
+        if stage_totals[BYTES]:
+            metrics.add_metric(name=f"{name}Bytes", unit=MetricUnit.Bytes, value=stage_totals[BYTES])
+        if span.is_recording():
+            span.set_attributes(_span_attributes(name, stage_totals))
+
+
+def publish_stage_metrics(func):
+    """
+    Publish the stage totals of each invocation as EMF metrics and attributes of the handler span, apply it
+    inside ``join_trace``
+    """
+
+    @functools.wraps(func)
+    def wrapper(event, context):
+        reset()
+        span = trace.get_current_span()
+        try:
+            return func(event, context)
+        finally:
+            _publish(span)
+
+    return metrics.log_metrics(wrapper)
@@ -0,0 +1,129 @@
+"""
+SNS Topic Pool
+==============
+
+Creating an SNS topic is the slowest step of creating an incoming FileStore. This module keeps a warm pool
+of pre-created, untagged topics that creation can claim and then configure for its FileStore.
+
+-------------------------------------
+Pool Table Structure
+
+Key Attributes:
+--------------------------
+pool: str
+topic-arn: str
+
+Keys
+--------------------------
+primary-key: (hash: pool, range: topic-arn)
+
+"""
+
+import random
+from typing import Optional
+from uuid import uuid4
+
+from aws_lambda_powertools import Logger
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+from config import PROJECT, TOPIC_POOL_DYNAMODB_TABLE, TOPIC_POOL_TARGET_SIZE
+from evertz_io_observability.otel_collector import export_trace
+from tracing import MINIMAL, start_span
+from utility import create_sns_topic, get_table_with_retry_config
+
+logger = Logger()
+
+# Unique Attributes
+POOL = "pool"
+TOPIC_ARN = "topic-arn"
+
+# Concurrent creates race for the first topics of the pool, so each one tries a few at random
+CLAIM_CANDIDATES = 5
+
+
+@start_span()
+def claim_pooled_topic() -> Optional[str]:
+    """
+    Remove a topic from the pool, so that it can be used by a new FileStore
+
+    :return: The arn of the claimed topic, None when the pool is disabled or empty
+    """
+    if not TOPIC_POOL_DYNAMODB_TABLE:
+        return None
+
+    table = get_table_with_retry_config(TOPIC_POOL_DYNAMODB_TABLE)
+    response = table.query(KeyConditionExpression=Key(POOL).eq(PROJECT), Limit=CLAIM_CANDIDATES)
+    candidates = [item[TOPIC_ARN] for item in response["Items"]]
+    random.shuffle(candidates)
+
+    for topic_arn in candidates:
+        try:
+            table.delete_item(Key={POOL: PROJECT, TOPIC_ARN: topic_arn}, ConditionExpression=Attr(TOPIC_ARN).exists())
+        except ClientError as client_error:
+            if client_error.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                logger.debug(f"Pooled topic [{topic_arn}] was claimed by another request")
+                continue
+            raise
+        logger.info(f"Claimed pooled topic [{topic_arn}]")
+        return topic_arn
+
+    logger.info("The topic pool is empty")
+    return None
+
+
+@start_span()
+def get_topic_pool_size() -> int:
+    """
+    Count the topics available in the pool
+
+    :return: The number of pooled topics
+    """
+    table = get_table_with_retry_config(TOPIC_POOL_DYNAMODB_TABLE)
+    kwargs = {"KeyConditionExpression": Key(POOL).eq(PROJECT), "Select": "COUNT"}
+    size = 0
+    while True:
+        response = table.query(**kwargs)
+        size += response["Count"]
+        if "LastEvaluatedKey" not in response:
+            return size
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+@start_span()
+def add_pooled_topic() -> str:
+    """
+    Create an untagged topic and add it to the pool
+
+    :return: The arn of the new topic
+    """
+    create_topic_response = create_sns_topic(name=f"{PROJECT}-pool-{uuid4()}", attributes={}, tags=[])
+    topic_arn = create_topic_response["TopicArn"]
+    table = get_table_with_retry_config(TOPIC_POOL_DYNAMODB_TABLE)
+    table.put_item(Item={POOL: PROJECT, TOPIC_ARN: topic_arn})
+    return topic_arn
+
+
+@export_trace
+@logger.inject_lambda_context()
+@start_span(level=MINIMAL)
+def refill_topic_pool(event, context):
+    """
+    The scheduled lambda that tops the topic pool up to ``TOPIC_POOL_TARGET_SIZE``
+
+    :param event: The schedule event
+    :param context: lambda execution context
+    :return: The number of topics created and the size of the pool
+    """
+    logger.info(context)  # For pylint
+    logger.info(event)  # For pylint
+
+    if not TOPIC_POOL_DYNAMODB_TABLE:
+        logger.warning("The topic pool is disabled, TOPIC_POOL_DYNAMODB_TABLE is not set")
+        return {"created": 0, "size": 0}
+
+    size = get_topic_pool_size()
+    missing = max(TOPIC_POOL_TARGET_SIZE - size, 0)
+    logger.info(f"Topic pool has [{size}] topics, creating [{missing}]")
+    for _ in range(missing):
+        add_pooled_topic()
+    return {"created": missing, "size": size + missing}
@@ -0,0 +1,58 @@
+"""
+Tracing Levels
+==============
+
+Decides at import time which functions get a span, so that small requests are not slowed down by spans
+nobody reads.
+
+``start_span`` takes the level of detail of the span it creates:
+
+- ``MINIMAL``: the operation a request performs, e.g. creating a FileStore
+- ``STANDARD``: each call to another service, e.g. a DynamoDB query or an SNS topic being created
+- ``VERBOSE``: pass-throughs and cache lookups, whose time is already covered by a span around them
+
+A function whose level is finer than ``TRACING_LEVEL`` is returned undecorated, so it costs nothing when it is
+called. Spans that are left out do not lose their attributes, which go to the enclosing span instead.
+"""
+
+from typing import Callable
+
+from aws_lambda_powertools import Logger
+from config import TRACING_LEVEL
+from evertz_io_observability.decorators import start_span as observability_start_span
+
+logger = Logger()
+
+MINIMAL = "minimal"
+STANDARD = "standard"
+VERBOSE = "verbose"
+
+LEVELS = {MINIMAL: 0, STANDARD: 1, VERBOSE: 2}
+
+if TRACING_LEVEL not in LEVELS:
+    logger.warning(f"Unknown TRACING_LEVEL [{TRACING_LEVEL}], using [{STANDARD}]")
+
+
+def is_traced(level: str) -> bool:
+    """
+    :param level: The level of detail of a span
+    :return: True when spans of this level are created
+    """
+    return LEVELS[level] <= LEVELS.get(TRACING_LEVEL, LEVELS[STANDARD])
+
+
+def _untraced(func: Callable) -> Callable:
+    return func
+
+
+def start_span(level: str = STANDARD, **kwargs) -> Callable[[Callable], Callable]:
+    """
+    ``start_span`` of evertz_io_observability, for spans of ``level`` or coarser
+
+    :param level: The level of detail of the span
+    :param kwargs: Passed to ``start_span`` of evertz_io_observability
+    :return: A decorator wrapping the function in a span, or leaving it as is
+    """
+    if not is_traced(level):
+        return _untraced
+    return observability_start_span(**kwargs)
@@ -5,33 +5,122 @@ Boto3 SNS module
 This module contains s3 boto client
 """
 
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
 import boto3
+import consumed_capacity
+import stages
 from aws_lambda_powertools import Logger
 from botocore.config import Config
+from cache import TTLCache
+from config import (
+    RESTRICTED_TABLE_CACHE_MAX_SIZE,
+    RESTRICTED_TABLE_CACHE_TTL_SECONDS,
+    SNS_UNSUBSCRIBE_MAX_PASSES,
+    SNS_UNSUBSCRIBE_MAX_WORKERS,
+)
 from evertz_io_identity_lib.iam import restricted_table
-from evertz_io_observability.decorators import start_span
+from tracing import VERBOSE, start_span
 
 # Added Boto configuration to add Retries(Exponential Backoff)
 RETRY_CONFIG = Config(retries={"total_max_attempts": 4, "mode": "standard"})
 
-sns_client = boto3.client("sns", config=RETRY_CONFIG)
+# SNS calls are fanned out over a thread pool, so the client gets a connection for every unsubscribe worker
+# plus the page prefetcher, and adaptive retries which add client side rate limiting once SNS starts throttling
+SNS_CONFIG = Config(
+    retries={"total_max_attempts": 4, "mode": "adaptive"},
+    max_pool_connections=SNS_UNSUBSCRIBE_MAX_WORKERS + 1,
+)
+
+RESTRICTED_TABLE_CACHE = TTLCache(maxsize=RESTRICTED_TABLE_CACHE_MAX_SIZE, ttl=RESTRICTED_TABLE_CACHE_TTL_SECONDS)
 """
-A low-level client representing Amazon Simple Notification System (SNS)
+(table name, tenant id, thread id) -> dynamodb table resource restricted to the tenant
+
+Worker pools whose threads call it on every invocation, like the reconciler, are kept for the lifetime of the
+container, so that their entries are reused rather than left behind by finished threads.
 """
 
+# boto3 resources must not be shared between threads, the reconciler, export and bulk import workers each
+# get their own, while the low-level clients below are thread safe and shared
+_thread_resources = threading.local()
+
 logger = Logger()
 
 
-@start_span()
+@lru_cache(maxsize=None)
+def get_sns_client():
+    """
+    A low-level client representing Amazon Simple Notification System (SNS), shared by all threads
+
+    The client is created on first use, so that functions which never call SNS do not pay for it at cold start.
+
+    :return: The SNS client
+    """
+    return stages.instrument(boto3.client("sns", config=SNS_CONFIG))
+
+
+@start_span(level=VERBOSE)
 def get_restricted_table_with_retry_config(table_name, tenant_id):
     """
     Get a restricted table using the tenant_id, table_name with boto3 retry configuration
 
+    The resource, and the credentials restricted to the tenant behind it, are reused by warm invocations for
+    ``RESTRICTED_TABLE_CACHE_TTL_SECONDS``. Each thread gets its own resource.
+
     :param table_name: The name of the Table to return for the given Tenant
     :param tenant_id: The id of a tenant for which this table will be restricted
     :return: A dynamodb table resource with restricted access
     """
-    return restricted_table(table_name, tenant_id, config=RETRY_CONFIG)
+    key = (table_name, tenant_id, threading.get_ident())
+    table = RESTRICTED_TABLE_CACHE.get(key)
+    if table is None:
+        # The role restricting the table to the tenant is assumed by the identity library with its own client
+        with stages.stage(stages.STS):
+            table = stages.instrument(restricted_table(table_name, tenant_id, config=RETRY_CONFIG))
+        consumed_capacity.track(table, tenant_id)
+        RESTRICTED_TABLE_CACHE.put(key, table)
+    return table
+
+
+def get_table_with_retry_config(table_name):
+    """
+    Get a table owned by this service, which is not restricted to a tenant, with boto3 retry configuration
+
+    The resource is created once per thread, from a session of its own, and reused by warm invocations.
+
+    :param table_name: The name of the Table
+    :return: A dynamodb table resource
+    """
+    tables = getattr(_thread_resources, "tables", None)
+    if tables is None:
+        tables = _thread_resources.tables = {}
+    table = tables.get(table_name)
+    if table is None:
+        table = boto3.session.Session().resource("dynamodb", config=RETRY_CONFIG).Table(table_name)
+        table = tables[table_name] = consumed_capacity.track(stages.instrument(table))
+    return table
+
+
+@start_span()
+def assume_role_session(role_arn: str, session_name: str) -> boto3.Session:
+    """
+    Get a boto3 session with the credentials of an assumed role
+
+    :param role_arn: The arn of the role to assume
+    :param session_name: The name of the role session
+    :return: A session using the temporary credentials of the role
+    """
+    # Called from the reconciler workers, the default session must not be used by several threads at once
+    sts_client = stages.instrument(boto3.session.Session().client("sts", config=RETRY_CONFIG))
+    credentials = sts_client.assume_role(RoleArn=role_arn, RoleSessionName=session_name)["Credentials"]
+    return boto3.Session(
+        aws_access_key_id=credentials["AccessKeyId"],
+        aws_secret_access_key=credentials["SecretAccessKey"],
+        aws_session_token=credentials["SessionToken"],
+    )
 
 
 @start_span()
@@ -45,11 +134,38 @@ def create_sns_topic(name: str, attributes: dict = None, tags: list = None):
     :return: Returns a dict with the TopicArn
     """
     logger.info(f"Creating sns topic with name: {name}")
-    create_topic_response = sns_client.create_topic(Name=name, Attributes=attributes, Tags=tags)
+    create_topic_response = get_sns_client().create_topic(Name=name, Attributes=attributes, Tags=tags)
     logger.debug(create_topic_response)
     return create_topic_response
 
 
+@start_span()
+def set_sns_topic_attribute(topic_arn: str, name: str, value: str) -> None:
+    """
+    Set an attribute of an SNS topic
+
+    :param topic_arn: The arn of sns topic
+    :param name: The name of the attribute, e.g. ``Policy``
+    :param value: The value of the attribute
+    :return: None
+    """
+    logger.info(f"Setting attribute [{name}] of sns topic [{topic_arn}]")
+    get_sns_client().set_topic_attributes(TopicArn=topic_arn, AttributeName=name, AttributeValue=value)
+
+
+@start_span()
+def tag_sns_topic(topic_arn: str, tags: list) -> None:
+    """
+    Add tags to an SNS topic
+
+    :param topic_arn: The arn of sns topic
+    :param tags: Tags to be added to the sns topic
+    :return: None
+    """
+    logger.info(f"Tagging sns topic [{topic_arn}]")
+    get_sns_client().tag_resource(ResourceArn=topic_arn, Tags=tags)
+
+
 @start_span()
 def delete_sns_topic(topic_arn: str) -> None:
     """
@@ -60,22 +176,81 @@ def delete_sns_topic(topic_arn: str) -> None:
     """
     _delete_sns_topic_subscriptions(topic_arn)
     logger.info(f"Deleting sns topic with arn [{topic_arn}]")
-    sns_client.delete_topic(TopicArn=topic_arn)
+    get_sns_client().delete_topic(TopicArn=topic_arn)
 
 
 def _delete_sns_topic_subscriptions(topic_arn: str) -> None:
     """
     Helper to delete sns topic subscriptions
 
+    The next page of subscriptions is prefetched while the current page is unsubscribed on a bounded
+    thread pool. SNS does not guarantee that ``NextToken`` stays valid while the topic is being modified,
+    so the topic is swept again until a pass finds nothing left to remove, at most
+    ``SNS_UNSUBSCRIBE_MAX_PASSES`` times.
+
     :param topic_arn: The arn of sns topic
     :return: None
     """
     logger.info(f"Deleting subscriptions of sns topic [{topic_arn}]")
-    response = sns_client.list_subscriptions_by_topic(TopicArn=topic_arn)
+    with ThreadPoolExecutor(max_workers=1) as page_loader, ThreadPoolExecutor(
+        max_workers=SNS_UNSUBSCRIBE_MAX_WORKERS
+    ) as unsubscriber:
+        for _ in range(SNS_UNSUBSCRIBE_MAX_PASSES):
+            if _unsubscribe_topic_pages(topic_arn, page_loader, unsubscriber) == 0:
+                return
+            logger.debug(f"Sweeping sns topic [{topic_arn}] for remaining subscriptions")
+    logger.warning(
+        f"Subscriptions of sns topic [{topic_arn}] were still being removed after [{SNS_UNSUBSCRIBE_MAX_PASSES}] passes"
+    )
+
+
+def _unsubscribe_topic_pages(topic_arn: str, page_loader: ThreadPoolExecutor, unsubscriber: ThreadPoolExecutor) -> int:
+    """
+    Unsubscribe every subscription of one pass over the pages of ``list_subscriptions_by_topic``
+
+    :param topic_arn: The arn of sns topic
+    :param page_loader: Executor used to prefetch the next page
+    :param unsubscriber: Executor used to run the unsubscribe calls
+    :return: The number of subscriptions removed
+    """
+    removed = 0
+    response = _list_subscriptions_page(topic_arn)
     while True:
-        for subscription_item in response["Subscriptions"]:
-            sns_client.unsubscribe(SubscriptionArn=subscription_item["SubscriptionArn"])
         next_token = response.get("NextToken")
-        if not next_token:
-            break
-        response = sns_client.list_subscriptions_by_topic(TopicArn=topic_arn, NextToken=next_token)
+        next_page = page_loader.submit(_list_subscriptions_page, topic_arn, next_token) if next_token else None
+
+        # Subscriptions awaiting confirmation have no ARN yet and cannot be removed by the owner
+        subscription_arns = [
+            item["SubscriptionArn"] for item in response["Subscriptions"] if item["SubscriptionArn"].startswith("arn:")
+        ]
+        # Consuming the results re-raises the first failed unsubscribe
+        for _ in unsubscriber.map(_unsubscribe, subscription_arns):
+            removed += 1
+
+        if next_page is None:
+            return removed
+        response = next_page.result()
+
+
+def _list_subscriptions_page(topic_arn: str, next_token: Optional[str] = None) -> dict:
+    """
+    Fetch a single page of subscriptions of an sns topic
+
+    :param topic_arn: The arn of sns topic
+    :param next_token: The token of the page to fetch, the first page when None
+    :return: The ``list_subscriptions_by_topic`` response
+    """
+    kwargs = {"TopicArn": topic_arn}
+    if next_token:
+        kwargs["NextToken"] = next_token
+    return get_sns_client().list_subscriptions_by_topic(**kwargs)
+
+
+def _unsubscribe(subscription_arn: str) -> None:
+    """
+    Remove a single subscription
+
+    :param subscription_arn: The arn of the subscription
+    :return: None
+    """
+    get_sns_client().unsubscribe(SubscriptionArn=subscription_arn)
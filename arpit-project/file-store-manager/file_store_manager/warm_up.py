@@ -0,0 +1,143 @@
+"""
+Warm-up
+=======
+
+Provisioned concurrency containers are initialised ahead of traffic, but the first request they serve
+still imports the modules deferred off the cold start path, creates the boto3 clients and resources, sets
+the tracer provider and its exporter up, and assumes the role restricting a table to its tenant. Priming does
+that work up front:
+
+- when a container is initialised for provisioned concurrency, with ``prime_on_provisioned_concurrency``
+  called by the handler modules at import time, for the tenants listed in ``WARM_UP_TENANT_IDS``
+- when a handler receives a warm-up event, ``{"warmUp": true, "tenantIds": [...]}``, which is answered by
+  ``warm_up_handler`` before any tracing or logging decorator runs, so no trace is emitted for it
+"""
+
+import functools
+import time
+from typing import Callable, Dict, Iterable, List
+
+from aws_lambda_powertools import Logger
+from config import (
+    DEFERRED_TRACE_EXPORT,
+    FILE_STORE_DYNAMODB_TABLE,
+    IDEMPOTENCY_DYNAMODB_TABLE,
+    LAMBDA_INITIALIZATION_TYPE,
+    PROJECT,
+    WARM_UP_TENANT_IDS,
+)
+
+logger = Logger()
+
+WARM_UP_EVENT_KEY = "warmUp"
+TENANT_IDS_KEY = "tenantIds"
+
+# The modules are only imported by the steps below, priming must not slow down the cold start of handlers
+# pylint: disable=import-outside-toplevel
+
+
+def is_warm_up_event(event) -> bool:
+    """
+    :param event: The event of an invocation
+    :return: True for a warm-up event
+    """
+    return isinstance(event, dict) and event.get(WARM_UP_EVENT_KEY) is True
+
+
+def _import_deferred_modules() -> None:
+    import decorators
+    import service
+    from user_management_client import client  # noqa: F401 pylint: disable=unused-import
+
+    service._event_bridge()  # pylint: disable=protected-access
+    decorators._client_error()  # pylint: disable=protected-access
+    decorators._json_api_errors()  # pylint: disable=protected-access
+
+
+def _create_clients() -> None:
+    from utility import get_sns_client, get_table_with_retry_config
+
+    get_sns_client()
+    for table_name in (FILE_STORE_DYNAMODB_TABLE, IDEMPOTENCY_DYNAMODB_TABLE):
+        if table_name:
+            get_table_with_retry_config(table_name)
+
+
+def _create_restricted_tables(tenant_ids: Iterable[str]) -> Callable[[], None]:
+    def create_restricted_tables() -> None:
+        from utility import get_restricted_table_with_retry_config
+
+        for tenant_id in tenant_ids:
+            get_restricted_table_with_retry_config(FILE_STORE_DYNAMODB_TABLE, tenant_id)
+
+    return create_restricted_tables
+
+
+def _without_spans(event, context) -> None:
+    """
+    The handler priming the tracer, it starts no span so nothing is exported
+    """
+
+
+def _create_tracer() -> None:
+    from evertz_io_observability.otel_collector import export_trace
+    from opentelemetry import trace
+
+    # export_trace sets the tracer provider and its exporter up on its first invocation only
+    export_trace(_without_spans)({}, None)
+    trace.get_tracer(PROJECT)
+    if DEFERRED_TRACE_EXPORT:
+        import deferred_export
+
+        deferred_export.install()
+
+
+def prime(tenant_ids: Iterable[str] = ()) -> Dict[str, float]:
+    """
+    Load and create everything the first request of a container would otherwise pay for
+
+    A step that fails is logged and skipped, warming up must never fail the container.
+
+    :param tenant_ids: Tenants whose restricted tables are created and cached
+    :return: The milliseconds taken by each step that succeeded
+    """
+    steps: List[tuple] = [
+        ("imports", _import_deferred_modules),
+        ("clients", _create_clients),
+        ("restrictedTables", _create_restricted_tables(list(tenant_ids))),
+        ("tracer", _create_tracer),
+    ]
+    timings = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as err:
+            logger.warning(f"Warm-up step [{name}] failed: {err}")
+            continue
+        timings[name] = round((time.perf_counter() - started) * 1000, 3)
+    logger.info(f"Warmed up in {timings}ms")
+    return timings
+
+
+def prime_on_provisioned_concurrency() -> None:
+    """
+    Prime the container during its initialisation when it is initialised for provisioned concurrency, with
+    the restricted tables of the tenants in ``WARM_UP_TENANT_IDS``
+    """
+    if LAMBDA_INITIALIZATION_TYPE == "provisioned-concurrency":
+        prime(WARM_UP_TENANT_IDS)
+
+
+def warm_up_handler(func):
+    """
+    Answer warm-up events without calling the handler, apply it above the tracing decorators
+    """
+
+    @functools.wraps(func)
+    def wrapper(event, context, *args, **kwargs):
+        if is_warm_up_event(event):
+            return {WARM_UP_EVENT_KEY: True, "primed": prime(event.get(TENANT_IDS_KEY) or [])}
+        return func(event, context, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,92 @@
+import json
+from copy import deepcopy
+from unittest.mock import patch
+from uuid import uuid4
+
+import boto3
+import pytest
+from evertz_io_identity_lib import Identity
+from file_store_client.schemas.file_class import FileClass
+from file_store_client.schemas.file_store import FILE_STORE_JSONAPI, FileStore
+from moto import mock_dynamodb, mock_sns, mock_sts
+from unit.conftest import (
+    TENANT_ID,
+    TENANT_TOKEN,
+    add_file_store_payload,
+    file_store_db,
+    idempotency_table_spec,
+    table_spec,
+)
+
+TENANT_SIZES = [10, 1000, 10000]
+"""
+FileStores of the tenants listings are measured with
+"""
+
+
+def rounds_for(size: int) -> int:
+    """
+    Listings of larger tenants take long enough per call for a few rounds to be stable
+    """
+    return max(3, 1000 // size)
+
+
+def listing_tenant(size: int) -> str:
+    return f"benchmark-tenant-{size}"
+
+
+def new_file_store(name: str) -> FileStore:
+    file_store = FILE_STORE_JSONAPI.load(json.loads(add_file_store_payload(FileClass.PLAYLIST_IMPORT.value, ["pxf"])))
+    file_store.name = name
+    return file_store
+
+
+def seed_tenant(table, tenant_id: str, count: int):
+    from db import file_store_item
+
+    with table.batch_writer() as batch:
+        for index in range(count):
+            file_store = deepcopy(file_store_db)
+            file_store.id = str(uuid4())
+            file_store.tenant = tenant_id
+            file_store.name = f"benchmark file store {index}"
+            batch.put_item(Item=file_store_item(file_store))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def aws():
+    """
+    One set of mocked AWS services for the whole run, the listed tenants are only seeded once
+    """
+    with mock_sts(), mock_sns(), mock_dynamodb():
+        ddb = boto3.resource("dynamodb")
+        table = ddb.create_table(**table_spec)
+        ddb.create_table(**idempotency_table_spec)
+        for size in TENANT_SIZES:
+            seed_tenant(table, listing_tenant(size), size)
+        yield table
+
+
+@pytest.fixture(scope="session", autouse=True)
+def event_bus():
+    with patch("evertz_io_events.EventBridge.emit") as emit:
+        yield emit
+
+
+@pytest.fixture()
+def tenant_identity() -> Identity:
+    return Identity(token=TENANT_TOKEN, verified=True)
+
+
+@pytest.fixture()
+def tenant_id() -> str:
+    return TENANT_ID
+
+
+@pytest.fixture()
+def stored_file_store(tenant_identity) -> FileStore:
+    from service import create_file_store, delete_file_store_by_id
+
+    file_store = create_file_store(tenant_identity, new_file_store(f"stored {uuid4()}"))
+    yield file_store
+    delete_file_store_by_id(file_store.tenant, file_store.id)
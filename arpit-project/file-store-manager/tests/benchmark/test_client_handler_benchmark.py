@@ -0,0 +1,65 @@
+from http import HTTPStatus
+from uuid import uuid4
+
+import pytest
+from benchmark.conftest import TENANT_SIZES, listing_tenant, rounds_for
+from file_store_client.schemas.client import RESPONSE_PAYLOAD_SCHEMA
+from file_store_client.schemas.file_class import FileClass
+
+
+class Context:
+    aws_request_id = "benchmark"
+    function_name = "benchmark"
+    function_version = "$LATEST"
+    memory_limit_in_mb = 512
+    invoked_function_arn = "arn:aws:lambda:us-east-1:123456789012:function:benchmark"
+
+
+def test_request_handler_get_file_store_by_id(benchmark, stored_file_store):
+    from client_handler import request_handler
+
+    parameters = {"file_store_id": stored_file_store.id, "tenant_id": stored_file_store.tenant}
+    response = benchmark(request_handler, "get_file_store_by_id", parameters)
+
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.parametrize("size", TENANT_SIZES)
+def test_request_handler_get_file_store_by_class(benchmark, size):
+    from client_handler import request_handler
+
+    parameters = {"class": FileClass.PLAYLIST_IMPORT.name, "tenant": listing_tenant(size)}
+    response = benchmark.pedantic(
+        request_handler, args=("get_file_store_by_class", parameters), rounds=rounds_for(size)
+    )
+
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_request_handler_not_found(benchmark, tenant_id):
+    from client_handler import request_handler
+
+    parameters = {"file_store_id": str(uuid4()), "tenant_id": tenant_id}
+    response = benchmark(request_handler, "get_file_store_by_id", parameters)
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_request_handler_invalid_parameters(benchmark):
+    from client_handler import request_handler
+
+    response = benchmark(request_handler, "get_file_store_by_id", {"file_store_id": "not a uuid"})
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_client_lambda_get_file_store_by_id(benchmark, stored_file_store):
+    from client_handler import client_lambda
+
+    event = {
+        "method_name": "get_file_store_by_id",
+        "parameters": {"file_store_id": stored_file_store.id, "tenant_id": stored_file_store.tenant},
+    }
+    response = benchmark(client_lambda, event, Context())
+
+    assert RESPONSE_PAYLOAD_SCHEMA.loads(response).status_code == HTTPStatus.OK
@@ -0,0 +1,58 @@
+from copy import deepcopy
+from uuid import uuid4
+
+import pytest
+from benchmark.conftest import TENANT_SIZES, listing_tenant, rounds_for
+from file_store_client.schemas.file_class import FileClass
+from unit.conftest import file_store_db
+
+
+@pytest.mark.parametrize("size", TENANT_SIZES)
+def test_get_file_stores_by_tenant(benchmark, size):
+    from db import get_file_stores_by_tenant
+
+    file_stores = benchmark.pedantic(get_file_stores_by_tenant, args=(listing_tenant(size),), rounds=rounds_for(size))
+
+    assert len(file_stores) == size
+
+
+@pytest.mark.parametrize("size", TENANT_SIZES)
+def test_get_file_stores_by_file_class(benchmark, size):
+    from db import get_file_stores_by_file_class
+
+    file_stores = benchmark.pedantic(
+        get_file_stores_by_file_class, args=(listing_tenant(size), FileClass.PLAYLIST_IMPORT), rounds=rounds_for(size)
+    )
+
+    assert len(file_stores) == size
+
+
+def test_get_file_store_by_id(benchmark, stored_file_store):
+    from db import get_file_store_by_id
+
+    file_store = benchmark(get_file_store_by_id, stored_file_store.tenant, stored_file_store.id)
+
+    assert file_store.id == stored_file_store.id
+
+
+def test_put_file_store(benchmark):
+    from db import put_file_store
+
+    def new_item():
+        file_store = deepcopy(file_store_db)
+        file_store.id = str(uuid4())
+        file_store.tenant = "benchmark-tenant-writes"
+        return (file_store,), {}
+
+    benchmark.pedantic(put_file_store, setup=new_item, rounds=50)
+
+
+def test_get_file_store_by_id_not_found(benchmark, tenant_id):
+    from db import get_file_store_by_id
+    from errors import FileStoreNotFound
+
+    def not_found():
+        with pytest.raises(FileStoreNotFound):
+            get_file_store_by_id(tenant_id, str(uuid4()))
+
+    benchmark(not_found)
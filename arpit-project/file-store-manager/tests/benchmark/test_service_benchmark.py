@@ -0,0 +1,97 @@
+from uuid import uuid4
+
+import pytest
+from benchmark.conftest import TENANT_SIZES, listing_tenant, new_file_store, rounds_for
+from file_store_client.schemas.file_class import FileClass
+
+
+def test_create_file_store(benchmark, tenant_identity):
+    from service import create_file_store, delete_file_store_by_id
+
+    created = []
+
+    def delete_created():
+        while created:
+            file_store = created.pop()
+            delete_file_store_by_id(file_store.tenant, file_store.id)
+
+    def new_request():
+        # Every round creates into a tenant holding the same FileStores, the next benchmarks too
+        delete_created()
+        return (tenant_identity, new_file_store(f"created {uuid4()}")), {}
+
+    def create(identity, file_store):
+        created.append(create_file_store(identity, file_store))
+        return created[-1]
+
+    try:
+        file_store = benchmark.pedantic(create, setup=new_request, rounds=20)
+    finally:
+        delete_created()
+
+    assert file_store.id
+
+
+def test_update_file_store(benchmark, stored_file_store, tenant_id):
+    from service import update_file_store
+
+    def renamed():
+        return (tenant_id, new_file_store(f"updated {uuid4()}"), stored_file_store.id, "benchmark"), {}
+
+    updated = benchmark.pedantic(update_file_store, setup=renamed, rounds=20)
+
+    assert updated.id == stored_file_store.id
+
+
+def test_delete_file_store_by_id(benchmark, tenant_identity):
+    from service import create_file_store, delete_file_store_by_id
+
+    def created():
+        file_store = create_file_store(tenant_identity, new_file_store(f"deleted {uuid4()}"))
+        return (file_store.tenant, file_store.id), {}
+
+    benchmark.pedantic(delete_file_store_by_id, setup=created, rounds=20)
+
+
+def test_get_file_store_by_id(benchmark, stored_file_store):
+    from service import get_file_store_by_id
+
+    file_store = benchmark(get_file_store_by_id, stored_file_store.tenant, stored_file_store.id)
+
+    assert file_store.id == stored_file_store.id
+
+
+@pytest.mark.parametrize("size", TENANT_SIZES)
+def test_get_all_files_stores_by_tenant(benchmark, size):
+    from service import get_all_files_stores_by_tenant
+
+    file_stores = benchmark.pedantic(
+        get_all_files_stores_by_tenant, args=(listing_tenant(size),), rounds=rounds_for(size)
+    )
+
+    assert len(file_stores) == size
+
+
+def test_create_file_store_name_already_exists(benchmark, tenant_identity, stored_file_store):
+    from errors import FilestoreNameAlreadyExists
+    from service import create_file_store
+
+    def conflict():
+        with pytest.raises(FilestoreNameAlreadyExists):
+            create_file_store(tenant_identity, new_file_store(stored_file_store.name))
+
+    benchmark(conflict)
+
+
+def test_update_file_store_changing_the_file_class(benchmark, stored_file_store, tenant_id):
+    from errors import FileStorePatchError
+    from service import update_file_store
+
+    other_class = new_file_store("other class")
+    other_class.store_type.file_class = FileClass.PLAYLIST_EXPORT
+
+    def refused():
+        with pytest.raises(FileStorePatchError):
+            update_file_store(tenant_id, other_class, stored_file_store.id, "benchmark")
+
+    benchmark(refused)
@@ -136,6 +136,24 @@ def client_lambda_get_file_store_by_class_event():
     }
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Container level caches must not leak between tests"""
+    from bucket_index import _bucket_index_cache
+    from decorators import IDENTITY_CACHE
+    from search import _search_index_cache, _tenant_versions
+    from service import USER_GROUPS_CACHE
+    from utility import RESTRICTED_TABLE_CACHE
+
+    USER_GROUPS_CACHE.clear()
+    RESTRICTED_TABLE_CACHE.clear()
+    IDENTITY_CACHE.clear()
+    _bucket_index_cache.clear()
+    _search_index_cache.clear()
+    _tenant_versions.clear()
+    yield
+
+
 @pytest.fixture(scope="session")
 def aws_credentials():
     """Mocked AWS Credentials for moto."""
@@ -188,6 +206,10 @@ table_spec = dict(
         {"AttributeName": "class", "AttributeType": "S"},
         {"AttributeName": "store-id", "AttributeType": "S"},
         {"AttributeName": "tenant-id", "AttributeType": "S"},
+        {"AttributeName": "bucket", "AttributeType": "S"},
+        {"AttributeName": "state", "AttributeType": "S"},
+        {"AttributeName": "meta-translation-id", "AttributeType": "S"},
+        {"AttributeName": "meta-translation-destination", "AttributeType": "S"},
     ],
     KeySchema=[{"AttributeName": "tenant-id", "KeyType": "HASH"}, {"AttributeName": "store-id", "KeyType": "RANGE"}],
     LocalSecondaryIndexes=[
@@ -200,6 +222,49 @@ table_spec = dict(
             "Projection": {"ProjectionType": "INCLUDE", "NonKeyAttributes": ["data"]},
         }
     ],
+    GlobalSecondaryIndexes=[
+        {
+            "IndexName": "BUCKET-INDEX",
+            "KeySchema": [
+                {"AttributeName": "bucket", "KeyType": "HASH"},
+                {"AttributeName": "store-id", "KeyType": "RANGE"},
+            ],
+            "Projection": {"ProjectionType": "INCLUDE", "NonKeyAttributes": ["data"]},
+        },
+        {
+            "IndexName": "STATE-INDEX",
+            "KeySchema": [
+                {"AttributeName": "state", "KeyType": "HASH"},
+                {"AttributeName": "store-id", "KeyType": "RANGE"},
+            ],
+            "Projection": {"ProjectionType": "INCLUDE", "NonKeyAttributes": ["data"]},
+        },
+    ]
+    + [
+        {
+            "IndexName": f"META-{key.upper()}-INDEX",
+            "KeySchema": [
+                {"AttributeName": "tenant-id", "KeyType": "HASH"},
+                {"AttributeName": f"meta-{key}", "KeyType": "RANGE"},
+            ],
+            "Projection": {"ProjectionType": "INCLUDE", "NonKeyAttributes": ["data"]},
+        }
+        for key in ["translation-id", "translation-destination"]
+    ],
+    BillingMode="PAY_PER_REQUEST",
+)
+
+
+idempotency_table_spec = dict(
+    TableName=config.IDEMPOTENCY_DYNAMODB_TABLE,
+    AttributeDefinitions=[
+        {"AttributeName": "tenant-id", "AttributeType": "S"},
+        {"AttributeName": "idempotency-key", "AttributeType": "S"},
+    ],
+    KeySchema=[
+        {"AttributeName": "tenant-id", "KeyType": "HASH"},
+        {"AttributeName": "idempotency-key", "KeyType": "RANGE"},
+    ],
     BillingMode="PAY_PER_REQUEST",
 )
 
@@ -212,6 +277,15 @@ def empty_dynamodb_table():
         yield table
 
 
+@pytest.fixture()
+def dynamodb_tables_with_idempotency():
+    with moto.mock_dynamodb():
+        ddb = boto3.resource("dynamodb")
+        table = ddb.create_table(**table_spec)
+        idempotency_table = ddb.create_table(**idempotency_table_spec)
+        yield table, idempotency_table
+
+
 @pytest.fixture()
 def query_dynamodb_table():
     with moto.mock_dynamodb():
@@ -52,7 +52,7 @@ class TestAPIGateway:
             lambda_context,
         )
 
-        with patch("service.EventBridge.emit") as mock_emit:
+        with patch("evertz_io_events.EventBridge.emit") as mock_emit:
             create_response = add_file_store(event, context)
             mock_emit.assert_called_once()
             event_data = mock_emit.call_args[0][0].data
@@ -109,7 +109,7 @@ class TestAPIGateway:
             lambda_context,
         )
 
-        with patch("service.EventBridge.emit") as mock_emit:
+        with patch("evertz_io_events.EventBridge.emit") as mock_emit:
             create_response = add_file_store(event, context)
             mock_emit.assert_called_once()
             event_data = mock_emit.call_args[0][0].data
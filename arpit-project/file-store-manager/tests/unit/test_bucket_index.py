@@ -0,0 +1,72 @@
+from copy import deepcopy
+from uuid import uuid4
+
+from file_store_client.schemas.file_store import FILE_STORE_DB_SCHEMA
+from unit.conftest import file_store_db_payload
+
+
+def _file_store(bucket: str, folder_prefix: str, tenant: str = None):
+    payload = deepcopy(file_store_db_payload)
+    payload["id"] = str(uuid4())
+    payload["bucket"] = bucket
+    payload["folderPrefix"] = folder_prefix
+    payload["storeType"]["fileClass"] = "CONTENT_SERVICE_ASSET"
+    if tenant:
+        payload["tenant"] = tenant
+    return FILE_STORE_DB_SCHEMA.load(payload)
+
+
+def test_prefix_trie_longest_match():
+    from bucket_index import PrefixTrie
+
+    root_store = _file_store("bucket", "")
+    incoming_store = _file_store("bucket", "incoming/")
+    nested_store = _file_store("bucket", "/incoming/pxf")
+
+    trie = PrefixTrie()
+    for file_store in [root_store, incoming_store, nested_store]:
+        trie.insert(file_store.folder_prefix, file_store)
+
+    assert trie.longest_match("playlist.pxf") == [root_store]
+    assert trie.longest_match("incoming/playlist.pxf") == [incoming_store]
+    assert trie.longest_match("incoming/pxf/playlist.pxf") == [nested_store]
+    # Prefixes match whole folders only
+    assert trie.longest_match("incoming-old/playlist.pxf") == [root_store]
+
+
+def test_prefix_trie_without_root_store():
+    from bucket_index import PrefixTrie
+
+    trie = PrefixTrie()
+    trie.insert("incoming", _file_store("bucket", "incoming"))
+
+    assert trie.longest_match("outgoing/playlist.pxf") == []
+
+
+def test_get_file_stores_by_bucket_key(empty_dynamodb_table):
+    from db import put_file_store
+    from service import get_file_stores_by_bucket_key
+
+    root_store = _file_store("bucket", "")
+    incoming_store = _file_store("bucket", "incoming", tenant=str(uuid4()))
+    other_bucket_store = _file_store("other-bucket", "incoming")
+    for file_store in [root_store, incoming_store, other_bucket_store]:
+        put_file_store(file_store)
+
+    assert get_file_stores_by_bucket_key("bucket", "incoming/playlist.pxf") == [incoming_store]
+    assert get_file_stores_by_bucket_key("bucket", "playlist.pxf") == [root_store]
+    assert get_file_stores_by_bucket_key("missing-bucket", "playlist.pxf") == []
+
+
+def test_bucket_index_is_cached(empty_dynamodb_table):
+    from bucket_index import _bucket_index_cache
+    from db import put_file_store
+    from service import get_file_stores_by_bucket_key
+
+    put_file_store(_file_store("bucket", ""))
+
+    get_file_stores_by_bucket_key("bucket", "a.pxf")
+    get_file_stores_by_bucket_key("bucket", "b.pxf")
+
+    assert _bucket_index_cache.stats()["misses"] == 1
+    assert _bucket_index_cache.stats()["hits"] == 1
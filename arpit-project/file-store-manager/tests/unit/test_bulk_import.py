@@ -0,0 +1,135 @@
+import gzip
+import json
+from copy import deepcopy
+from unittest.mock import patch
+from uuid import uuid4
+
+from file_store_client.schemas.file_store import FILE_STORE_DB_SCHEMA, FILE_STORE_SCHEMA
+from unit.conftest import file_store_db_payload
+
+
+def _write_ndjson(path, count):
+    ids = set()
+    with gzip.open(path, "wt", encoding="utf-8") as ndjson_file:
+        for index in range(count):
+            payload = deepcopy(file_store_db_payload)
+            payload["id"] = str(uuid4())
+            payload["tenant"] = f"tenant-{index % 3}"
+            payload["metadata"] = {"priority": 1.5}
+            ndjson_file.write(json.dumps(FILE_STORE_SCHEMA.dump(FILE_STORE_DB_SCHEMA.load(payload))) + "\n")
+            ids.add(payload["id"])
+    return ids
+
+
+def test_import_file_stores(empty_dynamodb_table, tmp_path):
+    from bulk_import import FAILED, IMPORTED, import_file_stores
+    from db import get_file_store_by_id
+
+    path = str(tmp_path / "file-stores.ndjson.gz")
+    ids = _write_ndjson(path, 60)
+    with gzip.open(path, "at", encoding="utf-8") as ndjson_file:
+        ndjson_file.write("not json\n")
+        ndjson_file.write(json.dumps({"id": "invalid", "name": 1}) + "\n")
+
+    failures = []
+    counts = import_file_stores([path], concurrency=3, on_failure=failures.append)
+
+    assert counts[IMPORTED] == 60
+    assert counts[FAILED] == 2
+    assert [(failure["line"], failure["id"]) for failure in failures] == [(61, None), (62, "invalid")]
+    items = empty_dynamodb_table.scan()["Items"]
+    assert {item["store-id"] for item in items} == ids
+    assert all(item["bucket"] == file_store_db_payload["bucket"] for item in items)
+    item = next(item for item in items if item["tenant-id"] == "tenant-0")
+    assert get_file_store_by_id("tenant-0", item["store-id"]).metadata == {"priority": 1.5}
+
+
+def test_import_file_stores_retries_unprocessed_items(empty_dynamodb_table, tmp_path):
+    from bulk_import import FAILED, IMPORTED, import_file_stores
+    from db import batch_write_file_store_items
+
+    path = str(tmp_path / "file-stores.ndjson.gz")
+    ids = _write_ndjson(path, 20)
+    requests = []
+
+    def throttled_batch_write(items):
+        requests.append(len(items))
+        if len(requests) == 1:
+            _, consumed_capacity = batch_write_file_store_items(items[:5])
+            return items[5:], consumed_capacity
+        return batch_write_file_store_items(items)
+
+    with patch("bulk_import.batch_write_file_store_items", side_effect=throttled_batch_write), patch(
+        "bulk_import.BACKOFF_BASE_SECONDS", 0
+    ):
+        counts = import_file_stores([path], concurrency=1)
+
+    assert requests == [20, 15]
+    assert counts[IMPORTED] == 20
+    assert counts[FAILED] == 0
+    assert {item["store-id"] for item in empty_dynamodb_table.scan()["Items"]} == ids
+
+
+def test_import_file_stores_reports_failed_batches(empty_dynamodb_table, tmp_path):
+    from botocore.exceptions import ClientError
+    from bulk_import import FAILED, IMPORTED, import_file_stores
+
+    path = str(tmp_path / "file-stores.ndjson.gz")
+    _write_ndjson(path, 30)
+    failures = []
+    error = ClientError({"Error": {"Code": "ValidationException"}}, "BatchWriteItem")
+
+    with patch("bulk_import.batch_write_file_store_items", side_effect=[error, ([], 5.0)]):
+        counts = import_file_stores([path], concurrency=1, on_failure=failures.append)
+
+    assert counts[IMPORTED] == 5
+    assert counts[FAILED] == 25
+    assert {failure["error"] for failure in failures} == {"ValidationException"}
+
+
+def test_import_file_stores_rejects_lines_without_tenant_or_id(empty_dynamodb_table, tmp_path):
+    from bulk_import import FAILED, IMPORTED, import_file_stores
+
+    path = str(tmp_path / "file-stores.ndjson.gz")
+    _write_ndjson(path, 2)
+    with gzip.open(path, "at", encoding="utf-8") as ndjson_file:
+        for missing in ("tenant", "id"):
+            payload = FILE_STORE_SCHEMA.dump(FILE_STORE_DB_SCHEMA.load(deepcopy(file_store_db_payload)))
+            payload.pop(missing)
+            ndjson_file.write(json.dumps(payload) + "\n")
+
+    failures = []
+    counts = import_file_stores([path], concurrency=1, on_failure=failures.append)
+
+    assert counts[IMPORTED] == 2
+    assert counts[FAILED] == 2
+    assert [failure["line"] for failure in failures] == [3, 4]
+    assert len(empty_dynamodb_table.scan()["Items"]) == 2
+
+
+def test_import_file_stores_refreshes_tenants_and_shared_topics(empty_dynamodb_table, tmp_path):
+    from bulk_import import import_file_stores
+    from shared_topics import SHARED_TOPIC_PREFIX
+
+    path = str(tmp_path / "file-stores.ndjson.gz")
+    _write_ndjson(path, 6)
+    shared_topic_arn = f"arn:aws:sns:us-east-1:123456789012:{SHARED_TOPIC_PREFIX}tenant-3-PLAYLIST_IMPORT"
+    with gzip.open(path, "at", encoding="utf-8") as ndjson_file:
+        payload = deepcopy(file_store_db_payload)
+        payload.update(id=str(uuid4()), tenant="tenant-3", topicArn=shared_topic_arn)
+        ndjson_file.write(json.dumps(FILE_STORE_SCHEMA.dump(FILE_STORE_DB_SCHEMA.load(payload))) + "\n")
+
+    with patch("bulk_import.TENANT_VERSION_DYNAMODB_TABLE", "TENANT-VERSION-TABLE"), patch(
+        "bulk_import.bump_tenant_version"
+    ) as mock_bump_tenant_version, patch("bulk_import.register_on_shared_topic") as mock_register:
+        import_file_stores([path], concurrency=2)
+
+    assert [call.args[0] for call in mock_bump_tenant_version.call_args_list] == [
+        "tenant-0",
+        "tenant-1",
+        "tenant-2",
+        "tenant-3",
+    ]
+    [registered] = [call.args[0] for call in mock_register.call_args_list]
+    assert registered.id == payload["id"]
+    assert registered.topic_arn == shared_topic_arn
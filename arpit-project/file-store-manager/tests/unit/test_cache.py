@@ -0,0 +1,59 @@
+from cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, timer=clock)
+
+    cache.put("key", "value")
+    assert cache.get("key") == "value"
+
+    clock.now = 5
+    assert cache.get("key") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_ttl_cache_entry_ttl_is_capped_by_cache_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, timer=clock)
+
+    cache.put("short", "value", ttl=1)
+    cache.put("long", "value", ttl=100)
+
+    clock.now = 2
+    assert cache.get("short") is None
+    assert cache.get("long") == "value"
+
+    clock.now = 6
+    assert cache.get("long") is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_disabled_with_zero_ttl():
+    cache = TTLCache(maxsize=2, ttl=0)
+
+    cache.put("a", 1)
+
+    assert cache.get("a") is None
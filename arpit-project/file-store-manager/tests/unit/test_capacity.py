@@ -0,0 +1,35 @@
+from capacity import CapacityLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_capacity_limiter_waits_once_the_budget_is_spent():
+    clock = FakeClock()
+    limiter = CapacityLimiter(10, timer=clock, sleep=clock.sleep)
+
+    assert limiter.consume(10) == 0
+    assert limiter.consume(5) == 0.5
+    clock.now += 1
+    assert limiter.consume(15) == 0.5
+    assert clock.slept == [0.5, 0.5]
+    assert limiter.consumed == 30
+
+
+def test_capacity_limiter_without_budget_never_waits():
+    clock = FakeClock()
+    limiter = CapacityLimiter(0, timer=clock, sleep=clock.sleep)
+
+    assert limiter.consume(1000) == 0
+    assert clock.slept == []
+    assert limiter.consumed == 1000
@@ -1,3 +1,4 @@
+from copy import deepcopy
 from http import HTTPStatus
 
 from file_store_client.schemas.client import RESPONSE_PAYLOAD_SCHEMA, ResponsePayload
@@ -37,3 +38,22 @@ def test_client_lambda_get_file_store_by_class(
     assert isinstance(decoded_file_stores, list)
     assert len(decoded_file_stores) == 1
     assert isinstance(decoded_file_stores[0], FileStore)
+
+
+def test_client_lambda_get_file_stores_by_bucket_key(empty_dynamodb_table, lambda_context):
+    from client_handler import client_lambda
+    from db import put_file_store
+    from unit.conftest import file_store_db
+
+    put_file_store(deepcopy(file_store_db))
+    event = {
+        "method_name": "get_file_stores_by_bucket_key",
+        "parameters": {"bucket": file_store_db.bucket, "key": "playlists/playlist.pxf"},
+    }
+
+    response = client_lambda(event, lambda_context)
+
+    decoded_response_payload: ResponsePayload = RESPONSE_PAYLOAD_SCHEMA.loads(response)
+    assert decoded_response_payload.status_code == HTTPStatus.OK
+    decoded_file_stores = FILE_STORE_SCHEMA.loads(decoded_response_payload.body, many=True)
+    assert [file_store.id for file_store in decoded_file_stores] == [file_store_db.id]
@@ -0,0 +1,74 @@
+"""
+Cold start import profile of the Lambda handlers, measured in a fresh interpreter with ``python -X importtime``
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict
+
+import pytest
+
+SOURCE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "file_store_manager"))
+
+RUNS = 5
+
+# Import times are measured against the import of boto3 in the same run, so a slower machine raises both.
+# Raise a budget only when a new import is needed on the code path of the handler.
+REFERENCE_MODULE = "boto3"
+IMPORT_TIME_BUDGET = {
+    "apigateway_handler": 2.0,
+    "client_handler": 3.0,
+}
+
+# Modules a handler must not import at cold start because none of its code paths needs them up front
+NOT_IMPORTED = {
+    "apigateway_handler": ["service", "db", "utility", "file_store_client", "user_management_client"],
+    "service": ["user_management_client", "schema.events", "evertz_io_events"],
+}
+
+
+def import_profile(module: str) -> Dict[str, int]:
+    """
+    :param module: A module of the service
+    :return: The cumulative import time in microseconds of every module imported with it
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SOURCE_DIR,
+        env=dict(os.environ, PYTHONPATH=SOURCE_DIR),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            profile[name.strip()] = int(cumulative)
+    return profile
+
+
+@pytest.mark.parametrize("module", sorted(NOT_IMPORTED))
+def test_handler_defers_unneeded_imports(module):
+    profile = import_profile(module)
+
+    assert module in profile
+    imported = {name.split(".")[0] for name in profile} | set(profile)
+    assert sorted(set(NOT_IMPORTED[module]) & imported) == []
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("module", sorted(IMPORT_TIME_BUDGET))
+def test_handler_import_time_within_budget(module):
+    ratios = []
+    for _ in range(RUNS):
+        reference_us = import_profile(REFERENCE_MODULE)[REFERENCE_MODULE]
+        ratios.append(import_profile(module)[module] / reference_us)
+    ratio = statistics.median(ratios)
+    print(f"Importing [{module}] took [{ratio:.2f}]x [{REFERENCE_MODULE}], budget [{IMPORT_TIME_BUDGET[module]}]x")
+
+    assert ratio < IMPORT_TIME_BUDGET[module]
@@ -0,0 +1,113 @@
+import io
+import json
+from unittest.mock import MagicMock, patch
+
+import boto3
+import capacity_report
+import consumed_capacity
+import pytest
+from moto import mock_dynamodb
+
+
+@pytest.fixture(autouse=True)
+def reset_consumed_capacity():
+    consumed_capacity.reset()
+    yield
+    consumed_capacity.reset()
+
+
+@pytest.fixture()
+def table():
+    with mock_dynamodb():
+        yield boto3.resource("dynamodb", region_name="us-east-1").create_table(
+            TableName="consumed-capacity",
+            KeySchema=[
+                {"AttributeName": "tenant-id", "KeyType": "HASH"},
+                {"AttributeName": "store-id", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "tenant-id", "AttributeType": "S"},
+                {"AttributeName": "store-id", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+
+
+def test_every_call_requests_consumed_capacity(table):
+    consumed_capacity.track(table)
+    requested = []
+    table.meta.client.meta.events.register(
+        "before-call.dynamodb.*", lambda params, model, **_: requested.append((model.name, params))
+    )
+
+    table.put_item(Item={"tenant-id": "tenant-a", "store-id": "a"})
+    table.scan(ReturnConsumedCapacity="TOTAL")
+
+    assert json.loads(requested[0][1]["body"])["ReturnConsumedCapacity"] == "INDEXES"
+    assert json.loads(requested[1][1]["body"])["ReturnConsumedCapacity"] == "TOTAL"
+
+
+def test_calls_are_attributed_to_the_tenant_of_their_key(table):
+    consumed_capacity.track(table)
+
+    with patch("consumed_capacity.record_consumed_capacity") as mock_record:
+        table.get_item(Key={"tenant-id": "tenant-a", "store-id": "a"})
+
+    assert mock_record.call_args.args[:2] == ("tenant-a", "GetItem")
+
+
+def test_restricted_tables_attribute_every_call_to_their_tenant():
+    params = {"KeyConditionExpression": "..."}
+    context = {}
+    model = MagicMock()
+    model.name = "Query"
+
+    consumed_capacity._request_consumed_capacity("tenant-b", params=params, model=model, context=context)
+
+    assert params["ReturnConsumedCapacity"] == "INDEXES"
+    assert context[consumed_capacity._TENANT] == "tenant-b"
+
+
+def test_consumed_capacity_is_added_up_per_tenant_operation_and_index():
+    consumed_capacity.record_consumed_capacity(
+        "tenant-a",
+        "Query",
+        {
+            "TableName": "table",
+            "CapacityUnits": 3.0,
+            "Table": {"CapacityUnits": 0.0},
+            "GlobalSecondaryIndexes": {"BUCKET-INDEX": {"CapacityUnits": 3.0}},
+        },
+    )
+    consumed_capacity.record_consumed_capacity("tenant-a", "Query", {"TableName": "table", "CapacityUnits": 1.5})
+    consumed_capacity.record_consumed_capacity(
+        "tenant-b", "BatchWriteItem", [{"TableName": "table", "CapacityUnits": 25.0}]
+    )
+
+    totals = consumed_capacity.invocation_totals()
+    assert totals[("tenant-a", "Query", "BUCKET-INDEX")] == {"read": 3.0, "write": 0.0, "calls": 1}
+    assert totals[("tenant-a", "Query", "table")] == {"read": 1.5, "write": 0.0, "calls": 2}
+    assert totals[("tenant-b", "BatchWriteItem", "table")] == {"read": 0.0, "write": 25.0, "calls": 1}
+
+
+def test_publish_writes_one_record_per_access_pattern_and_report_ranks_them(capsys):
+    @consumed_capacity.publish_consumed_capacity
+    def handler(event, context):
+        consumed_capacity.record_consumed_capacity("tenant-a", "Query", {"CapacityUnits": 1.0})
+        consumed_capacity.record_consumed_capacity("tenant-b", "Scan", {"CapacityUnits": 40.0})
+        consumed_capacity.record_consumed_capacity("tenant-b", "PutItem", {"CapacityUnits": 2.0})
+
+    handler({}, None)
+    lines = capsys.readouterr().out.strip().splitlines()
+    assert len(lines) == 3
+    assert json.loads(lines[0])["tenant"] == "tenant-a"
+
+    out = io.StringIO()
+    with patch("sys.stdin", io.StringIO("\n".join(f"2024-01-01T00:00:00 stream {line}" for line in lines))):
+        capacity_report.main(["--json"], out=out)
+    report = json.loads(out.getvalue())
+
+    assert [row["Tenant"] for row in report["tenants"]] == ["tenant-b", "tenant-a"]
+    assert report["tenants"][0]["read"] == 40.0
+    assert report["tenants"][0]["write"] == 2.0
+    assert report["patterns"][0] == {"Operation": "Scan", "Index": "table", "read": 40.0, "write": 0.0, "calls": 1}
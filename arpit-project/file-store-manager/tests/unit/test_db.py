@@ -2,9 +2,10 @@ from copy import deepcopy
 from uuid import uuid4
 
 import pytest
-from errors import FileStoreConflict, FileStoreNotFound
+from errors import FileStoreConflict, FileStoreNotFound, MetadataKeyNotIndexed
 from file_store_client.schemas.file_class import FileClass
 from file_store_client.schemas.file_store import FILE_STORE_DB_SCHEMA, FILE_STORE_SCHEMA
+from file_store_client.schemas.file_store_state import FileStoreState
 from unit.conftest import file_store, file_store_data, file_store_db, file_store_db_payload
 
 
@@ -138,3 +139,66 @@ def test_delete_file_store_by_id(empty_dynamodb_table):
 
     fs = get_file_stores_by_tenant(file_stores[0].tenant)
     assert len(fs) == 2
+
+
+def test_get_file_stores_by_state(empty_dynamodb_table):
+    from db import get_file_stores_by_state, patch_file_store, put_file_store
+
+    file_stores_data = [deepcopy(file_store_db_payload) for _ in range(5)]
+    for fsd in file_stores_data:
+        fsd["id"] = str(uuid4())
+        fsd["tenant"] = str(uuid4())
+
+    file_stores = [FILE_STORE_DB_SCHEMA.load(data) for data in file_stores_data]
+    for index, fs in enumerate(file_stores):
+        fs.state = FileStoreState.DEPLOYMENT_PENDING if index < 3 else FileStoreState.ACTIVE
+        put_file_store(fs)
+
+    # Pending FileStores of every tenant, one page at a time
+    pending, next_key = get_file_stores_by_state(FileStoreState.DEPLOYMENT_PENDING, limit=2)
+    assert len(pending) == 2
+    assert next_key is not None
+    more_pending, next_key = get_file_stores_by_state(FileStoreState.DEPLOYMENT_PENDING, exclusive_start_key=next_key)
+    assert len(more_pending) == 1
+    assert next_key is None
+    assert {fs.id for fs in pending + more_pending} == {fs.id for fs in file_stores[:3]}
+
+    # Leaving a non terminal state removes the FileStore from the index
+    file_stores[0].state = FileStoreState.ACTIVE
+    patch_file_store(file_stores[0])
+    pending, _ = get_file_stores_by_state(FileStoreState.DEPLOYMENT_PENDING)
+    assert {fs.id for fs in pending} == {fs.id for fs in file_stores[1:3]}
+
+    with pytest.raises(ValueError):
+        get_file_stores_by_state(FileStoreState.ACTIVE)
+
+
+def test_get_file_stores_by_metadata(empty_dynamodb_table):
+    from db import get_file_stores_by_metadata, patch_file_store, put_file_store
+
+    file_stores_data = [deepcopy(file_store_db_payload) for _ in range(3)]
+    for index, fsd in enumerate(file_stores_data):
+        fsd["id"] = str(uuid4())
+        fsd["storeType"]["fileClass"] = FileClass.DATA_TRANSLATION.name
+        fsd["metadata"] = {"translation": {"id": f"translation-{index}", "destination": "destination-a"}}
+
+    file_stores = [FILE_STORE_DB_SCHEMA.load(data) for data in file_stores_data]
+    for fs in file_stores:
+        put_file_store(fs)
+
+    tenant = file_stores[0].tenant
+    assert [fs.id for fs in get_file_stores_by_metadata(tenant, "translation.id", "translation-1")] == [
+        file_stores[1].id
+    ]
+    assert len(get_file_stores_by_metadata(tenant, "translation.id", "translation-", prefix=True)) == 3
+    assert len(get_file_stores_by_metadata(tenant, "translation.destination", "destination-a")) == 3
+    assert get_file_stores_by_metadata("another-tenant", "translation.destination", "destination-a") == []
+
+    # Patching the metadata moves the FileStore in the index
+    file_stores[0].metadata = {"translation": {"id": "translation-1"}}
+    patch_file_store(file_stores[0])
+    assert len(get_file_stores_by_metadata(tenant, "translation.id", "translation-1")) == 2
+    assert len(get_file_stores_by_metadata(tenant, "translation.destination", "destination-a")) == 2
+
+    with pytest.raises(MetadataKeyNotIndexed):
+        get_file_stores_by_metadata(tenant, "translation.source", "source")
@@ -0,0 +1,242 @@
+import base64
+import gzip
+import json
+import statistics
+import time
+import timeit
+from unittest.mock import MagicMock, patch
+
+import pytest
+from unit.conftest import TENANT_ID, TENANT_TOKEN
+
+
+def token_expiring_at(exp: float, token: str = TENANT_TOKEN) -> str:
+    """The claims of ``token`` with another ``exp``, the signature is not checked by the decorator"""
+    header, payload, signature = token.split(".")
+    claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    claims["exp"] = int(exp)
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip("=")
+    return ".".join([header, payload, signature])
+
+
+def event_with(token: str) -> dict:
+    return {"httpMethod": "GET", "path": "/file-stores", "headers": {"Authorization": token}}
+
+
+def test_identity_is_decoded_once_per_token():
+    import decorators
+
+    event = event_with(token_expiring_at(time.time() + 3600))
+    with patch("decorators.get_identity_from_event", wraps=decorators.get_identity_from_event) as mock_decode:
+        first = decorators.get_identity_cached(event)
+        second = decorators.get_identity_cached(event)
+
+    assert mock_decode.call_count == 1
+    assert first is second
+    assert first.tenant_id == TENANT_ID
+
+
+def test_expired_token_is_not_cached():
+    import decorators
+
+    event = event_with(TENANT_TOKEN)
+    with patch("decorators.get_identity_from_event", wraps=decorators.get_identity_from_event) as mock_decode:
+        decorators.get_identity_cached(event)
+        decorators.get_identity_cached(event)
+
+    assert mock_decode.call_count == 2
+    assert decorators.IDENTITY_CACHE.stats()["size"] == 0
+
+
+def test_identity_is_cached_until_the_token_expires():
+    import decorators
+    from cache import TTLCache
+
+    now = [0.0]
+    identity_cache = TTLCache(maxsize=8, ttl=300, timer=lambda: now[0])
+    event = event_with(token_expiring_at(time.time() + 60))
+    with patch("decorators.IDENTITY_CACHE", identity_cache), patch(
+        "decorators.get_identity_from_event", wraps=decorators.get_identity_from_event
+    ) as mock_decode:
+        decorators.get_identity_cached(event)
+        now[0] = 50.0
+        decorators.get_identity_cached(event)
+        now[0] = 70.0
+        decorators.get_identity_cached(event)
+
+    assert mock_decode.call_count == 2
+
+
+@pytest.mark.slow
+def test_decorator_overhead():
+    """Micro-benchmark of what apigateway_error_responder adds to a request, with and without the cache"""
+    import decorators
+
+    responder = decorators.apigateway_error_responder(lambda event, context, span, identity: {"statusCode": 200})
+    event = event_with(token_expiring_at(time.time() + 3600))
+
+    def per_call(number=2000):
+        return statistics.median(timeit.repeat(lambda: responder(event, None), number=number, repeat=5)) / number
+
+    cached = per_call()
+    with patch("decorators.IDENTITY_CACHE.get", return_value=None):
+        uncached = per_call()
+
+    print(f"apigateway_error_responder: [{cached * 1e6:.1f}]us cached, [{uncached * 1e6:.1f}]us uncached")
+    assert cached < uncached
+
+
+def raising(err):
+    def handler(event, context, span, identity):
+        raise err
+
+    return handler
+
+
+def test_error_responses_keep_their_shape():
+    import decorators
+    from errors import FileStoreNotFound
+
+    event = dict(event_with(token_expiring_at(time.time() + 3600)), requestContext={"requestId": "request"})
+    not_found = decorators.apigateway_error_responder(raising(FileStoreNotFound("id")))(event, None)
+    unexpected = decorators.apigateway_error_responder(raising(RuntimeError("boom")))(event, None)
+
+    assert not_found["statusCode"] == 404
+    assert not_found["headers"] == {"Content-Type": "application/vnd.api+json"}
+    assert json.loads(not_found["body"])["errors"][0] == {
+        "id": "request",
+        "code": FileStoreNotFound.code,
+        "title": FileStoreNotFound.title,
+        "detail": str(FileStoreNotFound("id")),
+        "status": "404",
+    }
+    assert unexpected["statusCode"] == 400
+    assert json.loads(unexpected["body"])["errors"][0]["status"] == "500"
+
+
+@pytest.mark.parametrize(
+    "mapper_name",
+    ["APIGATEWAY_ERRORS", "REQUEST_HANDLER_ERRORS"],
+)
+def test_only_expected_client_errors_sample_their_traceback(mapper_name):
+    import decorators
+    from errors import FileStoreNotFound
+
+    error_mapper = getattr(decorators, mapper_name)
+    span = MagicMock()
+    for err, traceback_expected in [
+        (FileStoreNotFound("id"), False),
+        (json.JSONDecodeError("Expecting value", "", 0), False),
+        (KeyError("data"), True),
+        (TypeError("unhashable"), True),
+        (ValueError("invalid"), True),
+    ]:
+        with patch.object(error_mapper, "traceback_sample_rate", 0.0), patch("logging.exception") as mock_exception:
+            error_mapper.handle(err, span)
+
+        assert mock_exception.called is traceback_expected, err
+
+
+@pytest.mark.slow
+def test_error_path_latency():
+    """Micro-benchmark of a 404 answered with a traceback, as every error used to be, and without one"""
+    import decorators
+    from errors import FileStoreNotFound
+
+    responder = decorators.apigateway_error_responder(raising(FileStoreNotFound("id")))
+    event = event_with(token_expiring_at(time.time() + 3600))
+
+    def per_call(traceback_sample_rate, number=500):
+        with patch.object(decorators.APIGATEWAY_ERRORS, "traceback_sample_rate", traceback_sample_rate):
+            timings = timeit.repeat(lambda: responder(event, None), number=number, repeat=5)
+        return statistics.median(timings) / number
+
+    with_traceback = per_call(1.0)
+    without_traceback = per_call(0.0)
+
+    print(f"404 error path: [{with_traceback * 1e6:.1f}]us with traceback, [{without_traceback * 1e6:.1f}]us without")
+    assert without_traceback < with_traceback
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip, deflate, br", "br"),
+        ("gzip;q=1.0, br;q=0.5", "gzip"),
+        ("br;q=0, gzip", "gzip"),
+        ("*", "br"),
+        ("identity", None),
+        ("gzip;q=0", None),
+        (None, None),
+    ],
+)
+def test_negotiate_encoding(accept_encoding, expected):
+    import decorators
+
+    with patch("decorators._brotli", return_value=MagicMock()):
+        assert decorators.negotiate_encoding(accept_encoding, encodings=("br", "gzip")) == expected
+
+
+def test_br_is_skipped_without_brotli():
+    import decorators
+
+    with patch("decorators._brotli", return_value=None):
+        assert decorators.negotiate_encoding("br, gzip", encodings=("br", "gzip")) == "gzip"
+
+
+def compressed(body: str, accept_encoding: str, headers=None, accept="application/vnd.api+json") -> dict:
+    import decorators
+
+    def handler(event, context):
+        return {"statusCode": 200, "headers": dict(headers or {"Content-Type": "application/json"}), "body": body}
+
+    event = {"headers": {"accept-encoding": accept_encoding, "accept": accept}}
+    with patch("decorators.RESPONSE_COMPRESSION_ENCODINGS", ("gzip",)):
+        return decorators.compress_response(handler)(event, None)
+
+
+def test_large_body_is_compressed():
+    body = json.dumps({"data": [{"id": str(index), "type": "fileStore"} for index in range(200)]})
+
+    response = compressed(body, "gzip")
+
+    assert response["isBase64Encoded"] is True
+    assert response["headers"]["Content-Encoding"] == "gzip"
+    assert response["headers"]["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(base64.b64decode(response["body"])).decode("utf-8") == body
+
+
+def test_small_or_unaccepted_bodies_are_left_as_is():
+    large = "x" * 4096
+
+    assert compressed("{}", "gzip") == {
+        "statusCode": 200,
+        "headers": {"Content-Type": "application/json"},
+        "body": "{}",
+    }
+    assert compressed(large, "identity")["body"] == large
+    assert compressed(large, "identity")["headers"]["Vary"] == "Accept-Encoding"
+    assert compressed(large, "gzip", headers={"Vary": "Origin"})["headers"]["Vary"] == "Origin, Accept-Encoding"
+    assert compressed(large, "gzip", headers={"content-encoding": "gzip"})["body"] == large
+
+
+@pytest.mark.parametrize("accept", ["*/*", "text/html, application/json", None])
+def test_body_is_not_compressed_unless_api_gateway_decodes_it(accept):
+    body = json.dumps({"data": [{"id": str(index), "type": "fileStore"} for index in range(200)]})
+
+    response = compressed(body, "gzip", accept=accept)
+
+    assert response["body"] == body
+    assert "isBase64Encoded" not in response
+
+
+def test_base64_request_body_is_decoded():
+    import decorators
+
+    body = json.dumps({"data": {"type": "fileStore"}})
+    handler = MagicMock(return_value="response")
+    event = {"body": base64.b64encode(body.encode()).decode(), "isBase64Encoded": True}
+
+    assert decorators.decode_request_body(handler)(event, None) == "response"
+    assert handler.call_args[0][0]["body"] == body
+    assert handler.call_args[0][0]["isBase64Encoded"] is False
@@ -0,0 +1,138 @@
+import threading
+import time
+from unittest.mock import patch
+
+import deferred_export
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+
+class SlowExporter(InMemorySpanExporter):
+    def __init__(self, delay_seconds=0.2):
+        super().__init__()
+        self.delay_seconds = delay_seconds
+        self.exported = threading.Event()
+
+    def export(self, spans):
+        time.sleep(self.delay_seconds)
+        result = super().export(spans)
+        self.exported.set()
+        return result
+
+
+@pytest.fixture(autouse=True)
+def forget_processors():
+    yield
+    for processor in deferred_export._processors:
+        processor.shutdown(0)
+    deferred_export._processors.clear()
+
+
+def end_spans(tracer_provider, count):
+    tracer = tracer_provider.get_tracer(__name__)
+    for index in range(count):
+        with tracer.start_as_current_span(f"span-{index}"):
+            pass
+
+
+def deferred_provider(exporter, **kwargs):
+    processor = deferred_export.DeferredSpanProcessor(exporter, **kwargs)
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(processor)
+    return tracer_provider, processor
+
+
+def test_force_flush_does_not_wait_for_the_export():
+    exporter = SlowExporter()
+    tracer_provider, processor = deferred_provider(exporter)
+    end_spans(tracer_provider, 3)
+
+    start = time.perf_counter()
+    assert tracer_provider.force_flush()
+    assert time.perf_counter() - start < exporter.delay_seconds
+
+    assert exporter.exported.wait(5)
+    assert len(exporter.get_finished_spans()) == 3
+    assert processor.buffered_spans() == 0
+
+
+def test_spans_are_dropped_when_the_buffer_is_full():
+    exporter = SlowExporter(delay_seconds=0)
+    tracer_provider, processor = deferred_provider(exporter, max_spans=2)
+    processor.flush_in_background = lambda: None
+
+    end_spans(tracer_provider, 3)
+
+    assert processor.buffered_spans() == 2
+    assert processor.dropped_spans == 1
+    tracer_provider.shutdown()
+
+
+def test_buffered_spans_are_exported_after_the_max_delay():
+    exporter = SlowExporter(delay_seconds=0)
+    tracer_provider, processor = deferred_provider(exporter, max_delay_seconds=0.05)
+    processor.flush_in_background()  # Starts the thread, the span is ended after it has looked at the buffer
+    time.sleep(0.01)
+
+    end_spans(tracer_provider, 1)
+
+    assert exporter.exported.wait(5)
+    assert len(exporter.get_finished_spans()) == 1
+
+
+def test_shutdown_drains_the_buffer():
+    exporter = SlowExporter(delay_seconds=0)
+    tracer_provider, processor = deferred_provider(exporter)
+    end_spans(tracer_provider, 2)
+
+    processor.shutdown(1)
+    end_spans(tracer_provider, 1)
+
+    assert len(exporter.get_finished_spans()) == 2
+    assert processor.buffered_spans() == 0
+
+
+def test_install_defers_the_exporters_of_the_provider_once():
+    exporter = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+    processors = deferred_export.install(tracer_provider)
+    assert deferred_export.install(tracer_provider) == processors
+
+    assert len(processors) == 1
+    assert processors[0].span_exporter is exporter
+    end_spans(tracer_provider, 1)
+    assert not exporter.get_finished_spans()
+    assert processors[0].buffered_spans() == 1
+
+
+@pytest.mark.slow
+def test_handler_returns_before_its_spans_are_exported():
+    exporter = SlowExporter(delay_seconds=0.5)
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+    def flush_before_returning(func):
+        def wrapper(event, context):
+            try:
+                return func(event, context)
+            finally:
+                tracer_provider.force_flush()
+
+        return wrapper
+
+    with patch("deferred_export.DEFERRED_TRACE_EXPORT", True), patch(
+        "deferred_export.export_trace", flush_before_returning
+    ), patch("deferred_export.trace.get_tracer_provider", return_value=tracer_provider):
+        handler = deferred_export.deferred_export_trace(lambda event, context: end_spans(tracer_provider, 5))
+
+        start = time.perf_counter()
+        handler({}, None)
+        elapsed = time.perf_counter() - start
+
+    assert elapsed < exporter.delay_seconds
+    deferred_export.drain(5)
+    assert len(exporter.get_finished_spans()) == 5
@@ -0,0 +1,73 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from error_mapping import ErrorMapper, ErrorMapping
+
+
+class NotFound(Exception):
+    pass
+
+
+def mapper(sample: float = 0.5, traceback_sample_rate: float = 0.0) -> ErrorMapper:
+    return ErrorMapper(
+        [
+            ErrorMapping(lambda: (KeyError, NotFound), status_code=404, code="NotFound", title="Not Found"),
+            ErrorMapping(LookupError, status_code=lambda err: 503, code=lambda err: type(err).__name__),
+            ErrorMapping(Exception, status_code=400, code="UnexpectedError", status="500", unexpected=True),
+        ],
+        traceback_sample_rate=traceback_sample_rate,
+        sample=lambda: sample,
+    )
+
+
+def test_first_matching_mapping_wins():
+    error_mapper = mapper()
+
+    assert error_mapper.mapping_for(KeyError("k")) is error_mapper.mappings[0]
+    assert error_mapper.mapping_for(IndexError("i")) is error_mapper.mappings[1]
+    assert error_mapper.mapping_for(RuntimeError("r")) is error_mapper.mappings[2]
+
+
+def test_unmapped_error_is_raised():
+    with pytest.raises(BaseException):
+        ErrorMapper([ErrorMapping(ValueError, status_code=400)], traceback_sample_rate=0).mapping_for(KeyError("k"))
+
+
+def test_error_object_fills_the_template():
+    error_mapper = mapper()
+
+    assert error_mapper.mapping_for(NotFound("missing")).error_object(NotFound("missing"), "request") == {
+        "id": "request",
+        "code": "NotFound",
+        "title": "Not Found",
+        "detail": "missing",
+        "status": "404",
+    }
+    assert error_mapper.mapping_for(IndexError("i")).error_object(IndexError("i"), None) == {
+        "id": None,
+        "code": "IndexError",
+        "detail": "i",
+        "status": "503",
+    }
+    assert error_mapper.mapping_for(RuntimeError("r")).error_object(RuntimeError("r"), None)["status"] == "500"
+
+
+@pytest.mark.parametrize(
+    "error, sample, traceback_expected",
+    [
+        (NotFound("missing"), 0.5, False),
+        (NotFound("missing"), 0.05, True),
+        (IndexError("server"), 0.5, True),
+        (RuntimeError("unexpected"), 0.5, True),
+    ],
+)
+def test_traceback_only_for_server_errors_and_sampled_client_errors(error, sample, traceback_expected):
+    span = MagicMock()
+    with patch("logging.exception") as mock_exception, patch("logging.warning") as mock_warning:
+        mapper(sample=sample, traceback_sample_rate=0.1).handle(error, span)
+
+    assert mock_exception.called is traceback_expected
+    assert span.record_exception.called is traceback_expected
+    assert mock_warning.called is not traceback_expected
+    assert span.add_event.called is not traceback_expected
+    span.set_status.assert_called_once()
@@ -0,0 +1,95 @@
+import gzip
+import json
+import os
+from copy import deepcopy
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from file_store_client.schemas.file_store import FILE_STORE_DB_SCHEMA, FILE_STORE_SCHEMA
+from unit.conftest import file_store_db_payload
+
+
+def _put_file_stores(table, count):
+    ids = set()
+    for index in range(count):
+        payload = deepcopy(file_store_db_payload)
+        payload["id"] = str(uuid4())
+        payload["tenant"] = f"tenant-{index % 3}"
+        table.put_item(
+            Item={
+                "tenant-id": payload["tenant"],
+                "store-id": payload["id"],
+                "class": "PLAYLIST_IMPORT",
+                "data": FILE_STORE_SCHEMA.dump(FILE_STORE_DB_SCHEMA.load(payload)),
+            }
+        )
+        ids.add(payload["id"])
+    return ids
+
+
+def _exported_ids(output_dir):
+    ids = []
+    for file_name in sorted(os.listdir(output_dir)):
+        if file_name.endswith(".ndjson.gz"):
+            with gzip.open(os.path.join(output_dir, file_name), "rt", encoding="utf-8") as data_file:
+                ids.extend(FILE_STORE_SCHEMA.load(json.loads(line)).id for line in data_file)
+    return ids
+
+
+def test_export_file_stores(empty_dynamodb_table, tmp_path):
+    from export import EXPORTED, SKIPPED, export_file_stores
+
+    ids = _put_file_stores(empty_dynamodb_table, 25)
+    empty_dynamodb_table.put_item(Item={"tenant-id": "tenant-0", "store-id": "invalid", "data": {"name": 1}})
+
+    counts = export_file_stores(str(tmp_path), total_segments=1, page_size=4)
+
+    assert counts[EXPORTED] == 25
+    assert counts[SKIPPED] == 1
+    exported_ids = _exported_ids(tmp_path)
+    assert len(exported_ids) == 25
+    assert set(exported_ids) == ids
+
+
+def test_export_file_stores_resumes_from_checkpoints(empty_dynamodb_table, tmp_path):
+    from db import scan_file_stores_segment
+    from export import EXPORTED, export_file_stores
+
+    ids = _put_file_stores(empty_dynamodb_table, 25)
+
+    pages = []
+
+    def interrupted_scan(*args, **kwargs):
+        pages.append(kwargs)
+        if len(pages) == 3:
+            raise RuntimeError("Interrupted")
+        return scan_file_stores_segment(*args, **kwargs)
+
+    with patch("export.scan_file_stores_segment", side_effect=interrupted_scan), pytest.raises(RuntimeError):
+        export_file_stores(str(tmp_path), total_segments=1, page_size=4)
+
+    counts = export_file_stores(str(tmp_path), total_segments=1, page_size=4)
+
+    assert counts[EXPORTED] == 17
+    exported_ids = _exported_ids(tmp_path)
+    assert len(exported_ids) == 25
+    assert set(exported_ids) == ids
+
+    # A finished export is not read again
+    assert export_file_stores(str(tmp_path), total_segments=1, page_size=4)[EXPORTED] == 0
+
+
+def test_export_file_stores_scans_every_segment(empty_dynamodb_table, tmp_path):
+    from db import scan_file_stores_segment
+    from export import export_file_stores, segment_file_name
+
+    ids = _put_file_stores(empty_dynamodb_table, 10)
+
+    with patch("export.scan_file_stores_segment", side_effect=scan_file_stores_segment) as scan:
+        export_file_stores(str(tmp_path), total_segments=3)
+
+    assert sorted(call.args[:2] for call in scan.call_args_list) == [(0, 3), (1, 3), (2, 3)]
+    assert all(os.path.exists(tmp_path / segment_file_name(segment, 3)) for segment in range(3))
+    # moto does not split a Scan into segments, every segment returns the whole table
+    assert set(_exported_ids(tmp_path)) == ids
@@ -0,0 +1,95 @@
+import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from http_caching import conditional_response, etag, file_store_etag, http_caching, http_date, is_not_modified
+
+LAST_MODIFIED = datetime.datetime(2021, 4, 26, 15, 31, 16, 294258)
+
+
+def get_event(**headers) -> dict:
+    return {"httpMethod": "GET", "resource": "/file-stores/{id}", "headers": headers}
+
+
+def ok_response() -> dict:
+    return {"statusCode": 200, "headers": {"Content-Type": "application/vnd.api+json"}, "body": '{"data": []}'}
+
+
+def test_file_store_etag_changes_with_modification_time_and_state():
+    file_store = SimpleNamespace(
+        id="store", state="ACTIVE", modification_info=SimpleNamespace(last_modified=LAST_MODIFIED)
+    )
+    original = file_store_etag(file_store)
+
+    assert file_store_etag(file_store) == original
+    file_store.state = "DEPLOYMENT_PENDING"
+    assert file_store_etag(file_store) != original
+    file_store.state = "ACTIVE"
+    file_store.modification_info.last_modified = LAST_MODIFIED + datetime.timedelta(microseconds=1)
+    assert file_store_etag(file_store) != original
+
+
+def test_if_none_match_uses_weak_comparison():
+    entity_tag = etag("store", 1)
+
+    assert is_not_modified(get_event(**{"If-None-Match": entity_tag}), entity_tag)
+    assert is_not_modified(get_event(**{"if-none-match": f'"other", {entity_tag[2:]}'}), entity_tag)
+    assert is_not_modified(get_event(**{"If-None-Match": "*"}), entity_tag)
+    assert not is_not_modified(get_event(**{"If-None-Match": '"other"'}), entity_tag, LAST_MODIFIED)
+    assert not is_not_modified(get_event(), entity_tag, LAST_MODIFIED)
+
+
+def test_if_modified_since_is_compared_to_the_second():
+    entity_tag = etag("store", 1)
+
+    assert is_not_modified(get_event(**{"If-Modified-Since": http_date(LAST_MODIFIED)}), entity_tag, LAST_MODIFIED)
+    assert not is_not_modified(
+        get_event(**{"If-Modified-Since": "Mon, 26 Apr 2021 15:31:15 GMT"}), entity_tag, LAST_MODIFIED
+    )
+    assert not is_not_modified(get_event(**{"If-Modified-Since": "yesterday"}), entity_tag, LAST_MODIFIED)
+
+
+def test_conditional_response_skips_building_the_body():
+    entity_tag = etag("store", 1)
+    build_response = MagicMock(side_effect=ok_response)
+
+    response = conditional_response(
+        get_event(**{"If-None-Match": entity_tag}), entity_tag, LAST_MODIFIED, build_response
+    )
+
+    build_response.assert_not_called()
+    assert response == {
+        "statusCode": 304,
+        "headers": {
+            "ETag": entity_tag,
+            "Cache-Control": "private, no-cache",
+            "Last-Modified": "Mon, 26 Apr 2021 15:31:16 GMT",
+        },
+        "body": "",
+    }
+
+    response = conditional_response(get_event(), entity_tag, LAST_MODIFIED, build_response)
+    assert response["statusCode"] == 200
+    assert response["headers"]["ETag"] == entity_tag
+    assert response["headers"]["Content-Type"] == "application/vnd.api+json"
+
+
+def test_http_caching_adds_validators_and_answers_304():
+    handler = http_caching(lambda event, context: ok_response())
+    response = handler(dict(get_event(), resource="/hello-world"), None)
+
+    assert response["headers"]["Cache-Control"] == "private, max-age=300"
+    assert response["headers"]["ETag"] == etag(ok_response()["body"])
+
+    not_modified = handler(get_event(**{"If-None-Match": response["headers"]["ETag"]}), None)
+    assert not_modified["statusCode"] == 304
+    assert not_modified["body"] == ""
+
+
+def test_http_caching_leaves_other_responses_alone():
+    error = {"statusCode": 404, "headers": {}, "body": "{}"}
+
+    assert http_caching(lambda event, context: error)(get_event(), None) == error
+    assert (
+        http_caching(lambda event, context: ok_response())(dict(get_event(), httpMethod="POST"), None) == ok_response()
+    )
@@ -0,0 +1,102 @@
+import tracemalloc
+from collections import deque
+from unittest.mock import MagicMock, patch
+
+import memory
+import pytest
+import stages
+
+
+@pytest.fixture
+def traced():
+    tracemalloc.start()
+    memory.reset()
+    yield
+    memory.reset()
+    tracemalloc.stop()
+
+
+def allocate(count):
+    return [{"id": str(index), "name": "x" * 100} for index in range(count)]
+
+
+def test_nothing_is_tracked_by_default():
+    assert memory.track_memory(allocate) is allocate
+    with memory.allocation_sites("SchemaLoad"):
+        allocate(10)
+    assert memory.top_allocation_sites() == {}
+
+
+def test_allocation_sites_of_lists_are_recorded(traced):
+    schema = MagicMock()
+    schema.load.side_effect = lambda data, many: allocate(len(data))
+
+    with patch("memory.MEMORY_ALLOCATION_SITES", True):
+        file_stores = stages.load(schema, [{}] * 1000, many=True)
+        stages.load(schema, {})
+
+    [site] = memory.top_allocation_sites()[stages.SCHEMA_LOAD][:1]
+    location, size = site.rsplit(" ", 1)
+    assert location.startswith("test_memory.py:")
+    assert int(size) > 100 * len(file_stores)
+
+
+def test_invocation_memory_is_published(traced):
+    metrics = MagicMock()
+    kept = []
+
+    def handler(event, context):
+        kept.append(allocate(1000))
+        allocate(5000)
+
+    with patch("memory.MEMORY_TRACKING", True), patch("memory.metrics", metrics):
+        memory.track_memory(handler)({}, None)
+
+    values = {call.kwargs["name"]: call.kwargs["value"] for call in metrics.add_metric.call_args_list}
+    assert values["MemoryPeak"] > values["MemoryRetained"] > 100 * 1000
+    assert values["MemoryMaxRss"] > 0
+
+
+def test_snapshots_are_taken_once_and_left_out_of_the_peak(traced):
+    metrics = MagicMock()
+    schema = MagicMock()
+    schema.dump.side_effect = lambda data, many: allocate(len(data))
+    take_snapshot = tracemalloc.take_snapshot
+    snapshots = []
+
+    def costly_snapshot():
+        snapshots.append(bytearray(8 * 1024 * 1024))  # Held while the snapshot is taken, like its traces
+        snapshot = take_snapshot()
+        snapshots[-1] = None
+        return snapshot
+
+    def handler(event, context):
+        for _ in range(3):
+            stages.dump(schema, [{}] * 1000, many=True)
+
+    with patch("memory.MEMORY_TRACKING", True), patch("memory.MEMORY_ALLOCATION_SITES", True), patch(
+        "memory.metrics", metrics
+    ), patch("memory.tracemalloc.take_snapshot", costly_snapshot):
+        memory.track_memory(handler)({}, None)
+
+    values = {call.kwargs["name"]: call.kwargs["value"] for call in metrics.add_metric.call_args_list}
+    assert len(snapshots) == 2
+    assert 100 * 1000 < values["MemoryPeak"] < 8 * 1024 * 1024
+    assert stages.SCHEMA_DUMP in memory.top_allocation_sites()
+
+
+@pytest.mark.parametrize(
+    "retained, growth, leaking",
+    [
+        ([0, 1, 2], None, False),
+        ([0, 2 * 1024 * 1024, 4 * 1024 * 1024, 6 * 1024 * 1024], 6 * 1024 * 1024, True),
+        ([0, 4 * 1024 * 1024, 3 * 1024 * 1024, 6 * 1024 * 1024], 6 * 1024 * 1024, False),
+    ],
+)
+def test_growth_over_the_window_is_detected(retained, growth, leaking):
+    logger = MagicMock()
+    with patch("memory._retained_history", deque(maxlen=4)), patch("memory.logger", logger):
+        results = [memory.record_retained(value) for value in retained]
+
+    assert results[-1] == growth
+    assert logger.warning.called == leaking
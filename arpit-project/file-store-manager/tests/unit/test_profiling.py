@@ -0,0 +1,122 @@
+import marshal
+import os
+import time
+from unittest.mock import patch
+
+import profiling
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def header_budget():
+    profiling._header_profiles.clear()
+    yield
+    profiling._header_profiles.clear()
+
+
+@pytest.fixture
+def profiles():
+    written = []
+    previous_sink = profiling._sink
+    profiling.set_sink(lambda name, extension, content: written.append((name, extension, content)))
+    yield written
+    profiling.set_sink(previous_sink)
+
+
+class Context:
+    aws_request_id = "request-id"
+
+
+def busy(event, context):
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+    return "done"
+
+
+def test_invocations_are_not_profiled_by_default(profiles):
+    assert profiling.profile_invocation(busy)({}, Context()) == "done"
+    assert not profiles
+
+
+@pytest.mark.parametrize("sample, profiled", [(0.05, True), (0.2, False)])
+def test_invocations_are_profiled_at_the_invocation_rate(sample, profiled):
+    with patch("profiling.PROFILING_INVOCATION_RATE", 0.1):
+        assert (profiling.profiler_for({}, sample=lambda: sample) is not None) == profiled
+
+
+@pytest.mark.parametrize(
+    "header, profiler",
+    [("cprofile", profiling.CPROFILE), ("sampling", profiling.SAMPLING), ("yes", profiling.PROFILER)],
+)
+def test_the_header_selects_the_profiler(header, profiler):
+    event = {"headers": {"x-profile": header}}
+    with patch("profiling.PROFILING_HEADER_ENABLED", True):
+        assert profiling.profiler_for(event, sample=lambda: 1.0) == profiler
+    assert profiling.profiler_for(event, sample=lambda: 1.0) is None
+
+
+def test_header_profiles_are_limited_per_minute():
+    event = {"headers": {"X-Profile": "cprofile"}}
+    clock = [1000.0]
+
+    def profiler_at(seconds):
+        clock[0] = seconds
+        return profiling.profiler_for(event, sample=lambda: 1.0)
+
+    with patch("profiling.PROFILING_HEADER_ENABLED", True), patch(
+        "profiling.PROFILING_HEADER_MAX_PER_MINUTE", 2
+    ), patch("profiling.time.monotonic", lambda: clock[0]):
+        assert [profiler_at(seconds) for seconds in (1000, 1010, 1020)] == [
+            profiling.CPROFILE,
+            profiling.CPROFILE,
+            None,
+        ]
+        with patch("profiling.PROFILING_INVOCATION_RATE", 0.5):
+            assert profiling.profiler_for(event, sample=lambda: 0.1) == profiling.PROFILER
+        assert profiler_at(1061) == profiling.CPROFILE
+
+
+def test_sampling_profile_is_written_as_collapsed_stacks(profiles):
+    sampling_profiler = profiling.SamplingProfiler
+    with patch("profiling.PROFILING_INVOCATION_RATE", 1.0), patch("profiling.PROFILER", profiling.SAMPLING), patch(
+        "profiling.SamplingProfiler", lambda: sampling_profiler(interval_seconds=0.001)
+    ):
+        assert profiling.profile_invocation(busy)({}, Context()) == "done"
+
+    [(name, extension, content)] = profiles
+    assert (name, extension) == ("request-id", "collapsed")
+    stacks = dict(line.rsplit(" ", 1) for line in content.decode("utf-8").splitlines())
+    assert any("busy (test_profiling.py:" in stack and int(count) > 0 for stack, count in stacks.items())
+
+
+def test_cprofile_profile_is_written_as_pstats(profiles):
+    with patch("profiling.PROFILING_INVOCATION_RATE", 1.0), patch("profiling.PROFILER", profiling.CPROFILE):
+        profiling.profile_invocation(busy)({}, Context())
+
+    [(name, extension, content)] = profiles
+    assert extension == "pstats"
+    stats = marshal.loads(content)
+    assert any(function == "busy" for _, _, function in stats)
+
+
+def test_file_sink_keeps_the_newest_profiles(tmp_path):
+    sink = profiling.file_sink(str(tmp_path), max_files=2)
+    for index in range(3):
+        sink(f"profile-{index}", "collapsed", b"main 1\n")
+        os.utime(tmp_path / f"profile-{index}.collapsed", (index, index))
+
+    assert sorted(os.listdir(tmp_path)) == ["profile-1.collapsed", "profile-2.collapsed"]
+
+
+def test_failing_sink_does_not_fail_the_invocation():
+    def failing_sink(*_):
+        raise OSError("No space left on device")
+
+    previous_sink = profiling._sink
+    profiling.set_sink(failing_sink)
+    try:
+        with patch("profiling.PROFILING_INVOCATION_RATE", 1.0), patch("profiling.PROFILER", profiling.CPROFILE):
+            assert profiling.profile_invocation(busy)({}, Context()) == "done"
+    finally:
+        profiling.set_sink(previous_sink)
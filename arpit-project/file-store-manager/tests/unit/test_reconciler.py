@@ -0,0 +1,100 @@
+from collections import Counter
+from copy import deepcopy
+from unittest.mock import patch
+from uuid import uuid4
+
+from file_store_client.schemas.file_store import FILE_STORE_DB_SCHEMA
+from file_store_client.schemas.file_store_state import FileStoreState
+from unit.conftest import file_store_db_payload
+
+
+def _pending_file_stores(tenants: int, per_tenant: int):
+    file_stores = []
+    for _ in range(tenants):
+        tenant = str(uuid4())
+        for _ in range(per_tenant):
+            payload = deepcopy(file_store_db_payload)
+            payload["id"] = str(uuid4())
+            payload["tenant"] = tenant
+            file_store = FILE_STORE_DB_SCHEMA.load(payload)
+            file_store.state = FileStoreState.DEPLOYMENT_PENDING
+            file_stores.append(file_store)
+    return file_stores
+
+
+def test_reconcile_pending_file_stores(empty_dynamodb_table):
+    from db import get_file_store_by_id, get_file_stores_by_state, put_file_store
+    from reconciler import reconcile_pending_file_stores
+
+    file_stores = _pending_file_stores(tenants=3, per_tenant=4)
+    for file_store in file_stores:
+        put_file_store(file_store)
+    deployed = {file_store.id for file_store in file_stores[::2]}
+
+    def resolve_state(file_store):
+        return FileStoreState.ACTIVE if file_store.id in deployed else FileStoreState.DEPLOYMENT_PENDING
+
+    with patch("reconciler._resolve_state", side_effect=resolve_state), patch("reconciler.RECONCILER_PAGE_SIZE", 5):
+        outcomes = reconcile_pending_file_stores()
+
+    assert outcomes == Counter({"transitioned": 6, "unchanged": 6})
+    pending, _ = get_file_stores_by_state(FileStoreState.DEPLOYMENT_PENDING)
+    assert {file_store.id for file_store in pending} == {fs.id for fs in file_stores} - deployed
+    for file_store in file_stores[::2]:
+        assert get_file_store_by_id(file_store.tenant, file_store.id).state == FileStoreState.ACTIVE
+
+
+def test_warm_runs_reuse_restricted_tables(empty_dynamodb_table):
+    import reconciler
+    import utility
+    from db import put_file_store
+
+    file_stores = _pending_file_stores(tenants=3, per_tenant=2)
+    for file_store in file_stores:
+        put_file_store(file_store)
+
+    reconciler._executor.cache_clear()
+    with patch("reconciler.RECONCILER_MAX_WORKERS", 1), patch(
+        "reconciler._resolve_state", return_value=FileStoreState.ACTIVE
+    ), patch("utility.restricted_table", wraps=utility.restricted_table) as mock_restricted_table:
+        try:
+            assert reconciler.reconcile_pending_file_stores() == Counter({"transitioned": 6})
+            # The FileStores are pending again by the next run
+            for file_store in file_stores:
+                put_file_store(file_store)
+            assert reconciler.reconcile_pending_file_stores() == Counter({"transitioned": 6})
+        finally:
+            reconciler._executor().shutdown()
+            reconciler._executor.cache_clear()
+
+    # The tenant roles are assumed by the first run only
+    assert mock_restricted_table.call_count == 3
+
+
+def test_transition_file_store_state_refuses_stale_file_store(empty_dynamodb_table):
+    from db import patch_file_store, put_file_store, transition_file_store_state
+
+    file_store = _pending_file_stores(tenants=1, per_tenant=1)[0]
+    put_file_store(file_store)
+    read_file_store = deepcopy(file_store)
+
+    # A user patches the FileStore after the reconciler read it
+    file_store.description = "patched by a user"
+    file_store.modification_info.last_modified = file_store.modification_info.last_modified.replace(year=2022)
+    patch_file_store(file_store)
+
+    assert transition_file_store_state(read_file_store, FileStoreState.ACTIVE) is None
+    assert transition_file_store_state(file_store, FileStoreState.ACTIVE).state == FileStoreState.ACTIVE
+
+
+def test_interleave_tenants_is_fair():
+    from reconciler import _interleave_tenants
+
+    file_stores = _pending_file_stores(tenants=2, per_tenant=3)
+    checked_per_tenant = Counter()
+
+    with patch("reconciler.RECONCILER_MAX_STORES_PER_TENANT", 2):
+        ordered = _interleave_tenants(file_stores, checked_per_tenant)
+
+    assert [file_store.tenant for file_store in ordered] == [file_stores[0].tenant, file_stores[3].tenant] * 2
+    assert sum(checked_per_tenant.values()) == 4
@@ -0,0 +1,115 @@
+from copy import deepcopy
+from unittest.mock import patch
+from uuid import uuid4
+
+from file_store_client.schemas.file_store import FILE_STORE_DB_SCHEMA
+from unit.conftest import file_store_db_payload
+
+
+def _file_store(name: str, description: str = None, tenant: str = None):
+    payload = deepcopy(file_store_db_payload)
+    payload["id"] = str(uuid4())
+    payload["name"] = name
+    payload["description"] = description
+    if tenant:
+        payload["tenant"] = tenant
+    return FILE_STORE_DB_SCHEMA.load(payload)
+
+
+def test_search_index_ranks_matches():
+    from search import NAME_EQUALS, NAME_PREFIX, NAME_SUBSTRING, NAME_WORD_PREFIX, SearchIndex
+
+    file_stores = [
+        _file_store("Playlist"),
+        _file_store("playlist import"),
+        _file_store("daily-playlist"),
+        _file_store("weeklyplaylists"),
+        _file_store("as run logs", "Exported after every playlist"),
+        _file_store("captions"),
+    ]
+    index = SearchIndex(file_stores)
+
+    results = index.search("PLAYLIST", limit=10)
+
+    assert [result.name for result in results] == [
+        "Playlist",
+        "playlist import",
+        "daily-playlist",
+        "weeklyplaylists",
+        "as run logs",
+    ]
+    assert [result.score for result in results][:4] == [NAME_EQUALS, NAME_PREFIX, NAME_WORD_PREFIX, NAME_SUBSTRING]
+    assert results[0].id == file_stores[0].id
+    assert results[0].file_class == "PLAYLIST_IMPORT"
+    assert len(index.search("playlist", limit=2)) == 2
+
+
+def test_search_index_short_and_missing_queries():
+    from search import SearchIndex
+
+    index = SearchIndex([_file_store("pxf import"), _file_store("xml export")])
+
+    assert [result.name for result in index.search("x", limit=10)] == ["xml export", "pxf import"]
+    assert [result.name for result in index.search("ex", limit=10)] == ["xml export"]
+    assert index.search("export pxf", limit=10) == []
+    assert index.search("  ", limit=10) == []
+
+
+def test_search_file_stores_rebuilds_after_writes(empty_dynamodb_table):
+    import db
+    from service import search_file_stores
+
+    tenant = str(uuid4())
+    for index in range(3):
+        db.put_file_store(_file_store(f"playlist import {index}", tenant=tenant))
+
+    with patch("search.get_file_stores_by_tenant", wraps=db.get_file_stores_by_tenant) as listing:
+        assert len(search_file_stores(tenant, "playlist")) == 3
+        assert len(search_file_stores(tenant, "import 1")) == 1
+        assert listing.call_count == 1
+
+        new_file_store = _file_store("playlist export", tenant=tenant)
+        db.put_file_store(new_file_store)
+        # Written behind the back of the service, the cached index is still current
+        assert len(search_file_stores(tenant, "playlist")) == 3
+
+        with patch("service.db.get_file_store_by_id", return_value=new_file_store), patch("service.delete_sns_topic"):
+            from service import delete_file_store_by_id
+
+            delete_file_store_by_id(tenant, new_file_store.id)
+        assert listing.call_count == 1
+        assert len(search_file_stores(tenant, "playlist")) == 3
+        assert listing.call_count == 2
+
+
+def test_search_file_stores_rebuilds_after_writes_of_other_containers(empty_dynamodb_table, monkeypatch):
+    import boto3
+    import db
+    import search
+    from service import search_file_stores
+
+    version_table = "FILE-STORE-MANAGER-TENANT-VERSION-TEST-TABLE"
+    boto3.resource("dynamodb").create_table(
+        TableName=version_table,
+        AttributeDefinitions=[{"AttributeName": "tenant-id", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "tenant-id", "KeyType": "HASH"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    monkeypatch.setattr(search, "TENANT_VERSION_DYNAMODB_TABLE", version_table)
+    monkeypatch.setattr(db, "TENANT_VERSION_DYNAMODB_TABLE", version_table)
+
+    tenant = str(uuid4())
+    db.put_file_store(_file_store("playlist import", tenant=tenant))
+
+    with patch("search.get_file_stores_by_tenant", wraps=db.get_file_stores_by_tenant) as listing:
+        assert len(search_file_stores(tenant, "playlist")) == 1
+        assert len(search_file_stores(tenant, "playlist")) == 1
+        assert listing.call_count == 1
+
+        # Another container saves a FileStore, only the version stored in DynamoDB tells this one
+        db.put_file_store(_file_store("playlist export", tenant=tenant))
+        db.bump_tenant_version(tenant)
+
+        assert len(search_file_stores(tenant, "playlist")) == 2
+        assert listing.call_count == 2
+    assert not search._tenant_versions
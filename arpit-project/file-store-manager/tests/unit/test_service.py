@@ -0,0 +1,150 @@
+import json
+import time
+from unittest import mock
+from unittest.mock import patch
+
+import pytest
+from errors import ForbiddenAccess, IdempotencyKeyMismatch, IdempotentRequestInProgress
+from file_store_client.schemas.file_class import FileClass
+from file_store_client.schemas.file_store import FILE_STORE_JSONAPI
+from unit.conftest import add_file_store_payload
+
+
+@mock.patch("service.get_groups_for_user", return_value=["admin"])
+def test_check_if_admin_caches_user_groups(mock_get_groups, tenant_id_1, user_id):
+    from service import USER_GROUPS_CACHE, check_if_admin
+
+    check_if_admin(tenant_id=tenant_id_1, user_id=user_id)
+    check_if_admin(tenant_id=tenant_id_1, user_id=user_id)
+
+    mock_get_groups.assert_called_once_with(user_id=user_id, tenant_id=tenant_id_1)
+    assert USER_GROUPS_CACHE.stats()["hits"] == 1
+    assert USER_GROUPS_CACHE.stats()["misses"] == 1
+
+
+@mock.patch("service.get_groups_for_user", return_value=["admin"])
+def test_check_if_admin_bypass_cache(mock_get_groups, tenant_id_1, user_id):
+    from service import check_if_admin
+
+    check_if_admin(tenant_id=tenant_id_1, user_id=user_id)
+
+    # A revoked admin is refused straight away by sensitive operations
+    mock_get_groups.return_value = ["user"]
+    with pytest.raises(ForbiddenAccess):
+        check_if_admin(tenant_id=tenant_id_1, user_id=user_id, bypass_cache=True)
+
+    # and the refreshed groups are cached for everyone else
+    with pytest.raises(ForbiddenAccess):
+        check_if_admin(tenant_id=tenant_id_1, user_id=user_id)
+    assert mock_get_groups.call_count == 2
+
+
+@mock.patch("service.get_groups_for_user", return_value=["admin"])
+def test_check_if_admin_cache_is_per_tenant_and_user(mock_get_groups, tenant_id_1, user_id):
+    from service import check_if_admin
+
+    check_if_admin(tenant_id=tenant_id_1, user_id=user_id)
+    check_if_admin(tenant_id=tenant_id_1, user_id="another-user")
+    check_if_admin(tenant_id="another-tenant", user_id=user_id)
+
+    assert mock_get_groups.call_count == 3
+
+
+def test_create_file_store_with_idempotency_key(dynamodb_tables_with_idempotency, tenant_identity):
+    from service import create_file_store
+
+    payload = add_file_store_payload(FileClass.PLAYLIST_IMPORT.value, ["pxf"])
+
+    with patch("evertz_io_events.EventBridge.emit") as mock_emit, patch(
+        "service.create_sns_topic"
+    ) as mock_create_topic:
+        mock_create_topic.return_value = {"TopicArn": "arn:aws:sns:us-east-1:123456789012:TestTopic"}
+        first = create_file_store(tenant_identity, FILE_STORE_JSONAPI.load(json.loads(payload)), "key-1")
+        retried = create_file_store(tenant_identity, FILE_STORE_JSONAPI.load(json.loads(payload)), "key-1")
+
+        mock_emit.assert_called_once()
+        mock_create_topic.assert_called_once()
+
+    assert retried.id == first.id
+    assert retried.topic_arn == first.topic_arn
+
+
+def test_create_file_store_retried_after_the_lease_expired(dynamodb_tables_with_idempotency, tenant_identity):
+    from db import IDEMPOTENCY_COMPLETED, STATUS, get_file_stores_by_file_class, get_idempotency_record
+    from service import create_file_store
+
+    payload = add_file_store_payload(FileClass.PLAYLIST_IMPORT.value, ["pxf"])
+
+    with patch("evertz_io_events.EventBridge.emit"), patch("service.create_sns_topic") as mock_create_topic:
+        mock_create_topic.return_value = {"TopicArn": "arn:aws:sns:us-east-1:123456789012:TestTopic"}
+        # The first request times out once the FileStore is saved, before the key is completed
+        with patch("service.db.complete_idempotency_key", side_effect=TimeoutError("Task timed out")):
+            with pytest.raises(TimeoutError):
+                create_file_store(tenant_identity, FILE_STORE_JSONAPI.load(json.loads(payload)), "key-1")
+        [first] = get_file_stores_by_file_class(tenant_identity.tenant, FileClass.PLAYLIST_IMPORT)
+
+        with patch("db.time.time", return_value=time.time() + 120):
+            retried = create_file_store(tenant_identity, FILE_STORE_JSONAPI.load(json.loads(payload)), "key-1")
+
+    assert retried.id == first.id
+    assert [
+        file_store.id for file_store in get_file_stores_by_file_class(tenant_identity.tenant, FileClass.PLAYLIST_IMPORT)
+    ] == [first.id]
+    mock_create_topic.assert_called_once()
+    assert get_idempotency_record(tenant_identity.tenant, "key-1")[STATUS] == IDEMPOTENCY_COMPLETED
+
+
+def test_create_file_store_idempotency_key_reused_for_another_request(
+    dynamodb_tables_with_idempotency, tenant_identity
+):
+    from service import create_file_store
+
+    payload = add_file_store_payload(FileClass.ASRUN.value, ["pxf"])
+    other_payload = add_file_store_payload(FileClass.PLAYLIST_EXPORT.value, ["pxf"])
+
+    with patch("evertz_io_events.EventBridge.emit"):
+        create_file_store(tenant_identity, FILE_STORE_JSONAPI.load(json.loads(payload)), "key-1")
+        with pytest.raises(IdempotencyKeyMismatch):
+            create_file_store(tenant_identity, FILE_STORE_JSONAPI.load(json.loads(other_payload)), "key-1")
+
+
+def test_create_file_store_idempotency_key_in_progress(dynamodb_tables_with_idempotency, tenant_identity):
+    from db import claim_idempotency_key
+    from service import _request_hash, create_file_store
+
+    payload = add_file_store_payload(FileClass.ASRUN.value, ["pxf"])
+    claim_idempotency_key(tenant_identity.tenant, "key-1", _request_hash(FILE_STORE_JSONAPI.load(json.loads(payload))))
+
+    with pytest.raises(IdempotentRequestInProgress):
+        create_file_store(tenant_identity, FILE_STORE_JSONAPI.load(json.loads(payload)), "key-1")
+
+
+def test_create_file_store_releases_idempotency_key_on_failure(dynamodb_tables_with_idempotency, tenant_identity):
+    from db import get_idempotency_record
+    from service import create_file_store
+
+    payload = add_file_store_payload(FileClass.ASRUN.value, ["pxf"])
+
+    with patch("evertz_io_events.EventBridge.emit", side_effect=RuntimeError("event bus unavailable")):
+        with pytest.raises(RuntimeError):
+            create_file_store(tenant_identity, FILE_STORE_JSONAPI.load(json.loads(payload)), "key-1")
+
+    assert get_idempotency_record(tenant_identity.tenant, "key-1") is None
+
+
+def test_expired_claim_does_not_release_the_key_of_a_retry(dynamodb_tables_with_idempotency, tenant_identity):
+    from db import (
+        IDEMPOTENCY_IN_PROGRESS,
+        STATUS,
+        claim_idempotency_key,
+        get_idempotency_record,
+        release_idempotency_key,
+    )
+
+    stale_token = claim_idempotency_key(tenant_identity.tenant, "key-1", "hash")
+    with patch("db.time.time", return_value=time.time() + 120):
+        claim_idempotency_key(tenant_identity.tenant, "key-1", "hash")
+        # The first request fails once the retry holds the key
+        release_idempotency_key(tenant_identity.tenant, "key-1", stale_token)
+
+        assert get_idempotency_record(tenant_identity.tenant, "key-1")[STATUS] == IDEMPOTENCY_IN_PROGRESS
@@ -0,0 +1,182 @@
+import json
+from copy import deepcopy
+from unittest.mock import patch
+from uuid import uuid4
+
+import boto3
+import pytest
+from file_store_client.schemas.file_class import FileClass
+from moto import mock_sns
+from unit.conftest import TENANT_ID, file_store_db
+
+SHARED_TOPIC_TABLE = "FILE-STORE-MANAGER-SHARED-TOPIC-TEST-TABLE"
+
+shared_topic_table_spec = dict(
+    TableName=SHARED_TOPIC_TABLE,
+    AttributeDefinitions=[{"AttributeName": "topic-arn", "AttributeType": "S"}],
+    KeySchema=[{"AttributeName": "topic-arn", "KeyType": "HASH"}],
+    BillingMode="PAY_PER_REQUEST",
+)
+
+
+@pytest.fixture()
+def shared_topic_tenant(monkeypatch, empty_dynamodb_table):
+    import shared_topics
+
+    monkeypatch.setattr(shared_topics, "SHARED_TOPIC_TENANTS", frozenset([TENANT_ID]))
+    monkeypatch.setattr(shared_topics, "SHARED_TOPIC_DYNAMODB_TABLE", SHARED_TOPIC_TABLE)
+    monkeypatch.setattr(shared_topics, "_shared_topic_arns", {})
+    boto3.resource("dynamodb").create_table(**shared_topic_table_spec)
+    with mock_sns():
+        yield boto3.client("sns")
+
+
+def _policy(sns, topic_arn):
+    return json.loads(sns.get_topic_attributes(TopicArn=topic_arn)["Attributes"]["Policy"])["Statement"]
+
+
+def _incoming_file_store(bucket: str, folder_prefix: str = ""):
+    file_store = deepcopy(file_store_db)
+    file_store.id = str(uuid4())
+    file_store.store_type.file_class = FileClass.PLAYLIST_IMPORT
+    file_store.bucket = bucket
+    file_store.folder_prefix = folder_prefix
+    return file_store
+
+
+def test_create_topic_registers_on_shared_topic(shared_topic_tenant):
+    from service import _create_topic
+
+    first = _incoming_file_store("bucket-a")
+    second = _incoming_file_store("bucket-b", "incoming/")
+
+    _create_topic(first)
+    _create_topic(second)
+
+    assert first.topic_arn == second.topic_arn
+    assert len(shared_topic_tenant.list_topics()["Topics"]) == 1
+
+    assert _policy(shared_topic_tenant, first.topic_arn)["Condition"]["ArnLike"]["aws:SourceArn"] == [
+        "arn:aws:s3:*:*:bucket-a",
+        "arn:aws:s3:*:*:bucket-b",
+    ]
+
+
+def test_bucket_registered_by_another_container_is_kept(shared_topic_tenant):
+    import shared_topics
+    from service import _create_topic
+
+    get_publishing_file_stores = shared_topics._get_publishing_file_stores
+    raced = []
+
+    def read_then_race(topic_arn):
+        result = get_publishing_file_stores(topic_arn)
+        if not raced:
+            # Another container registers its FileStore between the read and the write of this one
+            raced.append(topic_arn)
+            _create_topic(second)
+        return result
+
+    first = _incoming_file_store("bucket-a")
+    second = _incoming_file_store("bucket-b")
+    with patch("shared_topics._get_publishing_file_stores", read_then_race):
+        _create_topic(first)
+
+    assert raced
+    assert get_publishing_file_stores(first.topic_arn) == ({first.id: "bucket-a", second.id: "bucket-b"}, 2)
+    assert _policy(shared_topic_tenant, first.topic_arn)["Condition"]["ArnLike"]["aws:SourceArn"] == [
+        "arn:aws:s3:*:*:bucket-a",
+        "arn:aws:s3:*:*:bucket-b",
+    ]
+
+
+def test_bucket_is_removed_with_its_last_file_store(shared_topic_tenant):
+    from shared_topics import register_on_shared_topic, unregister_from_shared_topic
+
+    file_stores = [_incoming_file_store("bucket-a"), _incoming_file_store("bucket-a", "b/"), _incoming_file_store("b")]
+    for file_store in file_stores:
+        file_store.topic_arn = register_on_shared_topic(file_store)
+    topic_arn = file_stores[0].topic_arn
+
+    unregister_from_shared_topic(file_stores[0])
+    assert _policy(shared_topic_tenant, topic_arn)["Condition"]["ArnLike"]["aws:SourceArn"] == [
+        "arn:aws:s3:*:*:b",
+        "arn:aws:s3:*:*:bucket-a",
+    ]
+
+    unregister_from_shared_topic(file_stores[1])
+    assert _policy(shared_topic_tenant, topic_arn)["Condition"]["ArnLike"]["aws:SourceArn"] == ["arn:aws:s3:*:*:b"]
+
+    unregister_from_shared_topic(file_stores[2])
+    assert _policy(shared_topic_tenant, topic_arn)["Sid"] == "publish-from-owner"
+
+
+def test_file_store_is_registered_once(shared_topic_tenant):
+    from shared_topics import _get_publishing_file_stores, register_on_shared_topic, unregister_from_shared_topic
+
+    first = _incoming_file_store("bucket-a")
+    second = _incoming_file_store("bucket-b")
+    # A retried create registers the first FileStore again
+    for file_store in [first, first, second]:
+        file_store.topic_arn = register_on_shared_topic(file_store)
+
+    assert _get_publishing_file_stores(first.topic_arn) == ({first.id: "bucket-a", second.id: "bucket-b"}, 2)
+
+    unregister_from_shared_topic(second)
+    assert _policy(shared_topic_tenant, first.topic_arn)["Condition"]["ArnLike"]["aws:SourceArn"] == [
+        "arn:aws:s3:*:*:bucket-a"
+    ]
+
+
+def test_patched_bucket_moves_on_shared_topic(shared_topic_tenant):
+    from db import put_file_store
+    from service import _create_topic, update_file_store
+
+    file_store = _incoming_file_store("bucket-a")
+    _create_topic(file_store)
+    put_file_store(file_store)
+    other = _incoming_file_store("bucket-c")
+    _create_topic(other)
+    put_file_store(other)
+
+    with patch("evertz_io_events.EventBridge.emit") as mock_emit:
+        update_file_store(file_store.tenant, _incoming_file_store("bucket-b", "incoming/"), file_store.id, "user")
+
+    assert _policy(shared_topic_tenant, file_store.topic_arn)["Condition"]["ArnLike"]["aws:SourceArn"] == [
+        "arn:aws:s3:*:*:bucket-b",
+        "arn:aws:s3:*:*:bucket-c",
+    ]
+    event = mock_emit.call_args[0][0]
+    assert type(event).__name__ == "FileStoreUpdated"
+    assert json.loads(event.data.filter_policy) == {
+        "Records": {"s3": {"bucket": {"name": ["bucket-b"]}, "object": {"key": [{"prefix": "incoming/"}]}}}
+    }
+
+
+def test_emitted_event_has_filter_policy(shared_topic_tenant):
+    from service import _create_topic, _emit_filestore_event
+
+    file_store = _incoming_file_store("bucket-a", "incoming/")
+    _create_topic(file_store)
+
+    with patch("evertz_io_events.EventBridge.emit") as mock_emit:
+        _emit_filestore_event(file_store)
+
+    filter_policy = json.loads(mock_emit.call_args[0][0].data.filter_policy)
+    assert filter_policy == {
+        "Records": {"s3": {"bucket": {"name": ["bucket-a"]}, "object": {"key": [{"prefix": "incoming/"}]}}}
+    }
+
+
+def test_shared_topic_is_kept_on_delete(shared_topic_tenant):
+    from db import put_file_store
+    from service import _create_topic, delete_file_store_by_id
+
+    file_store = _incoming_file_store("bucket-a")
+    _create_topic(file_store)
+    put_file_store(file_store)
+
+    delete_file_store_by_id(file_store.tenant, file_store.id)
+
+    assert len(shared_topic_tenant.list_topics()["Topics"]) == 1
+    assert _policy(shared_topic_tenant, file_store.topic_arn)["Sid"] == "publish-from-owner"
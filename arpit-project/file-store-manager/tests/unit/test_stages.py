@@ -0,0 +1,108 @@
+import json
+import time
+import timeit
+from unittest.mock import MagicMock, patch
+
+import boto3
+import pytest
+import stages
+from moto import mock_dynamodb
+
+
+@pytest.fixture(autouse=True)
+def reset_stages():
+    stages.reset()
+    yield
+    stages.reset()
+
+
+def test_stage_adds_up_calls_items_and_bytes():
+    for items in (2, 3):
+        with stages.stage(stages.EVENT_BRIDGE) as record:
+            record.items = items
+            record.bytes = 10
+
+    totals = stages.invocation_totals()[stages.EVENT_BRIDGE]
+    assert totals[stages.CALLS] == 2
+    assert totals[stages.ITEMS] == 5
+    assert totals[stages.BYTES] == 20
+    assert totals[stages.DURATION_MS] >= 0
+
+
+def test_schema_calls_count_the_items():
+    schema = MagicMock()
+    schema.dumps.return_value = '[{"id": "a"}, {"id": "b"}]'
+
+    stages.load(schema, [{"id": "a"}, {"id": "b"}], many=True)
+    stages.dump(schema, object())
+    stages.dumps(schema, ["a", "b"], many=True)
+
+    totals = stages.invocation_totals()
+    assert totals[stages.SCHEMA_LOAD][stages.ITEMS] == 2
+    assert totals[stages.SCHEMA_DUMP][stages.CALLS] == 2
+    assert totals[stages.SCHEMA_DUMP][stages.ITEMS] == 3
+    assert totals[stages.SCHEMA_DUMP][stages.BYTES] == len(schema.dumps.return_value)
+
+
+def test_stage_totals_are_added_to_the_current_span():
+    span = MagicMock()
+    span.is_recording.return_value = True
+    with patch("stages.trace.get_current_span", return_value=span):
+        with stages.stage(stages.SNS):
+            pass
+        with stages.stage(stages.SNS):
+            pass
+
+    attributes = span.set_attributes.call_args.args[0]
+    assert attributes["stage.sns.calls"] == 2
+    assert "stage.sns.duration_ms" in attributes
+
+
+@mock_dynamodb
+def test_instrumented_table_times_every_call():
+    table = boto3.resource("dynamodb", region_name="us-east-1").create_table(
+        TableName="stages",
+        KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    stages.instrument(table)
+    stages.instrument(table)
+
+    table.put_item(Item={"id": "a"})
+    table.get_item(Key={"id": "a"})
+    table.scan()
+
+    totals = stages.invocation_totals()[stages.DYNAMODB]
+    assert totals[stages.CALLS] == 3
+    assert totals[stages.ITEMS] == 2
+    assert totals[stages.BYTES] > 0
+
+
+def test_publish_stage_metrics_emits_emf(capsys):
+    @stages.publish_stage_metrics
+    def handler(event, context):
+        with stages.stage(stages.DYNAMODB) as record:
+            record.items = 4
+        return "response"
+
+    assert handler({}, None) == "response"
+
+    emf = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert emf["DynamoDBCalls"] == [1.0]
+    assert emf["DynamoDBItems"] == [4.0]
+    assert "DynamoDBDuration" in emf
+
+
+@pytest.mark.slow
+def test_stage_overhead():
+    """The timing layer is left on in production, a stage must cost microseconds"""
+
+    def timed():
+        with stages.stage(stages.DYNAMODB) as record:
+            record.items = 1
+
+    number = 10000
+    overhead = min(timeit.repeat(timed, number=number, repeat=5)) / number
+    print(f"Stage overhead: [{overhead * 1e6:.2f}]us")
+    assert overhead < 50e-6
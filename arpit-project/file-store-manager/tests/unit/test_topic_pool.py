@@ -0,0 +1,78 @@
+from copy import deepcopy
+
+import boto3
+import config
+import moto
+import pytest
+
+POOL_TABLE = "FILE-STORE-MANAGER-TOPIC-POOL-TEST-TABLE"
+
+topic_pool_table_spec = dict(
+    TableName=POOL_TABLE,
+    AttributeDefinitions=[
+        {"AttributeName": "pool", "AttributeType": "S"},
+        {"AttributeName": "topic-arn", "AttributeType": "S"},
+    ],
+    KeySchema=[{"AttributeName": "pool", "KeyType": "HASH"}, {"AttributeName": "topic-arn", "KeyType": "RANGE"}],
+    BillingMode="PAY_PER_REQUEST",
+)
+
+
+@pytest.fixture()
+def topic_pool_table(monkeypatch):
+    import topic_pool
+
+    monkeypatch.setattr(topic_pool, "TOPIC_POOL_DYNAMODB_TABLE", POOL_TABLE)
+    monkeypatch.setattr(topic_pool, "TOPIC_POOL_TARGET_SIZE", 3)
+    with moto.mock_dynamodb(), moto.mock_sns():
+        yield boto3.resource("dynamodb").create_table(**topic_pool_table_spec)
+
+
+def test_refill_topic_pool(topic_pool_table, lambda_context):
+    from topic_pool import get_topic_pool_size, refill_topic_pool
+
+    assert refill_topic_pool({}, lambda_context) == {"created": 3, "size": 3}
+    assert refill_topic_pool({}, lambda_context) == {"created": 0, "size": 3}
+    assert get_topic_pool_size() == 3
+    assert len(boto3.client("sns").list_topics()["Topics"]) == 3
+
+
+def test_claim_pooled_topic(topic_pool_table, lambda_context):
+    from topic_pool import claim_pooled_topic, get_topic_pool_size, refill_topic_pool
+
+    refill_topic_pool({}, lambda_context)
+
+    claimed = {claim_pooled_topic() for _ in range(3)}
+
+    assert len(claimed) == 3
+    assert get_topic_pool_size() == 0
+    assert claim_pooled_topic() is None
+
+
+def test_create_topic_uses_pooled_topic(topic_pool_table, lambda_context):
+    from service import _create_topic
+    from topic_pool import refill_topic_pool
+    from unit.conftest import file_store_db
+
+    refill_topic_pool({}, lambda_context)
+    file_store = deepcopy(file_store_db)
+
+    _create_topic(file_store)
+
+    sns_client = boto3.client("sns")
+    tags = sns_client.list_tags_for_resource(ResourceArn=file_store.topic_arn)["Tags"]
+    assert {"Key": "file_store_id", "Value": file_store.id} in tags
+    attributes = sns_client.get_topic_attributes(TopicArn=file_store.topic_arn)["Attributes"]
+    assert file_store.bucket in attributes["Policy"]
+    assert len(sns_client.list_topics()["Topics"]) == 3
+
+
+def test_create_topic_falls_back_when_pool_is_empty(topic_pool_table):
+    from service import _create_topic
+    from unit.conftest import file_store_db
+
+    file_store = deepcopy(file_store_db)
+
+    _create_topic(file_store)
+
+    assert file_store.topic_arn.endswith(f"{config.PROJECT}-{file_store.id}")
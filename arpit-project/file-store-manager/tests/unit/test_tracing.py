@@ -0,0 +1,70 @@
+import timeit
+from unittest.mock import MagicMock, patch
+
+import pytest
+import tracing
+
+
+def traced_at(level, tracing_level):
+    observability_start_span = MagicMock(return_value=lambda func: ("traced", func))
+    with patch("tracing.TRACING_LEVEL", tracing_level), patch(
+        "tracing.observability_start_span", observability_start_span
+    ):
+        decorated = tracing.start_span(level=level, name="span")(len)
+    return decorated != len, observability_start_span
+
+
+@pytest.mark.parametrize(
+    "tracing_level, traced_levels",
+    [
+        (tracing.MINIMAL, [tracing.MINIMAL]),
+        (tracing.STANDARD, [tracing.MINIMAL, tracing.STANDARD]),
+        (tracing.VERBOSE, [tracing.MINIMAL, tracing.STANDARD, tracing.VERBOSE]),
+        ("unknown", [tracing.MINIMAL, tracing.STANDARD]),
+    ],
+)
+def test_spans_finer_than_the_tracing_level_are_left_out(tracing_level, traced_levels):
+    for level in tracing.LEVELS:
+        traced, _ = traced_at(level, tracing_level)
+        assert traced == (level in traced_levels), level
+
+
+def test_untraced_functions_are_returned_as_they_are():
+    with patch("tracing.TRACING_LEVEL", tracing.MINIMAL):
+        assert tracing.start_span(level=tracing.VERBOSE)(len) is len
+
+
+def test_arguments_are_passed_to_start_span():
+    _, observability_start_span = traced_at(tracing.STANDARD, tracing.STANDARD)
+    observability_start_span.assert_called_once_with(name="span")
+
+
+def _invocation(levels):
+    """
+    A chain of functions, each calling the next, decorated the way they would be at import time
+    """
+
+    def leaf():
+        return None
+
+    func = leaf
+    for level in reversed(levels):
+        func = tracing.start_span(level=level)(lambda inner=func: inner())
+    return func
+
+
+@pytest.mark.slow
+def test_invocation_overhead_per_tracing_level():
+    # Shaped like a create: the operation, a few AWS calls, and pass-throughs around them
+    levels = [tracing.MINIMAL] + [tracing.STANDARD] * 4 + [tracing.VERBOSE] * 5
+    number = 2000
+
+    timings = {}
+    for tracing_level in tracing.LEVELS:
+        with patch("tracing.TRACING_LEVEL", tracing_level):
+            invocation = _invocation(levels)
+        timings[tracing_level] = min(timeit.repeat(invocation, number=number, repeat=5)) / number
+
+    for tracing_level, seconds in timings.items():
+        print(f"TRACING_LEVEL={tracing_level}: {seconds * 1e6:.1f}µs per invocation")
+    assert timings[tracing.MINIMAL] <= timings[tracing.VERBOSE] * 1.5
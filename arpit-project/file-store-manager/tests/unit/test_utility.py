@@ -0,0 +1,112 @@
+import threading
+import time
+from unittest.mock import patch
+
+import boto3
+import pytest
+from moto import mock_sns
+
+SUBSCRIPTION_COUNT = 1000
+UNSUBSCRIBE_LATENCY = 0.002
+
+
+@pytest.fixture()
+def sns_topic_with_subscriptions():
+    with mock_sns():
+        sns_client = boto3.client("sns")
+        topic_arn = sns_client.create_topic(Name="TestTopic")["TopicArn"]
+        for index in range(SUBSCRIPTION_COUNT):
+            sns_client.subscribe(
+                TopicArn=topic_arn, Protocol="sqs", Endpoint=f"arn:aws:sqs:us-east-1:123456789012:queue-{index}"
+            )
+        yield sns_client, topic_arn
+
+
+@pytest.mark.slow
+def test_delete_sns_topic_removes_all_subscriptions(sns_topic_with_subscriptions):
+    from utility import delete_sns_topic
+
+    sns_client, topic_arn = sns_topic_with_subscriptions
+
+    start = time.perf_counter()
+    delete_sns_topic(topic_arn)
+    elapsed = time.perf_counter() - start
+    print(f"Removed [{SUBSCRIPTION_COUNT}] subscriptions in [{elapsed:.3f}]s")
+
+    assert len(sns_client.list_subscriptions()["Subscriptions"]) == 0
+    assert len(sns_client.list_topics()["Topics"]) == 0
+
+
+@pytest.mark.slow
+def test_delete_sns_topic_subscriptions_runs_concurrently(sns_topic_with_subscriptions):
+    import utility
+
+    sns_client, topic_arn = sns_topic_with_subscriptions
+    unsubscribe = utility.get_sns_client().unsubscribe
+
+    def slow_unsubscribe(**kwargs):
+        # Stand in for the network round trip that moto does not have
+        time.sleep(UNSUBSCRIBE_LATENCY)
+        return unsubscribe(**kwargs)
+
+    with patch.object(utility.get_sns_client(), "unsubscribe", side_effect=slow_unsubscribe):
+        start = time.perf_counter()
+        utility._delete_sns_topic_subscriptions(topic_arn)
+        elapsed = time.perf_counter() - start
+
+    serial_lower_bound = SUBSCRIPTION_COUNT * UNSUBSCRIBE_LATENCY
+    print(
+        f"Removed [{SUBSCRIPTION_COUNT}] subscriptions in [{elapsed:.3f}]s, serial lower bound [{serial_lower_bound}]s"
+    )
+
+    assert elapsed < serial_lower_bound
+    assert len(sns_client.list_subscriptions_by_topic(TopicArn=topic_arn)["Subscriptions"]) == 0
+
+
+def test_delete_sns_topic_subscriptions_stops_after_max_passes():
+    import utility
+
+    # Every pass finds a subscription, as when subscriptions keep being added to the topic
+    with patch("utility._unsubscribe_topic_pages", return_value=1) as unsubscribe_topic_pages, patch(
+        "utility.SNS_UNSUBSCRIBE_MAX_PASSES", 3
+    ), patch("utility.logger") as logger:
+        utility._delete_sns_topic_subscriptions("arn:aws:sns:us-east-1:123456789012:TestTopic")
+
+    assert unsubscribe_topic_pages.call_count == 3
+    logger.warning.assert_called_once()
+
+
+def _in_threads(function, count=2):
+    results = [None] * count
+
+    def run(index):
+        results[index] = function()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_tables_are_not_shared_between_threads():
+    from utility import get_table_with_retry_config
+
+    table = get_table_with_retry_config("table")
+    assert get_table_with_retry_config("table") is table
+
+    worker_tables = _in_threads(lambda: get_table_with_retry_config("table"))
+
+    assert len({id(worker_table) for worker_table in worker_tables + [table]}) == 3
+
+
+def test_restricted_tables_are_not_shared_between_threads():
+    from utility import get_restricted_table_with_retry_config
+
+    with patch("utility.restricted_table") as mock_restricted_table:
+        get_restricted_table_with_retry_config("table", "tenant-a")
+        get_restricted_table_with_retry_config("table", "tenant-a")
+        _in_threads(lambda: get_restricted_table_with_retry_config("table", "tenant-a"))
+
+    assert mock_restricted_table.call_count == 3
@@ -0,0 +1,70 @@
+from unittest.mock import MagicMock, patch
+
+
+def test_warm_up_event_primes_without_calling_the_handler():
+    from utility import RESTRICTED_TABLE_CACHE
+    from warm_up import warm_up_handler
+
+    handler = MagicMock()
+    with patch("utility.restricted_table") as mock_restricted_table:
+        response = warm_up_handler(handler)({"warmUp": True, "tenantIds": ["tenant-a", "tenant-b"]}, None)
+
+    handler.assert_not_called()
+    assert response["warmUp"] is True
+    assert set(response["primed"]) == {"imports", "clients", "restrictedTables", "tracer"}
+    assert mock_restricted_table.call_count == 2
+    assert RESTRICTED_TABLE_CACHE.stats()["size"] == 2
+
+
+def test_other_events_reach_the_handler():
+    from warm_up import warm_up_handler
+
+    handler = MagicMock(return_value="response")
+    with patch("warm_up.prime") as mock_prime:
+        assert warm_up_handler(handler)({"warmUp": "yes"}, "context") == "response"
+
+    handler.assert_called_once_with({"warmUp": "yes"}, "context")
+    mock_prime.assert_not_called()
+
+
+def test_failing_step_does_not_fail_the_warm_up():
+    from warm_up import prime
+
+    with patch("warm_up._create_tracer", side_effect=RuntimeError("no exporter")):
+        assert "tracer" not in prime()
+
+
+def test_prime_on_provisioned_concurrency_only():
+    from warm_up import prime_on_provisioned_concurrency
+
+    with patch("warm_up.prime") as mock_prime:
+        prime_on_provisioned_concurrency()
+        mock_prime.assert_not_called()
+
+        with patch("warm_up.LAMBDA_INITIALIZATION_TYPE", "provisioned-concurrency"):
+            with patch("warm_up.WARM_UP_TENANT_IDS", ("tenant-a",)):
+                prime_on_provisioned_concurrency()
+        mock_prime.assert_called_once_with(("tenant-a",))
+
+
+def test_tracer_provider_is_set_up_by_export_trace():
+    from warm_up import _create_tracer
+
+    with patch("evertz_io_observability.otel_collector.export_trace") as mock_export_trace, patch(
+        "warm_up.DEFERRED_TRACE_EXPORT", True
+    ), patch("deferred_export.install") as mock_install:
+        _create_tracer()
+
+    mock_export_trace.return_value.assert_called_once_with({}, None)
+    mock_install.assert_called_once_with()
+
+
+def test_restricted_tables_are_reused():
+    from utility import get_restricted_table_with_retry_config
+
+    with patch("utility.restricted_table") as mock_restricted_table:
+        table = get_restricted_table_with_retry_config("table", "tenant-a")
+        assert get_restricted_table_with_retry_config("table", "tenant-a") is table
+        get_restricted_table_with_retry_config("table", "tenant-b")
+
+    assert mock_restricted_table.call_count == 2